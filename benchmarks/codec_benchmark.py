@@ -0,0 +1,127 @@
+"""Measures the CPU cost and bandwidth savings of the audio codecs.
+
+Downstream: encodes synthetic 24000hz speech-like audio in the chunk sizes Gemini Live
+returns and reports, per codec, the CPU time per stream (as a percentage of one core per
+real time second of audio), the base64 bytes per second sent to the player, and the
+signal-to-noise ratio after decoding.
+
+Upstream: decodes 16000hz microphone audio in the chunk size the audio recorder sends
+and reports how many concurrent streams one core can decode, against a target of
+`--target-streams`.
+
+  python benchmarks/codec_benchmark.py
+  python benchmarks/codec_benchmark.py --seconds 30 --chunk-ms 40
+"""
+
+import argparse
+import base64
+import math
+import os
+import random
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from live import codec  # noqa: E402
+
+
+_PLAYER_SAMPLE_RATE = 24000
+_RECORDER_SAMPLE_RATE = 16000
+_RECORDER_CHUNK_SAMPLES = 4096 // 3  # 4096 samples at 48000hz downsampled to 16000hz
+
+
+def synthetic_speech(seconds: float, sample_rate: int) -> bytes:
+  """Returns a mix of tones with a syllable-like envelope and some noise."""
+  rng = random.Random(0)
+  samples = array("h")
+  for i in range(int(seconds * sample_rate)):
+    t = i / sample_rate
+    envelope = 0.5 + 0.5 * math.sin(2 * math.pi * 4 * t)
+    value = (
+      0.5 * math.sin(2 * math.pi * 180 * t)
+      + 0.3 * math.sin(2 * math.pi * 720 * t)
+      + 0.1 * math.sin(2 * math.pi * 2400 * t)
+    )
+    samples.append(int(12000 * envelope * value + rng.gauss(0, 300)))
+  return samples.tobytes()
+
+
+def snr_db(original: bytes, decoded: bytes) -> float:
+  a, b = array("h", original), array("h", decoded)
+  signal = sum(x * x for x in a)
+  noise = sum((x - y) ** 2 for x, y in zip(a, b))
+  return math.inf if noise == 0 else 10 * math.log10(signal / noise)
+
+
+def benchmark_downstream(seconds: float, chunk_ms: int):
+  pcm = synthetic_speech(seconds, _PLAYER_SAMPLE_RATE)
+  chunk_bytes = _PLAYER_SAMPLE_RATE * chunk_ms // 1000 * 2
+  chunks = [pcm[i : i + chunk_bytes] for i in range(0, len(pcm), chunk_bytes)]
+
+  print(f"Downstream: encode {_PLAYER_SAMPLE_RATE}hz audio in {chunk_ms}ms chunks")
+  print(
+    f"{'codec':<8}{'cpu/stream':>12}{'streams/core':>14}{'KB/s sent':>12}{'saved':>8}{'snr':>9}"
+  )
+  pcm_rate = len(base64.b64encode(pcm)) / seconds
+  for name in codec.CODECS:
+    encoder = codec.new_encoder(name)
+    start = time.process_time()
+    encoded = [encoder(chunk) for chunk in chunks]
+    cpu = (time.process_time() - start) / seconds
+
+    sent_rate = sum(len(base64.b64encode(chunk)) for chunk in encoded) / seconds
+    decoded = b"".join(codec.decode(name, chunk) for chunk in encoded)
+    streams = f"{1 / cpu:.0f}" if cpu else "inf"
+    print(
+      f"{name:<8}{cpu * 100:>11.2f}%{streams:>14}{sent_rate / 1024:>12.1f}"
+      f"{1 - sent_rate / pcm_rate:>8.0%}{snr_db(pcm, decoded):>7.1f}dB"
+    )
+
+
+def benchmark_upstream(seconds: float, target_streams: int):
+  pcm = synthetic_speech(seconds, _RECORDER_SAMPLE_RATE)
+  chunk_bytes = _RECORDER_CHUNK_SAMPLES * 2
+  chunks = [pcm[i : i + chunk_bytes] for i in range(0, len(pcm), chunk_bytes)]
+
+  print(
+    f"Upstream: decode {_RECORDER_SAMPLE_RATE}hz audio in {_RECORDER_CHUNK_SAMPLES} sample chunks"
+  )
+  print(
+    f"{'codec':<8}{'KB/s recv':>12}{'chunks/s':>12}{'streams/core':>14}  target {target_streams}"
+  )
+  for name in codec.CODECS:
+    encoder = codec.new_encoder(name)
+    encoded = [encoder(chunk) for chunk in chunks]
+    start = time.process_time()
+    for chunk in encoded:
+      codec.decode(name, chunk)
+    elapsed = max(time.process_time() - start, 1e-9)
+
+    streams = seconds / elapsed
+    received_rate = sum(len(base64.b64encode(chunk)) for chunk in encoded) / seconds
+    verdict = "ok" if streams >= target_streams else "below"
+    print(
+      f"{name:<8}{received_rate / 1024:>12.1f}{len(encoded) / elapsed:>12.0f}"
+      f"{streams:>14.0f}  {verdict}"
+    )
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--seconds", type=float, default=10.0, help="Seconds of audio.")
+  parser.add_argument("--chunk-ms", type=int, default=40, help="Downstream chunk size in ms.")
+  parser.add_argument(
+    "--target-streams", type=int, default=1000, help="Upstream streams per core to aim for."
+  )
+  args = parser.parse_args()
+
+  print(f"numpy: {'yes' if codec._numpy() is not None else 'no'}")
+  benchmark_downstream(args.seconds, args.chunk_ms)
+  print()
+  benchmark_upstream(args.seconds, args.target_streams)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,80 @@
+"""Measures how long each page of the app takes to render, i.e. what every yield costs.
+
+Every yield of a streaming event handler re-renders the whole page and sends the
+component tree to the client. For every page of `main.py`, this renders the page
+`--renders` times through Mesop's runtime, the way the Mesop server does after every
+yield, and reports the time per render and per serialization of the component tree. The
+first render of a page imports its module (see `main.py`), so it is reported on its own.
+
+Drives Mesop's runtime directly instead of a running server, so it relies on Mesop
+internals (`mesop.runtime`) and may need updating along with Mesop.
+
+  python benchmarks/render_benchmark.py
+  python benchmarks/render_benchmark.py --renders 500 --pages /audio_demo_v1
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_PAGES = ["/", "/audio_demo_v1", "/video_demo_v1", "/tool_demo_v1", "/text_demo_v1"]
+
+
+def render_once(path: str) -> tuple[float, float]:
+  """Renders the page at `path` and returns the render and serialization seconds."""
+  import mesop.protos.ui_pb2 as pb
+  from mesop.runtime import runtime
+
+  context = runtime().context()
+  context.set_current_node(pb.Component())
+  start = time.perf_counter()
+  runtime().run_path(path=path)
+  rendered = time.perf_counter()
+  context.current_node().SerializeToString()
+  return rendered - start, time.perf_counter() - rendered
+
+
+def benchmark_page(path: str, renders: int):
+  first_render, _ = render_once(path)
+  render_ms, serialize_ms = [], []
+  for _ in range(renders):
+    render, serialize = render_once(path)
+    render_ms.append(render * 1000)
+    serialize_ms.append(serialize * 1000)
+
+  render_quantiles = statistics.quantiles(render_ms, n=100)
+  serialize_quantiles = statistics.quantiles(serialize_ms, n=100)
+  print(
+    f"{path:<16}{first_render * 1000:>10.2f}"
+    f"{render_quantiles[49]:>11.2f}{render_quantiles[94]:>11.2f}{max(render_ms):>10.2f}"
+    f"{serialize_quantiles[49]:>10.2f}{serialize_quantiles[94]:>10.2f}"
+  )
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--renders", type=int, default=200, help="Renders per page.")
+  parser.add_argument("--pages", nargs="+", default=_PAGES, choices=_PAGES)
+  args = parser.parse_args()
+
+  from flask import Flask
+
+  # Registers the pages with the Mesop runtime.
+  import main  # noqa: F401
+
+  print(f"{args.renders} renders per page, times in ms")
+  print(
+    f"{'page':<16}{'first':>10}{'render p50':>11}{'p95':>11}{'max':>10}{'tree p50':>10}{'p95':>10}"
+  )
+  for path in args.pages:
+    # Mesop keeps the state of a render in the Flask app context, like during a request.
+    with Flask(__name__).app_context():
+      benchmark_page(path, args.renders)
+
+
+if __name__ == "__main__":
+  main()
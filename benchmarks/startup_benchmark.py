@@ -0,0 +1,125 @@
+"""Measures cold start import time and memory of the Mesop app.
+
+Runs `import main` in fresh interpreters, using `python -X importtime` for the import
+time breakdown and `ru_maxrss` for the memory baseline. Exits with a non-zero status,
+so it can be used as a CI check, if:
+
+- the import time or memory are over the absolute budgets in `_BUDGETS`,
+- they regress by more than the tolerance against `startup_baseline.json`, or
+- a heavy SDK gets imported at startup.
+
+The baseline depends on the machine, so none is committed. Record it where the check runs
+with `--update-baseline`. Without one, the regression check is skipped with a message
+saying so, and the budgets still apply.
+
+  python benchmarks/startup_benchmark.py
+  python benchmarks/startup_benchmark.py --update-baseline
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_baseline.json")
+
+# Upper bounds on any machine, well above a cold start of the app with its pages deferred.
+_BUDGETS = {"import_time_ms": 1500.0, "max_rss_mb": 200.0}
+
+# Modules that should only be imported once a page actually needs them.
+_DEFERRED_MODULES = ["websockets", "google.genai", "numpy", "PIL"]
+
+_PROBE = f"""
+import json, resource, sys
+import main
+print(json.dumps({{
+  "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+  "deferred_imported": [m for m in {_DEFERRED_MODULES!r} if m in sys.modules],
+}}))
+"""
+
+
+def measure_once() -> dict:
+  result = subprocess.run(
+    [sys.executable, "-X", "importtime", "-c", _PROBE],
+    cwd=_REPO_ROOT,
+    capture_output=True,
+    text=True,
+    check=True,
+  )
+  probe = json.loads(result.stdout.strip().splitlines()[-1])
+
+  # Lines look like: "import time:       123 |       4567 |   package.module"
+  total_us = 0
+  slowest = []
+  for line in result.stderr.splitlines():
+    if not line.startswith("import time:") or "self [us]" in line:
+      continue
+    self_us, cumulative_us, name = line[len("import time:") :].split("|")
+    total_us += int(self_us)
+    slowest.append((int(cumulative_us), name.strip()))
+  slowest.sort(reverse=True)
+
+  return {
+    "import_time_ms": total_us / 1000,
+    "max_rss_mb": probe["max_rss_kb"] / 1024,
+    "deferred_imported": probe["deferred_imported"],
+    "slowest_imports": [{"module": name, "cumulative_ms": us / 1000} for us, name in slowest[:10]],
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--runs", type=int, default=5)
+  parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression ratio.")
+  parser.add_argument("--update-baseline", action="store_true")
+  args = parser.parse_args()
+
+  runs = [measure_once() for _ in range(args.runs)]
+  current = {
+    "import_time_ms": statistics.median(run["import_time_ms"] for run in runs),
+    "max_rss_mb": statistics.median(run["max_rss_mb"] for run in runs),
+  }
+  print(json.dumps({**current, "slowest_imports": runs[-1]["slowest_imports"]}, indent=2))
+
+  failures = []
+  deferred_imported = runs[-1]["deferred_imported"]
+  if deferred_imported:
+    failures.append(f"Imported at startup but should be deferred: {deferred_imported}")
+
+  for key, budget in _BUDGETS.items():
+    if current[key] > budget:
+      failures.append(f"{key} is over budget: {current[key]:.1f} > {budget:.1f}")
+
+  if args.update_baseline:
+    with open(_BASELINE_PATH, "w") as f:
+      json.dump(current, f, indent=2)
+      f.write("\n")
+    print(f"Wrote baseline to {_BASELINE_PATH}")
+  elif not os.path.exists(_BASELINE_PATH):
+    print(
+      f"SKIP: No baseline at {_BASELINE_PATH}, so the regression check was skipped. "
+      "Record one with --update-baseline.",
+      file=sys.stderr,
+    )
+  else:
+    with open(_BASELINE_PATH) as f:
+      baseline = json.load(f)
+    for key, value in current.items():
+      budget = baseline[key] * (1 + args.tolerance)
+      if value > budget:
+        failures.append(
+          f"{key} regressed: {value:.1f} > {budget:.1f} (baseline {baseline[key]:.1f})"
+        )
+
+  for failure in failures:
+    print(f"FAIL: {failure}", file=sys.stderr)
+  sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,204 @@
+"""Compares the websocket transport profiles and event loops on a Gemini Live traffic mix.
+
+Starts a fake Gemini Live server in a separate process and, for every combination of
+event loop and transport profile (see `live/transport.py`), runs `--streams` sessions
+against it for `--seconds`. Each session sends 16000hz microphone audio in real time and
+JPEG-sized video frames at `--video-fps`, and the server answers every audio chunk with
+a chunk of 24000hz audio. Reports, per combination, the client CPU as a percentage of
+one core and the round trip latency of the audio chunks.
+
+  python benchmarks/transport_benchmark.py
+  python benchmarks/transport_benchmark.py --streams 20 --profiles default low_latency
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import math
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from live import transport  # noqa: E402
+
+
+_RECORDER_SAMPLE_RATE = 16000
+_PLAYER_SAMPLE_RATE = 24000
+
+
+def synthetic_audio(seconds: float, sample_rate: int) -> bytes:
+  """Returns a tone with some noise, which compresses about as badly as speech."""
+  rng = random.Random(0)
+  samples = array("h")
+  for i in range(int(seconds * sample_rate)):
+    value = 8000 * math.sin(2 * math.pi * 220 * i / sample_rate) + rng.gauss(0, 500)
+    samples.append(int(value))
+  return samples.tobytes()
+
+
+def realtime_input(data: bytes, mime_type: str) -> str:
+  chunk = {"data": base64.b64encode(data).decode("ascii"), "mime_type": mime_type}
+  return json.dumps({"realtime_input": {"media_chunks": [chunk]}})
+
+
+def run_server(port_queue: multiprocessing.Queue, chunk_ms: int):
+  from websockets.asyncio.server import serve
+
+  reply_audio = synthetic_audio(chunk_ms / 1000, _PLAYER_SAMPLE_RATE)
+  reply = json.dumps(
+    {
+      "serverContent": {
+        "modelTurn": {
+          "parts": [
+            {
+              "inlineData": {
+                "mimeType": "audio/pcm",
+                "data": base64.b64encode(reply_audio).decode("ascii"),
+              }
+            }
+          ]
+        }
+      }
+    }
+  )
+
+  async def handle(ws):
+    async for message in ws:
+      msg = json.loads(message)
+      if "setup" in msg:
+        await ws.send(json.dumps({"setupComplete": {}}))
+      elif msg["realtime_input"]["media_chunks"][0]["mime_type"] == "audio/pcm":
+        await ws.send(reply)
+
+  async def main():
+    async with serve(handle, "127.0.0.1", 0, max_size=None) as server:
+      port_queue.put(server.sockets[0].getsockname()[1])
+      await asyncio.Future()
+
+  asyncio.run(main())
+
+
+async def run_session(
+  uri: str,
+  profile: transport.TransportProfile,
+  seconds: float,
+  chunk_ms: int,
+  video_fps: float,
+  frame: bytes,
+) -> list[float]:
+  audio = realtime_input(synthetic_audio(chunk_ms / 1000, _RECORDER_SAMPLE_RATE), "audio/pcm")
+  video = realtime_input(frame, "image/jpeg")
+  sent_at = []
+  latencies = []
+
+  async with await transport.connect(uri, profile) as ws:
+    await ws.send(json.dumps({"setup": {"model": "models/fake"}}))
+    await ws.recv()
+
+    async def send_audio():
+      # Paced against a fixed schedule so a slow send doesn't slow down the stream.
+      start = time.monotonic()
+      for i in range(int(seconds * 1000 / chunk_ms)):
+        await asyncio.sleep(max(start + i * chunk_ms / 1000 - time.monotonic(), 0))
+        sent_at.append(time.perf_counter())
+        await ws.send(audio)
+
+    async def send_video():
+      start = time.monotonic()
+      for i in range(int(seconds * video_fps)):
+        await asyncio.sleep(max(start + i / video_fps - time.monotonic(), 0))
+        await ws.send(video)
+
+    async def receive():
+      # The server answers every audio chunk in order.
+      for i in range(int(seconds * 1000 / chunk_ms)):
+        json.loads(await ws.recv())
+        latencies.append(time.perf_counter() - sent_at[i])
+
+    senders = [send_audio()]
+    if video_fps:
+      senders.append(send_video())
+    await asyncio.gather(receive(), *senders)
+  return latencies
+
+
+def run_combination(args, port: int, event_loop: str, profile: transport.TransportProfile):
+  rng = random.Random(1)
+  # Random bytes don't compress, just like JPEG.
+  frame = rng.randbytes(args.frame_kb * 1024)
+
+  async def run_all():
+    return await asyncio.gather(
+      *(
+        run_session(
+          f"ws://127.0.0.1:{port}", profile, args.seconds, args.chunk_ms, args.video_fps, frame
+        )
+        for _ in range(args.streams)
+      )
+    )
+
+  start_cpu = time.process_time()
+  start = time.monotonic()
+  with asyncio.Runner(loop_factory=lambda: transport.new_event_loop(event_loop)) as runner:
+    results = runner.run(run_all())
+  cpu = (time.process_time() - start_cpu) / (time.monotonic() - start)
+
+  latencies = sorted(latency * 1000 for session in results for latency in session)
+  quantiles = statistics.quantiles(latencies, n=100)
+  print(
+    f"{event_loop:<9}{profile.name:<24}{cpu * 100:>7.1f}%"
+    f"{quantiles[49]:>9.2f}{quantiles[94]:>9.2f}{quantiles[98]:>9.2f}{latencies[-1]:>9.2f}"
+  )
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--streams", type=int, default=10, help="Concurrent sessions.")
+  parser.add_argument("--seconds", type=float, default=10.0, help="Duration of each run.")
+  parser.add_argument("--chunk-ms", type=int, default=40, help="Audio chunk size in ms.")
+  parser.add_argument("--video-fps", type=float, default=2.0, help="0 to send no video.")
+  parser.add_argument("--frame-kb", type=int, default=60, help="Size of a video frame.")
+  parser.add_argument(
+    "--profiles", nargs="+", default=list(transport.PROFILES), choices=list(transport.PROFILES)
+  )
+  parser.add_argument(
+    "--event-loops", nargs="+", default=list(transport.EVENT_LOOPS), choices=transport.EVENT_LOOPS
+  )
+  args = parser.parse_args()
+
+  event_loops = []
+  for event_loop in args.event_loops:
+    try:
+      transport.new_event_loop(event_loop).close()
+    except ImportError:
+      print(f"Skipping {event_loop}, it is not installed")
+      continue
+    event_loops.append(event_loop)
+
+  port_queue = multiprocessing.Queue()
+  server = multiprocessing.Process(target=run_server, args=(port_queue, args.chunk_ms), daemon=True)
+  server.start()
+  port = port_queue.get(timeout=10)
+
+  print(
+    f"{args.streams} streams, {args.chunk_ms}ms audio chunks, "
+    f"{args.video_fps:g} fps of {args.frame_kb} KB frames, {args.seconds:g}s per run"
+  )
+  print(f"{'loop':<9}{'profile':<24}{'cpu':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+  try:
+    for event_loop in event_loops:
+      for name in args.profiles:
+        run_combination(args, port, event_loop, transport.PROFILES[name])
+  finally:
+    server.terminate()
+
+
+if __name__ == "__main__":
+  main()
@@ -11,6 +11,7 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import functools
 import mesop as me
 from state.state import AppState
 from components.side_nav import sidenav
@@ -31,27 +32,25 @@ def page_scaffold():
 
     sidenav("")
 
-    with me.box(
-        style=me.Style(
-            display="flex",
-            flex_direction="column",
-            height="100%",
-            margin=me.Margin(
-                left=SIDENAV_MAX_WIDTH if app_state.sidenav_open else SIDENAV_MIN_WIDTH,
-            ),
-        ),
-    ):
-        with me.box(
-            style=me.Style(
-                background=me.theme_var("background"),
-                height="100%",
-                overflow_y="scroll",
-                margin=me.Margin(bottom=20),
-            )
-        ):
+    with me.box(style=_content_column_style(app_state.sidenav_open)):
+        with me.box(style=PAGE_BACKGROUND_STYLE):
             me.slot()
 
 
+# Streaming event handlers re-render the scaffold on every yield, so styles are only
+# built once per input.
+@functools.lru_cache(maxsize=None)
+def _content_column_style(sidenav_open: bool) -> me.Style:
+    return me.Style(
+        display="flex",
+        flex_direction="column",
+        height="100%",
+        margin=me.Margin(
+            left=SIDENAV_MAX_WIDTH if sidenav_open else SIDENAV_MIN_WIDTH,
+        ),
+    )
+
+
 @me.content_component
 def page_frame():
     """Page Frame"""
@@ -15,7 +15,11 @@
 # Modified in 2025:
 #  - Added my own routes
 #  - Removed border radius
+import functools
+
 import mesop as me
+from live import metrics
+from state import live_session
 from state.state import AppState
 from styles.styles import (
   SIDENAV_MAX_WIDTH,
@@ -25,11 +29,29 @@ from styles.styles import (
 )
 
 
+# `live_module` is the module of a page that plays the app's Gemini Live session. See
+# `state/live_session.py`.
 page_json = [
   {"display": "Home", "icon": "home", "route": "/"},
-  {"display": "Audio Demo V1", "icon": "headphones", "route": "/audio_demo_v1"},
-  {"display": "Video Demo V1", "icon": "videocam", "route": "/video_demo_v1"},
-  {"display": "Tool Demo V1", "icon": "construction", "route": "/tool_demo_v1"},
+  {
+    "display": "Audio Demo V1",
+    "icon": "headphones",
+    "route": "/audio_demo_v1",
+    "live_module": "pages.audio_demo_v1",
+  },
+  {
+    "display": "Video Demo V1",
+    "icon": "videocam",
+    "route": "/video_demo_v1",
+    "live_module": "pages.video_demo_v1",
+  },
+  {
+    "display": "Tool Demo V1",
+    "icon": "construction",
+    "route": "/tool_demo_v1",
+    "live_module": "pages.tool_demo_v1",
+  },
+  {"display": "Text Demo V1", "icon": "chat", "route": "/text_demo_v1"},
 ]
 
 
@@ -39,7 +61,7 @@ def on_sidenav_menu_click(e: me.ClickEvent):  # pylint: disable=unused-argument
   state.sidenav_open = not state.sidenav_open
 
 
-def navigate_to(e: me.ClickEvent):
+async def navigate_to(e: me.ClickEvent):
   """navigate to a specific page"""
   s = me.state(AppState)
   idx = int(e.key)
@@ -50,39 +72,24 @@ def navigate_to(e: me.ClickEvent):
   page = page_json[idx]
   print(f"navigating to: {page}")
   s.current_page = page["route"]
+  if "live_module" in page:
+    await live_session.prewarm(page["live_module"])
   me.navigate(s.current_page)
   yield
 
 
 @me.component
+@metrics.timed("render.sidenav")
 def sidenav(current_page: str):
   """Render side navigation"""
   app_state = me.state(AppState)
 
   with me.sidenav(
     opened=True,
-    style=me.Style(
-      width=SIDENAV_MAX_WIDTH if app_state.sidenav_open else SIDENAV_MIN_WIDTH,
-      background=me.theme_var("secondary-container"),
-      border_radius=0,
-    ),
+    style=_sidenav_style(app_state.sidenav_open),
   ):
-    with me.box(
-      style=me.Style(
-        margin=me.Margin(top=16, left=16, right=16, bottom=16),
-        display="flex",
-        flex_direction="column",
-        gap=5,
-      ),
-    ):
-      with me.box(
-        style=me.Style(
-          display="flex",
-          flex_direction="row",
-          gap=5,
-          align_items="center",
-        ),
-      ):
+    with me.box(style=_SIDENAV_CONTENT_STYLE):
+      with me.box(style=_MENU_ROW_STYLE):
         with me.content_button(
           type="icon",
           on_click=on_sidenav_menu_click,
@@ -92,7 +99,7 @@ def sidenav(current_page: str):
               me.icon(icon="menu")
         if app_state.sidenav_open:
           me.text("Gemini Demos", style=_FANCY_TEXT_GRADIENT)
-      me.box(style=me.Style(height=16))
+      me.box(style=_MENU_SPACER_STYLE)
       for idx, page in enumerate(page_json):
         menu_item(idx, page["icon"], page["display"], not app_state.sidenav_open)
       # settings & theme toggle
@@ -115,14 +122,7 @@ def menu_item(
 ):
   """render menu item"""
   if minimized:  # minimized
-    with me.box(
-      style=me.Style(
-        display="flex",
-        flex_direction="row",
-        gap=5,
-        align_items="center",
-      ),
-    ):
+    with me.box(style=_MENU_ROW_STYLE):
       with me.content_button(
         key=str(key),
         on_click=navigate_to,
@@ -138,14 +138,7 @@ def menu_item(
       on_click=navigate_to,
       style=content_style,
     ):
-      with me.box(
-        style=me.Style(
-          display="flex",
-          flex_direction="row",
-          gap=5,
-          align_items="center",
-        ),
-      ):
+      with me.box(style=_MENU_ROW_STYLE):
         me.icon(icon=icon)
         me.text(text)
 
@@ -165,14 +158,7 @@ def theme_toggle_icon(key: int, icon: str, text: str, min: bool = True):
   """Theme toggle icon"""
   # THEME_TOGGLE_STYLE = me.Style(position="absolute", bottom=50, align_content="left")
   if min:  # minimized
-    with me.box(
-      style=me.Style(
-        display="flex",
-        flex_direction="row",
-        gap=5,
-        align_items="center",
-      ),
-    ):
+    with me.box(style=_MENU_ROW_STYLE):
       with me.content_button(
         key=str(key),
         on_click=toggle_theme,
@@ -188,14 +174,7 @@ def theme_toggle_icon(key: int, icon: str, text: str, min: bool = True):
       on_click=toggle_theme,
       # style=THEME_TOGGLE_STYLE,
     ):
-      with me.box(
-        style=me.Style(
-          display="flex",
-          flex_direction="row",
-          gap=5,
-          align_items="center",
-        ),
-      ):
+      with me.box(style=_MENU_ROW_STYLE):
         me.icon("light_mode" if me.theme_brightness() == "dark" else "dark_mode")
         me.text("Light mode" if me.theme_brightness() == "dark" else "Dark mode")
 
@@ -207,3 +186,30 @@ MENU_BOTTOM = me.Style(
   bottom=8,
   align_content="left",
 )
+
+# The side nav is re-rendered on every yield of a streaming event handler, so its styles
+# are built once rather than on every render.
+_SIDENAV_CONTENT_STYLE = me.Style(
+  margin=me.Margin(top=16, left=16, right=16, bottom=16),
+  display="flex",
+  flex_direction="column",
+  gap=5,
+)
+
+_MENU_ROW_STYLE = me.Style(
+  display="flex",
+  flex_direction="row",
+  gap=5,
+  align_items="center",
+)
+
+_MENU_SPACER_STYLE = me.Style(height=16)
+
+
+@functools.lru_cache(maxsize=None)
+def _sidenav_style(sidenav_open: bool) -> me.Style:
+  return me.Style(
+    width=SIDENAV_MAX_WIDTH if sidenav_open else SIDENAV_MIN_WIDTH,
+    background=me.theme_var("secondary-container"),
+    border_radius=0,
+  )
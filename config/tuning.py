@@ -0,0 +1,304 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, fields, replace
+from typing import Any, Optional
+from config.default import Default
+from live import codec
+from live import transport
+
+
+# Only these can change while the server is running. The rest are read once at startup
+# since changing them mid-session would break running sessions (e.g. sample rates).
+HOT_RELOADABLE = frozenset(
+  {
+    "VOICE_DETECTION_ENABLED",
+    "VOICE_THRESHOLD",
+    "VOICE_HOLD_TIME_MS",
+    "AUDIO_MAX_COALESCED_BYTES",
+    "AUDIO_CODEC",
+    "AUDIO_RECORDER_CODEC",
+    "VIDEO_FPS",
+    "VIDEO_QUALITY",
+    "VIDEO_LOW_RES_WIDTH",
+    "VIDEO_HIGH_RES_INTERVAL_MS",
+  }
+)
+
+_RELOAD_CHECK_INTERVAL_SECONDS = 2.0
+
+
+@dataclass
+class Tuning(Default):
+  """Performance knobs for the live demos.
+
+  Values are layered, with later layers taking precedence:
+
+  1. The defaults below.
+  2. The JSON file at `TUNING_FILE`, if set.
+  3. Environment variables with the same name as the field.
+  4. Per-page overrides from the `pages` section of the JSON file.
+
+  For example:
+
+      {
+        "VOICE_THRESHOLD": 0.02,
+        "pages": {"video_demo_v1": {"VIDEO_FPS": 1}}
+      }
+  """
+
+  # Gemini Live API
+  LIVE_HOST: str = "generativelanguage.googleapis.com"
+  LIVE_MODEL: str = "gemini-2.0-flash-exp"
+  # Websocket settings for the Gemini Live connection (see live/transport.py) and the
+  # event loop the sessions run on: "asyncio" or "uvloop".
+  LIVE_TRANSPORT_PROFILE: str = "default"
+  LIVE_EVENT_LOOP: str = "asyncio"
+
+  # Audio recorder. Gemini Live expects 16000hz PCM input.
+  AUDIO_TARGET_SAMPLE_RATE: int = 16000
+  AUDIO_BUFFER_SIZE: int = 4096
+  # Codec for the microphone audio sent to the server: "pcm", "mulaw" (2:1) or
+  # "adpcm" (4:1). The server decodes it back to PCM for Gemini.
+  AUDIO_RECORDER_CODEC: str = "pcm"
+  VOICE_DETECTION_ENABLED: bool = True
+  VOICE_THRESHOLD: float = 0.01
+  VOICE_HOLD_TIME_MS: int = 500
+
+  # Audio player. Gemini Live returns 24000hz PCM output.
+  AUDIO_PLAYER_SAMPLE_RATE: int = 24000
+  # Audio chunks that are already queued are merged into a single UI update, up to
+  # this many bytes (24000 bytes is 0.5s of 24000hz 16-bit audio).
+  AUDIO_MAX_COALESCED_BYTES: int = 24000
+  # Codec for the audio sent to the audio player: "adpcm" (4:1), "mulaw" (2:1) or
+  # "pcm". Falls back to "pcm" if the player can't decode it. Compressing costs CPU
+  # per listener, see benchmarks/codec_benchmark.py.
+  AUDIO_CODEC: str = "pcm"
+
+  # Video recorder
+  VIDEO_FPS: float = 2.0
+  VIDEO_QUALITY: float = 0.8
+  # Width of the frames streamed to Gemini, or 0 to stream full resolution frames.
+  # With a low resolution stream, the recorder also uploads a full resolution frame
+  # every `VIDEO_HIGH_RES_INTERVAL_MS`, and the server keeps the last
+  # `VIDEO_HIGH_RES_FRAMES` of them to send to Gemini when it needs the detail.
+  VIDEO_LOW_RES_WIDTH: int = 480
+  VIDEO_HIGH_RES_INTERVAL_MS: int = 1000
+  VIDEO_HIGH_RES_FRAMES: int = 3
+  # Frames over VIDEO_TRANSCODE_MAX_BYTES (base64) are scaled down on the server to fit
+  # the max width and height (see live/transcode.py). Requires Pillow.
+  VIDEO_TRANSCODE_ENABLED: bool = False
+  VIDEO_TRANSCODE_MAX_BYTES: int = 200_000
+  VIDEO_TRANSCODE_MAX_WIDTH: int = 1280
+  VIDEO_TRANSCODE_MAX_HEIGHT: int = 720
+  VIDEO_TRANSCODE_QUALITY: int = 80
+  VIDEO_TRANSCODE_WORKERS: int = 2
+  VIDEO_TRANSCODE_MAX_IN_FLIGHT: int = 1
+
+  # Listeners that fall this far behind the session's audio are dropped (see
+  # live/broadcast.py). 480000 bytes is 10s of 24000hz 16-bit audio.
+  BROADCAST_MAX_LAG_BYTES: int = 480_000
+
+  # How long a session keeps running without a consumer, e.g. while the app navigates to
+  # another demo page, so that the page can resume it. 0 stops it within a couple of seconds.
+  RESUME_GRACE_SECONDS: float = 30.0
+
+  # Upstream media. Audio is always sent first, and video frames fill what is left of
+  # this budget (base64 bytes per second). Frames older than the max age are dropped.
+  MEDIA_UPSTREAM_BYTES_PER_SECOND: int = 200_000
+  MEDIA_MAX_FRAME_AGE_MS: int = 1000
+
+  # Admission control (see live/admission.py). At most this many sessions connect to
+  # the Gemini Live API at a time, the rest wait in a queue. Set the slots dir to share
+  # the limit between workers. A media budget of 0 means upstream media is not limited
+  # beyond the per-session budget above.
+  ADMISSION_MAX_SESSIONS: int = 3
+  ADMISSION_SLOTS_DIR: str = ""
+  ADMISSION_MEDIA_BYTES_PER_SECOND: int = 0
+
+  # Event loop lag watchdog (see diagnostics/watchdog.py). Stalls longer than the
+  # threshold are captured with the stack of the blocking code.
+  WATCHDOG_ENABLED: bool = True
+  WATCHDOG_INTERVAL_MS: int = 50
+  WATCHDOG_THRESHOLD_MS: int = 100
+
+  # Memory diagnostics (see diagnostics/memory.py). Stack frames kept per allocation
+  # once tracemalloc snapshots are requested.
+  MEMORY_TRACEMALLOC_FRAMES: int = 5
+
+  # Graceful drain (see live/drain.py). How long sessions get to finish their turn.
+  DRAIN_DEADLINE_SECONDS: float = 20.0
+
+  # Session recording (see live/recording.py). Disabled unless a directory is set.
+  RECORDING_DIR: str = ""
+  RECORDING_SEGMENT_BYTES: int = 64 * 1024 * 1024
+  RECORDING_MAX_BUFFERED_BYTES: int = 8 * 1024 * 1024
+
+  def validate(self):
+    errors = []
+    if self.LIVE_TRANSPORT_PROFILE not in transport.PROFILES:
+      errors.append(f"LIVE_TRANSPORT_PROFILE must be one of {', '.join(transport.PROFILES)}")
+    if self.LIVE_EVENT_LOOP not in transport.EVENT_LOOPS:
+      errors.append(f"LIVE_EVENT_LOOP must be one of {', '.join(transport.EVENT_LOOPS)}")
+    if self.AUDIO_BUFFER_SIZE not in (256, 512, 1024, 2048, 4096, 8192, 16384):
+      errors.append("AUDIO_BUFFER_SIZE must be a power of two between 256 and 16384")
+    for name in ("AUDIO_TARGET_SAMPLE_RATE", "AUDIO_PLAYER_SAMPLE_RATE"):
+      if not 8000 <= getattr(self, name) <= 96000:
+        errors.append(f"{name} must be between 8000 and 96000")
+    if not 0 <= self.VOICE_THRESHOLD <= 1:
+      errors.append("VOICE_THRESHOLD must be between 0 and 1")
+    if self.VOICE_HOLD_TIME_MS < 0:
+      errors.append("VOICE_HOLD_TIME_MS must not be negative")
+    if self.AUDIO_MAX_COALESCED_BYTES < 0:
+      errors.append("AUDIO_MAX_COALESCED_BYTES must not be negative")
+    for name in ("AUDIO_CODEC", "AUDIO_RECORDER_CODEC"):
+      if getattr(self, name) not in codec.CODECS:
+        errors.append(f"{name} must be one of {', '.join(codec.CODECS)}")
+    if not 0 < self.VIDEO_FPS <= 30:
+      errors.append("VIDEO_FPS must be greater than 0 and at most 30")
+    if not 0 < self.VIDEO_QUALITY <= 1:
+      errors.append("VIDEO_QUALITY must be greater than 0 and at most 1")
+    if self.VIDEO_LOW_RES_WIDTH < 0:
+      errors.append("VIDEO_LOW_RES_WIDTH must not be negative")
+    for name in ("VIDEO_HIGH_RES_INTERVAL_MS", "VIDEO_HIGH_RES_FRAMES"):
+      if getattr(self, name) <= 0:
+        errors.append(f"{name} must be greater than 0")
+    for name in (
+      "VIDEO_TRANSCODE_MAX_BYTES",
+      "VIDEO_TRANSCODE_MAX_WIDTH",
+      "VIDEO_TRANSCODE_MAX_HEIGHT",
+      "VIDEO_TRANSCODE_WORKERS",
+      "VIDEO_TRANSCODE_MAX_IN_FLIGHT",
+    ):
+      if getattr(self, name) <= 0:
+        errors.append(f"{name} must be greater than 0")
+    if not 1 <= self.VIDEO_TRANSCODE_QUALITY <= 95:
+      errors.append("VIDEO_TRANSCODE_QUALITY must be between 1 and 95")
+    for name in ("MEDIA_UPSTREAM_BYTES_PER_SECOND", "MEDIA_MAX_FRAME_AGE_MS"):
+      if getattr(self, name) <= 0:
+        errors.append(f"{name} must be greater than 0")
+    if self.BROADCAST_MAX_LAG_BYTES <= 0:
+      errors.append("BROADCAST_MAX_LAG_BYTES must be greater than 0")
+    if self.RESUME_GRACE_SECONDS < 0:
+      errors.append("RESUME_GRACE_SECONDS must not be negative")
+    if self.ADMISSION_MAX_SESSIONS <= 0:
+      errors.append("ADMISSION_MAX_SESSIONS must be greater than 0")
+    if self.ADMISSION_MEDIA_BYTES_PER_SECOND < 0:
+      errors.append("ADMISSION_MEDIA_BYTES_PER_SECOND must not be negative")
+    for name in ("WATCHDOG_INTERVAL_MS", "WATCHDOG_THRESHOLD_MS"):
+      if getattr(self, name) <= 0:
+        errors.append(f"{name} must be greater than 0")
+    if self.MEMORY_TRACEMALLOC_FRAMES <= 0:
+      errors.append("MEMORY_TRACEMALLOC_FRAMES must be greater than 0")
+    if self.DRAIN_DEADLINE_SECONDS < 0:
+      errors.append("DRAIN_DEADLINE_SECONDS must not be negative")
+    for name in ("RECORDING_SEGMENT_BYTES", "RECORDING_MAX_BUFFERED_BYTES"):
+      if getattr(self, name) <= 0:
+        errors.append(f"{name} must be greater than 0")
+    if errors:
+      raise ValueError("Invalid tuning config: " + "; ".join(errors))
+
+
+_LOCK = threading.Lock()
+_loaded: Optional[dict[str, Any]] = None
+_file_mtime: Optional[float] = None
+_last_check = 0.0
+
+
+def get_tuning(page: Optional[str] = None) -> Tuning:
+  """Returns the current tuning with the overrides for the page applied.
+
+  Cheap enough to call on every render. Changes to the tuning file are picked up
+  within a few seconds, but only for the fields in `HOT_RELOADABLE`.
+  """
+  with _LOCK:
+    _maybe_reload()
+    base, page_overrides = _loaded["base"], _loaded["pages"]
+  overrides = page_overrides.get(page, {}) if page else {}
+  return replace(base, **overrides) if overrides else base
+
+
+def _maybe_reload():
+  global _loaded, _file_mtime, _last_check
+  now = time.monotonic()
+  if _loaded is not None and now - _last_check < _RELOAD_CHECK_INTERVAL_SECONDS:
+    return
+  _last_check = now
+
+  path = os.environ.get("TUNING_FILE")
+  mtime = os.path.getmtime(path) if path and os.path.exists(path) else None
+  if _loaded is not None and mtime == _file_mtime:
+    return
+
+  try:
+    loaded = _load(path if mtime is not None else None)
+  except (OSError, ValueError) as e:
+    if _loaded is None:
+      raise
+    # Keep serving the last good config rather than breaking running sessions.
+    print(f"Ignoring invalid tuning file {path}: {e}")
+    _file_mtime = mtime
+    return
+
+  if _loaded is not None:
+    loaded = _keep_static_fields(_loaded, loaded)
+  _loaded = loaded
+  _file_mtime = mtime
+
+
+def _load(path: Optional[str]) -> dict[str, Any]:
+  file_values: dict[str, Any] = {}
+  if path:
+    with open(path) as f:
+      file_values = json.load(f)
+  pages = file_values.pop("pages", {})
+
+  values = {**file_values, **_env_values()}
+  base = Tuning(**_coerce(values))
+  base.validate()
+
+  page_overrides = {}
+  for page, overrides in pages.items():
+    overrides = _coerce(overrides)
+    replace(base, **overrides).validate()
+    page_overrides[page] = overrides
+  return {"base": base, "pages": page_overrides}
+
+
+def _keep_static_fields(old: dict[str, Any], new: dict[str, Any]) -> dict[str, Any]:
+  static_values = {
+    f.name: getattr(old["base"], f.name) for f in fields(Tuning) if f.name not in HOT_RELOADABLE
+  }
+  pages = {
+    page: {name: value for name, value in overrides.items() if name in HOT_RELOADABLE}
+    for page, overrides in new["pages"].items()
+  }
+  for page, overrides in old["pages"].items():
+    static_overrides = {k: v for k, v in overrides.items() if k not in HOT_RELOADABLE}
+    pages[page] = {**pages.get(page, {}), **static_overrides}
+  return {"base": replace(new["base"], **static_values), "pages": pages}
+
+
+def _env_values() -> dict[str, str]:
+  return {f.name: os.environ[f.name] for f in fields(Tuning) if f.name in os.environ}
+
+
+def _coerce(values: dict[str, Any]) -> dict[str, Any]:
+  types = {f.name: f.type for f in fields(Tuning)}
+  coerced = {}
+  for name, value in values.items():
+    if name not in types:
+      raise ValueError(f"Unknown tuning field: {name}")
+    field_type = types[name]
+    if field_type is bool and isinstance(value, str):
+      if value.lower() not in ("1", "0", "true", "false", "yes", "no"):
+        raise ValueError(f"{name} must be a boolean, got {value!r}")
+      value = value.lower() in ("1", "true", "yes")
+    elif field_type in (int, float, str) and value is not None:
+      try:
+        value = field_type(value)
+      except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a {field_type.__name__}, got {value!r}")
+    coerced[name] = value
+  return coerced
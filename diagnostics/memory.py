@@ -0,0 +1,183 @@
+"""Memory accounting for the live sessions of a worker, to size worker session caps.
+
+- `sessions_report` counts the bytes each session holds in its buffers: the Gemini audio
+  queue and broadcast, the pending upstream media, the full resolution video frames, the
+  recorder buffer, the websocket write buffer and the last audio chunk held in the page
+  state. The biggest sessions come first.
+- Sessions that stopped but are still referenced are leaks. They are reported by
+  `leaked_sessions`.
+- `snapshot_diff` takes a tracemalloc snapshot and compares it with the previous one, so
+  the allocations that grew between two calls show up by source line. Tracing starts on
+  the first call and slows down allocations until `stop_tracing` is called.
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+import gc
+import threading
+import tracemalloc
+import weakref
+from typing import TYPE_CHECKING, Any
+
+from config.tuning import get_tuning
+from live import metrics
+from live import sessions
+
+if TYPE_CHECKING:
+  from live.gemini_live_loop import GeminiLiveLoop
+
+
+# How long to wait for the event loops of the sessions to measure them, in total.
+_MEASURE_TIMEOUT_SECONDS = 1.0
+
+_stopped_loops: "weakref.WeakSet[GeminiLiveLoop]" = weakref.WeakSet()
+
+_snapshot_lock = threading.Lock()
+_last_snapshot: tracemalloc.Snapshot | None = None
+
+
+def track_stopped(loop: "GeminiLiveLoop"):
+  """Marks a session as stopped, so it is reported as leaked while it stays alive."""
+  _stopped_loops.add(loop)
+
+
+def session_usage(loop: "GeminiLiveLoop") -> dict[str, int]:
+  """Returns the bytes held by a session. Must be called on the session's event loop."""
+  usage = {
+    "audio_queue": _queued_bytes(loop.audio_in_queue),
+    "broadcast_buffer": loop.broadcast.buffered_bytes() if loop.broadcast is not None else 0,
+    "media_queue": loop.media.pending_bytes() if loop.media is not None else 0,
+    "high_res_frames": sum(len(data) for _, data in loop.high_res_frames),
+    "recorder_buffer": loop.recorder.buffered_bytes if loop.recorder is not None else 0,
+    "websocket_write_buffer": _write_buffer_size(loop.ws),
+    "state_audio": loop.state_audio_bytes,
+  }
+  usage["total"] = sum(usage.values())
+  return usage
+
+
+def sessions_report(limit: int = 10) -> dict[str, Any]:
+  """Returns the `limit` sessions that hold the most bytes, and totals for all sessions.
+
+  Each event loop measures its own sessions, so the buffers aren't read while they are
+  being changed. The loops measure at the same time, within one overall timeout, and
+  sessions whose loop doesn't answer in time (e.g. because it is blocked) are counted as
+  `unmeasured`.
+  """
+  by_event_loop = collections.defaultdict(list)
+  for loop in sessions.all_sessions():
+    by_event_loop[loop.event_loop].append(loop)
+
+  reports = []
+  unmeasured = 0
+  futures = {}
+  for event_loop, loops in by_event_loop.items():
+    try:
+      futures[asyncio.run_coroutine_threadsafe(_measure(loops), event_loop)] = loops
+    except RuntimeError:
+      # The event loop has been closed.
+      unmeasured += len(loops)
+  done, not_done = concurrent.futures.wait(futures, timeout=_MEASURE_TIMEOUT_SECONDS)
+  for future in done:
+    try:
+      reports.extend(future.result())
+    except Exception:
+      unmeasured += len(futures[future])
+  for future in not_done:
+    future.cancel()
+    unmeasured += len(futures[future])
+
+  reports.sort(key=lambda report: report["bytes"]["total"], reverse=True)
+  totals = collections.Counter()
+  for report in reports:
+    totals.update(report["bytes"])
+  return {
+    "sessions": len(reports) + unmeasured,
+    "unmeasured": unmeasured,
+    "total_bytes": dict(totals),
+    "top": reports[:limit],
+  }
+
+
+def leaked_sessions() -> list[dict[str, Any]]:
+  """Returns the sessions that stopped but are still referenced, and who references them."""
+  gc.collect()
+  stopped = list(_stopped_loops)
+  return [
+    {
+      "session_id": loop.session_id,
+      "page": loop.page,
+      "referrers": sorted(
+        {type(referrer).__name__ for referrer in gc.get_referrers(loop) if referrer is not stopped}
+      ),
+    }
+    for loop in stopped
+  ]
+
+
+def snapshot_diff(limit: int = 20) -> dict[str, Any]:
+  """Takes a tracemalloc snapshot and returns the biggest changes since the last one.
+
+  The first call starts tracing with `MEMORY_TRACEMALLOC_FRAMES` frames per allocation,
+  so it has nothing to compare with.
+  """
+  global _last_snapshot
+  with _snapshot_lock:
+    if not tracemalloc.is_tracing():
+      tracemalloc.start(get_tuning().MEMORY_TRACEMALLOC_FRAMES)
+      _last_snapshot = None
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+      [tracemalloc.Filter(False, tracemalloc.__file__)]
+    )
+    previous, _last_snapshot = _last_snapshot, snapshot
+
+  traced, peak = tracemalloc.get_traced_memory()
+  result = {"traced_bytes": traced, "peak_bytes": peak, "top": []}
+  if previous is None:
+    return result
+  for stat in snapshot.compare_to(previous, "traceback")[:limit]:
+    result["top"].append(
+      {
+        "size_diff": stat.size_diff,
+        "size": stat.size,
+        "count_diff": stat.count_diff,
+        "traceback": stat.traceback.format(),
+      }
+    )
+  return result
+
+
+def stop_tracing():
+  global _last_snapshot
+  with _snapshot_lock:
+    tracemalloc.stop()
+    _last_snapshot = None
+
+
+async def _measure(loops: list["GeminiLiveLoop"]) -> list[dict[str, Any]]:
+  return [
+    {"session_id": loop.session_id, "page": loop.page, "bytes": session_usage(loop)}
+    for loop in loops
+  ]
+
+
+def _queued_bytes(queue: asyncio.Queue | None) -> int:
+  if queue is None:
+    return 0
+  # asyncio.Queue has no public way to look at its items.
+  return sum(len(item) for item in queue._queue)
+
+
+def _write_buffer_size(ws: Any) -> int:
+  transport = getattr(ws, "transport", None)
+  if transport is None or transport.is_closing():
+    return 0
+  return transport.get_write_buffer_size()
+
+
+def _stats() -> dict[str, Any]:
+  return {"tracing": tracemalloc.is_tracing(), "stopped_sessions_alive": len(_stopped_loops)}
+
+
+metrics.register("memory", _stats)
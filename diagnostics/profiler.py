@@ -0,0 +1,129 @@
+"""On-demand sampling profiler for a running worker.
+
+`profile` samples the Python stack of every thread for a number of seconds and returns
+the samples in the collapsed stack format read by flamegraph tools (one line per unique
+stack: `frame;frame;frame count`), e.g. `flamegraph.pl profile.collapsed > profile.svg`
+or speedscope.
+
+Every stack is prefixed with two synthetic frames so the flamegraph splits by what the
+worker was doing:
+
+- `handler:<name>`: The Mesop event handler on the stack (e.g. `initialize_gemini_api`),
+  or the session task (e.g. `GeminiLiveLoop.receive_audio`) for code that runs outside
+  of a handler.
+- `session:<id>`: The live session the code was running for.
+
+It is safe to run in production: sampling only reads the frames of other threads from a
+single background thread, at most one profile runs at a time, and the duration is
+capped. In "cpu" mode, which is the default, threads that didn't use CPU since the last
+sample (e.g. waiting on a socket) are skipped using their CPU clock.
+"""
+
+import collections
+import sys
+import threading
+import time
+from types import FrameType
+
+
+MAX_SECONDS = 60
+
+# Frames walked per stack, from the innermost one. Deeper stacks are cut off at the root.
+_MAX_STACK_DEPTH = 100
+
+_running = threading.Lock()
+
+
+class ProfilerBusyError(Exception):
+  """Raised when a profile is requested while another one is running."""
+
+
+def profile(seconds: float, *, interval: float = 0.01, mode: str = "cpu") -> str:
+  """Samples every thread for `seconds` and returns the collapsed stacks."""
+  if mode not in ("cpu", "wall"):
+    raise ValueError(f"Unknown profiler mode: {mode}")
+  seconds = min(seconds, MAX_SECONDS)
+  if not _running.acquire(blocking=False):
+    raise ProfilerBusyError("A profile is already running")
+  try:
+    counts = _sample(seconds, interval, mode)
+  finally:
+    _running.release()
+  return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+def _sample(seconds: float, interval: float, mode: str) -> collections.Counter:
+  counts = collections.Counter()
+  cpu_clocks: dict[int, int | None] = {}
+  last_cpu: dict[int, float] = {}
+  own_thread = threading.get_ident()
+  end = time.monotonic() + seconds
+  while time.monotonic() < end:
+    current_frames = sys._current_frames()
+    for thread_id, frame in current_frames.items():
+      if thread_id == own_thread:
+        continue
+      if mode == "cpu":
+        cpu = _thread_cpu_time(thread_id, cpu_clocks)
+        if cpu is not None:
+          idle = last_cpu.get(thread_id) == cpu
+          last_cpu[thread_id] = cpu
+          if idle:
+            continue
+      counts[_collapse(frame)] += 1
+    # Don't keep the frames of other threads alive while sleeping.
+    del current_frames
+    time.sleep(interval)
+  return counts
+
+
+def _thread_cpu_time(thread_id: int, cpu_clocks: dict[int, int | None]) -> float | None:
+  """Returns the CPU time of a thread, or None if the platform can't tell."""
+  if thread_id not in cpu_clocks:
+    try:
+      cpu_clocks[thread_id] = time.pthread_getcpuclockid(thread_id)
+    except (AttributeError, OSError):
+      cpu_clocks[thread_id] = None
+  clock = cpu_clocks[thread_id]
+  if clock is None:
+    return None
+  try:
+    return time.clock_gettime(clock)
+  except OSError:
+    # The thread exited.
+    return None
+
+
+def _collapse(frame: FrameType) -> str:
+  frames = []
+  page_handler = task_handler = session_id = None
+  f = frame
+  # Walks from the innermost frame outwards, so the outermost match wins. Reading
+  # `f_locals` builds a dict of the frame's locals, so it's only read for frames whose
+  # code has a `self` or `state` variable.
+  while f is not None:
+    if len(frames) == _MAX_STACK_DEPTH:
+      frames.append("(truncated)")
+      break
+    code = f.f_code
+    module = f.f_globals.get("__name__", "?")
+    frames.append(f"{module}:{code.co_name}")
+
+    if "self" in code.co_varnames:
+      owner = f.f_locals.get("self")
+      owner_session_id = getattr(owner, "session_id", None)
+      if isinstance(owner_session_id, str):
+        session_id = owner_session_id
+        task_handler = f"{type(owner).__name__}.{code.co_name}"
+    if module.startswith("pages."):
+      page_handler = code.co_name
+      if "state" in code.co_varnames:
+        state_session_id = getattr(f.f_locals.get("state"), "session_id", None)
+        if isinstance(state_session_id, str):
+          session_id = state_session_id
+    f = f.f_back
+
+  frames.append(f"session:{session_id or '-'}")
+  frames.append(f"handler:{page_handler or task_handler or '-'}")
+  # Collapsed stacks separate frames with ";" and the count with a space.
+  return ";".join(reversed(frames)).replace(" ", "_")
@@ -0,0 +1,181 @@
+"""Event loop lag watchdog.
+
+Every live session in a worker shares an event loop (see `live.session_loop`), so one
+handler that blocks the loop (e.g. decoding a large frame or a slow tool running inline)
+makes the audio of every session stutter. That loop is watched from the moment it
+starts, and the watchdog finds the handler:
+
+- A heartbeat coroutine on each watched loop wakes up every `interval` seconds and
+  records how late it woke up. That lag is reported by the "loop_watchdog" metrics gauge.
+- A monitor thread checks the heartbeats. Once a loop has not run its heartbeat for
+  `threshold` seconds, the loop is blocked right now, so the thread captures the stack
+  of the loop's thread. The stall is attributed to the running task, and to the session
+  and page found on the stack.
+- The last stalls are kept in a ring buffer, see `stalls()`.
+"""
+
+import asyncio
+import collections
+import sys
+import threading
+import time
+import traceback
+import weakref
+from typing import Any
+
+from config.tuning import get_tuning
+from live import metrics
+from live import sessions
+
+
+_MAX_STACK_FRAMES = 30
+
+
+class _Heartbeat:
+  def __init__(self, loop: asyncio.AbstractEventLoop):
+    self.loop = loop
+    self.thread_id = None
+    self.beat_at = time.monotonic()
+    self.lag = 0.0
+    self.max_lag = 0.0
+    # The stall being captured, so a long stall is only captured once and its total
+    # duration can be filled in once the loop runs again.
+    self.stall = None
+
+
+class LoopWatchdog:
+  def __init__(self, *, interval: float, threshold: float, capacity: int = 100):
+    self.interval = interval
+    self.threshold = threshold
+    self._lock = threading.Lock()
+    self._heartbeats: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _Heartbeat]" = (
+      weakref.WeakKeyDictionary()
+    )
+    self._stalls: collections.deque[dict[str, Any]] = collections.deque(maxlen=capacity)
+    self._stall_count = 0
+    self._monitor = None
+
+  def watch(self, loop: asyncio.AbstractEventLoop):
+    """Starts watching `loop`. Must be called on that loop; calling it again is a no-op."""
+    with self._lock:
+      if loop in self._heartbeats:
+        return
+      heartbeat = self._heartbeats[loop] = _Heartbeat(loop)
+      if self._monitor is None:
+        self._monitor = threading.Thread(
+          target=self._monitor_loop, name="loop-watchdog", daemon=True
+        )
+        self._monitor.start()
+    loop.create_task(self._heartbeat(heartbeat), name="loop-watchdog-heartbeat")
+
+  def stalls(self) -> list[dict[str, Any]]:
+    """Returns the captured stalls, oldest first."""
+    with self._lock:
+      return list(self._stalls)
+
+  def stats(self) -> dict[str, Any]:
+    with self._lock:
+      heartbeats = list(self._heartbeats.values())
+      stall_count = self._stall_count
+    return {
+      "loops": len(heartbeats),
+      "lag_ms": round(max((h.lag for h in heartbeats), default=0) * 1000, 1),
+      "max_lag_ms": round(max((h.max_lag for h in heartbeats), default=0) * 1000, 1),
+      "stalls": stall_count,
+    }
+
+  async def _heartbeat(self, heartbeat: _Heartbeat):
+    heartbeat.thread_id = threading.get_ident()
+    while True:
+      expected = time.monotonic() + self.interval
+      await asyncio.sleep(self.interval)
+      now = time.monotonic()
+      heartbeat.lag = max(now - expected, 0)
+      heartbeat.max_lag = max(heartbeat.max_lag, heartbeat.lag)
+      heartbeat.beat_at = now
+      if heartbeat.stall is not None:
+        with self._lock:
+          blocked_ms = round(heartbeat.lag * 1000, 1)
+          heartbeat.stall["blocked_ms"] = max(heartbeat.stall["blocked_ms"], blocked_ms)
+        heartbeat.stall = None
+
+  def _monitor_loop(self):
+    while True:
+      time.sleep(self.interval)
+      with self._lock:
+        heartbeats = list(self._heartbeats.values())
+      now = time.monotonic()
+      for heartbeat in heartbeats:
+        blocked_for = now - heartbeat.beat_at - self.interval
+        if blocked_for < self.threshold or heartbeat.stall is not None:
+          continue
+        if heartbeat.loop.is_closed() or not heartbeat.loop.is_running():
+          continue
+        stall = _capture(heartbeat, blocked_for)
+        if stall is not None:
+          with self._lock:
+            heartbeat.stall = stall
+            self._stalls.append(stall)
+            self._stall_count += 1
+
+
+def _capture(heartbeat: _Heartbeat, blocked_for: float) -> dict[str, Any] | None:
+  frame = sys._current_frames().get(heartbeat.thread_id)
+  if frame is None:
+    return None
+
+  # Walk up from the blocking code to find the session and page it belongs to.
+  session_id = page = None
+  f = frame
+  while f is not None and (session_id is None or page is None):
+    owner = f.f_locals.get("self")
+    if session_id is None and isinstance(getattr(owner, "session_id", None), str):
+      session_id = owner.session_id
+    module = f.f_globals.get("__name__", "")
+    if page is None and module.startswith("pages."):
+      page = module[len("pages.") :]
+    f = f.f_back
+  if page is None and session_id is not None:
+    # Blocking code in a session's own tasks (e.g. `receive_audio`) has no page frames.
+    loop = sessions.get(session_id)
+    page = loop.page if loop is not None else None
+
+  task = asyncio.tasks._current_tasks.get(heartbeat.loop)
+  return {
+    "at": time.time(),
+    "blocked_ms": round(blocked_for * 1000, 1),
+    "task": task.get_name() if task is not None else None,
+    "session_id": session_id,
+    "page": page,
+    "stack": traceback.format_list(traceback.extract_stack(frame, limit=_MAX_STACK_FRAMES)),
+  }
+
+
+_watchdog: LoopWatchdog | None = None
+_watchdog_lock = threading.Lock()
+
+
+def watch_current_loop():
+  """Watches the running event loop, if the watchdog is enabled by `WATCHDOG_ENABLED`."""
+  global _watchdog
+  tuning = get_tuning()
+  if not tuning.WATCHDOG_ENABLED:
+    return
+  with _watchdog_lock:
+    if _watchdog is None:
+      _watchdog = LoopWatchdog(
+        interval=tuning.WATCHDOG_INTERVAL_MS / 1000,
+        threshold=tuning.WATCHDOG_THRESHOLD_MS / 1000,
+      )
+  _watchdog.watch(asyncio.get_running_loop())
+
+
+def stalls() -> list[dict[str, Any]]:
+  return _watchdog.stalls() if _watchdog is not None else []
+
+
+def _stats() -> dict[str, Any]:
+  return _watchdog.stats() if _watchdog is not None else {"loops": 0}
+
+
+metrics.register("loop_watchdog", _stats)
@@ -0,0 +1,245 @@
+"""Admission control for Gemini Live sessions.
+
+Every session opens its own upstream websocket on the same API key, so opening sessions
+beyond the key's quota gets them dropped by the API. Instead, sessions ask for admission
+before connecting:
+
+- At most `ADMISSION_MAX_SESSIONS` sessions are connected at a time. The rest wait in a
+  FIFO queue and are admitted in order as sessions end, so pages can show a "waiting for
+  capacity" state instead of failing.
+- If `ADMISSION_SLOTS_DIR` is set, the limit is shared by every worker on the machine.
+  Each connected session holds an exclusive `flock` on one of `ADMISSION_MAX_SESSIONS`
+  slot files in that directory. The queue is only fair within a worker.
+- Upstream media of all sessions shares one `ADMISSION_MEDIA_BYTES_PER_SECOND` budget
+  (see `MediaBudget`). Audio always goes out, video waits for the budget.
+
+Saturation is exposed under the "admission" metrics provider.
+"""
+
+import asyncio
+import collections
+import functools
+import os
+import threading
+import time
+from typing import Any
+
+from config.tuning import get_tuning
+from live import metrics
+
+
+_LOCAL_SLOT = object()
+
+
+class Admission:
+  """A session's place in the admission queue, and then its slot once admitted."""
+
+  def __init__(self, controller: "AdmissionController", session_id: str):
+    self.session_id = session_id
+    self.admitted = False
+    self.requested_at = time.monotonic()
+    self._controller = controller
+    self._loop = asyncio.get_running_loop()
+    self._event = asyncio.Event()
+    self._slot = None
+
+  def position(self) -> int:
+    """Returns the 1-based position in the queue, or 0 once admitted."""
+    return self._controller._position(self)
+
+  async def wait(self, timeout: float) -> bool:
+    """Waits up to `timeout` seconds for admission and returns whether it was admitted."""
+    try:
+      await asyncio.wait_for(self._event.wait(), timeout)
+    except TimeoutError:
+      # Slots held by other workers are not signalled, so check for them again.
+      self._controller._pump()
+    return self.admitted
+
+  def release(self):
+    """Leaves the queue or frees the slot. Safe to call more than once."""
+    self._controller._release(self)
+
+  def hand_over(self, session_id: str) -> "Admission":
+    """Moves the slot to a new admission for `session_id`, e.g. a session replacing this one.
+
+    Releasing this admission is a no-op afterwards. If it isn't admitted, the new one is
+    queued like any other. Must be called on the new session's event loop.
+    """
+    return self._controller._hand_over(self, session_id)
+
+  def _grant(self, slot: Any):
+    self._slot = slot
+    self.admitted = True
+    self._loop.call_soon_threadsafe(self._event.set)
+
+
+class AdmissionController:
+  def __init__(self, max_sessions: int, *, slots_dir: str = ""):
+    self.max_sessions = max_sessions
+    self.slots_dir = slots_dir
+    self._lock = threading.Lock()
+    self._queue: collections.deque[Admission] = collections.deque()
+    self._active = 0
+    self._admitted_total = 0
+    self._wait_seconds_total = 0.0
+    if slots_dir:
+      os.makedirs(slots_dir, exist_ok=True)
+
+  def request(self, session_id: str) -> Admission:
+    """Queues a session for admission. Must be called on the session's event loop."""
+    admission = Admission(self, session_id)
+    with self._lock:
+      self._queue.append(admission)
+      self._pump_locked()
+    return admission
+
+  def stats(self) -> dict[str, Any]:
+    with self._lock:
+      return {
+        "active": self._active,
+        "waiting": len(self._queue),
+        "max_sessions": self.max_sessions,
+        "saturation": self._active / self.max_sessions,
+        "admitted_total": self._admitted_total,
+        "wait_seconds_total": round(self._wait_seconds_total, 3),
+      }
+
+  def _position(self, admission: Admission) -> int:
+    with self._lock:
+      try:
+        return self._queue.index(admission) + 1
+      except ValueError:
+        return 0
+
+  def _pump(self):
+    with self._lock:
+      self._pump_locked()
+
+  def _pump_locked(self):
+    # Only the head of the queue is admitted, so sessions get in in the order they asked.
+    while self._queue and self._active < self.max_sessions:
+      slot = self._acquire_slot()
+      if slot is None:
+        return
+      admission = self._queue.popleft()
+      self._active += 1
+      self._admitted_total += 1
+      self._wait_seconds_total += time.monotonic() - admission.requested_at
+      admission._grant(slot)
+
+  def _hand_over(self, admission: Admission, session_id: str) -> Admission:
+    successor = Admission(self, session_id)
+    with self._lock:
+      if not admission.admitted:
+        self._queue.append(successor)
+        self._pump_locked()
+        return successor
+      successor._slot, admission._slot = admission._slot, None
+      admission.admitted = False
+      successor.admitted = True
+    successor._event.set()
+    return successor
+
+  def _release(self, admission: Admission):
+    with self._lock:
+      if admission.admitted:
+        admission.admitted = False
+        self._active -= 1
+        self._release_slot(admission._slot)
+        admission._slot = None
+      elif admission in self._queue:
+        self._queue.remove(admission)
+      self._pump_locked()
+
+  def _acquire_slot(self) -> Any:
+    if not self.slots_dir:
+      return _LOCAL_SLOT
+    import fcntl
+
+    for i in range(self.max_sessions):
+      fd = os.open(os.path.join(self.slots_dir, f"slot-{i}.lock"), os.O_RDWR | os.O_CREAT)
+      try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+      except BlockingIOError:
+        os.close(fd)
+        continue
+      return fd
+    return None
+
+  def _release_slot(self, slot: Any):
+    if slot is not _LOCAL_SLOT and slot is not None:
+      # Closing the file descriptor releases the lock.
+      os.close(slot)
+
+
+class MediaBudget:
+  """Token bucket for the upstream media bytes of all sessions in the process."""
+
+  def __init__(self, bytes_per_second: int):
+    self.bytes_per_second = bytes_per_second
+    self._lock = threading.Lock()
+    self._tokens = float(bytes_per_second)
+    self._refilled_at = time.monotonic()
+    self._bytes_total = 0
+    self._denied_total = 0
+
+  def consume(self, size: int):
+    """Takes `size` bytes from the budget, going into debt if needed."""
+    with self._lock:
+      self._refill_locked()
+      self._tokens -= size
+      self._bytes_total += size
+
+  def try_consume(self, size: int) -> bool:
+    """Takes `size` bytes from the budget if they are available."""
+    with self._lock:
+      self._refill_locked()
+      if self._tokens < min(size, self.bytes_per_second):
+        self._denied_total += 1
+        return False
+      self._tokens -= size
+      self._bytes_total += size
+      return True
+
+  def stats(self) -> dict[str, Any]:
+    with self._lock:
+      self._refill_locked()
+      return {
+        "bytes_per_second": self.bytes_per_second,
+        "saturation": round(1 - max(self._tokens, 0) / self.bytes_per_second, 3),
+        "bytes_total": self._bytes_total,
+        "denied_total": self._denied_total,
+      }
+
+  def _refill_locked(self):
+    now = time.monotonic()
+    self._tokens = min(
+      self.bytes_per_second,
+      self._tokens + (now - self._refilled_at) * self.bytes_per_second,
+    )
+    self._refilled_at = now
+
+
+@functools.lru_cache(maxsize=1)
+def controller() -> AdmissionController:
+  tuning = get_tuning()
+  return AdmissionController(tuning.ADMISSION_MAX_SESSIONS, slots_dir=tuning.ADMISSION_SLOTS_DIR)
+
+
+@functools.lru_cache(maxsize=1)
+def media_budget() -> MediaBudget | None:
+  """Returns the process-wide media budget, or None if media is not limited."""
+  bytes_per_second = get_tuning().ADMISSION_MEDIA_BYTES_PER_SECOND
+  return MediaBudget(bytes_per_second) if bytes_per_second else None
+
+
+def _stats() -> dict[str, Any]:
+  stats = controller().stats()
+  budget = media_budget()
+  if budget is not None:
+    stats["media"] = budget.stats()
+  return stats
+
+
+metrics.register("admission", _stats)
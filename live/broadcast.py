@@ -0,0 +1,201 @@
+"""Fan-out of a session's Gemini audio and state patches to any number of listeners.
+
+The consumer that started a session reads its audio from the session's queue. Any other
+consumer, such as a second tab or an operator listening in, subscribes to the session's
+`AudioBroadcast` instead of opening a second upstream session:
+
+- Every chunk is kept once, as the immutable `bytes` received from Gemini, and shared by
+  all subscribers. Chunks are numbered in order.
+- Each subscriber reads at its own pace through a cursor into the shared chunks. Chunks
+  are freed once every subscriber has read them.
+- A subscriber that falls more than `max_lag_bytes` behind is dropped, so one stalled
+  listener can't make the session buffer without bound.
+- State patches from the session's tools (see `live.ui_effects`) are handed to every
+  subscriber, so listeners' pages show the same UI as the consumer's.
+
+The session publishes from its event loop, and subscribers may read from other event
+loops. The broadcast's state is guarded by a lock, and a subscriber is woken up on the
+event loop it subscribed on.
+"""
+
+import asyncio
+import collections
+import threading
+
+from live import metrics
+from live.ui_effects import StatePatch
+
+
+_STATS_LOCK = threading.Lock()
+_STATS = {"subscribers": 0, "buffered_chunks": 0, "buffered_bytes": 0, "dropped_subscribers": 0}
+
+
+def _update_stats(**deltas: int):
+  with _STATS_LOCK:
+    for name, delta in deltas.items():
+      _STATS[name] += delta
+
+
+def _stats() -> dict[str, int]:
+  with _STATS_LOCK:
+    return dict(_STATS)
+
+
+metrics.register("broadcast", _stats)
+
+
+class Subscription:
+  def __init__(self, broadcast: "AudioBroadcast", cursor: int):
+    self.cursor = cursor
+    self.dropped = False
+    self._broadcast = broadcast
+    self._loop = asyncio.get_running_loop()
+    self._ready = asyncio.Event()
+    # State patches published since the last `get`.
+    self._patches: list[StatePatch] = []
+
+  async def get(self, max_bytes: int) -> tuple[list[StatePatch], list[bytes]] | None:
+    """Waits for the next state patches or chunks.
+
+    Returns the pending state patches and the next chunks, up to `max_bytes` unless a
+    single chunk is bigger. Either can be empty. Returns None once the subscription was
+    dropped or closed, or the broadcast ended.
+    """
+    while True:
+      self._ready.clear()
+      if self.dropped:
+        return None
+      patches, chunks = self._broadcast._read(self, max_bytes)
+      if patches or chunks:
+        return patches, chunks
+      if self._broadcast.closed:
+        return None
+      await self._ready.wait()
+
+  def close(self):
+    self._broadcast._unsubscribe(self)
+
+  def _wake(self):
+    """Wakes up `get`. Can be called from any thread."""
+    try:
+      running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+      running_loop = None
+    if running_loop is self._loop:
+      self._ready.set()
+    elif not self._loop.is_closed():
+      self._loop.call_soon_threadsafe(self._ready.set)
+
+
+class AudioBroadcast:
+  def __init__(self, *, max_lag_bytes: int):
+    self.max_lag_bytes = max_lag_bytes
+    self.closed = False
+    self._lock = threading.Lock()
+    # (sequence number, total bytes published up to and including it, chunk).
+    self._chunks: collections.deque[tuple[int, int, bytes]] = collections.deque()
+    self._next_seq = 0
+    self._published_bytes = 0
+    self._subscribers: set[Subscription] = set()
+
+  def subscribe(self) -> Subscription:
+    """Subscribes to the chunks and state patches published from now on.
+
+    Must be called on the event loop that reads the subscription.
+    """
+    with self._lock:
+      subscription = Subscription(self, self._next_seq)
+      self._subscribers.add(subscription)
+    _update_stats(subscribers=1)
+    return subscription
+
+  def publish(self, chunk: bytes):
+    with self._lock:
+      if not self._subscribers:
+        # Nobody would read it.
+        self._next_seq += 1
+        self._published_bytes += len(chunk)
+        return
+      self._published_bytes += len(chunk)
+      self._chunks.append((self._next_seq, self._published_bytes, chunk))
+      self._next_seq += 1
+      _update_stats(buffered_chunks=1, buffered_bytes=len(chunk))
+
+      subscribers = list(self._subscribers)
+      for subscription in subscribers:
+        if self._lag_bytes(subscription) > self.max_lag_bytes:
+          subscription.dropped = True
+          self._unsubscribe_locked(subscription)
+          _update_stats(dropped_subscribers=1)
+    for subscription in subscribers:
+      subscription._wake()
+
+  def publish_patches(self, patches: list[StatePatch]):
+    """Hands state patches to every subscriber."""
+    if not patches:
+      return
+    with self._lock:
+      subscribers = list(self._subscribers)
+      for subscription in subscribers:
+        subscription._patches.extend(patches)
+    for subscription in subscribers:
+      subscription._wake()
+
+  def skip(self):
+    """Moves every subscriber past the published chunks, e.g. when Gemini is interrupted."""
+    with self._lock:
+      for subscription in self._subscribers:
+        subscription.cursor = self._next_seq
+      self._trim()
+
+  def close(self):
+    with self._lock:
+      self.closed = True
+      subscribers = list(self._subscribers)
+    for subscription in subscribers:
+      subscription._wake()
+
+  def buffered_bytes(self) -> int:
+    with self._lock:
+      return sum(len(chunk) for _, _, chunk in self._chunks)
+
+  def _lag_bytes(self, subscription: Subscription) -> int:
+    """Returns the bytes published that the subscriber hasn't read yet."""
+    if subscription.cursor >= self._next_seq:
+      return 0
+    _, end, chunk = self._chunks[subscription.cursor - self._chunks[0][0]]
+    return self._published_bytes - (end - len(chunk))
+
+  def _read(
+    self, subscription: Subscription, max_bytes: int
+  ) -> tuple[list[StatePatch], list[bytes]]:
+    chunks = []
+    size = 0
+    with self._lock:
+      patches, subscription._patches = subscription._patches, []
+      while subscription.cursor < self._next_seq:
+        _, _, chunk = self._chunks[subscription.cursor - self._chunks[0][0]]
+        if chunks and size + len(chunk) > max_bytes:
+          break
+        chunks.append(chunk)
+        size += len(chunk)
+        subscription.cursor += 1
+      if chunks:
+        self._trim()
+    return patches, chunks
+
+  def _unsubscribe(self, subscription: Subscription):
+    with self._lock:
+      self._unsubscribe_locked(subscription)
+
+  def _unsubscribe_locked(self, subscription: Subscription):
+    if subscription in self._subscribers:
+      self._subscribers.remove(subscription)
+      _update_stats(subscribers=-1)
+      self._trim()
+
+  def _trim(self):
+    oldest_cursor = min((s.cursor for s in self._subscribers), default=self._next_seq)
+    while self._chunks and self._chunks[0][0] < oldest_cursor:
+      _, _, chunk = self._chunks.popleft()
+      _update_stats(buffered_chunks=-1, buffered_bytes=-len(chunk))
@@ -0,0 +1,277 @@
+"""Compressed audio codecs for the audio sent from the server to the audio player.
+
+Gemini returns 16-bit PCM, which is base64 encoded into the Mesop state for every
+listener. The audio player can instead receive:
+
+- `mulaw`: G.711 µ-law, 8 bits per sample (2:1).
+- `adpcm`: IMA-ADPCM, 4 bits per sample (4:1). Every chunk is a self-contained block
+  with a 4 byte header, so the player can decode chunks independently.
+- `pcm`: uncompressed 16-bit little endian PCM.
+
+The codec is negotiated per session: the player reports the codecs it can decode and
+the server picks the preferred one with `negotiate`.
+
+The same codecs are used for the microphone audio the audio recorder sends to the
+server, which is decoded back to PCM before it is forwarded to Gemini.
+
+With NumPy (see requirements.txt), µ-law is encoded and decoded with vectorized table
+lookups and ADPCM nibbles are packed and unpacked with NumPy. The ADPCM prediction itself
+is inherently sequential (every sample depends on the previous one), so it stays a Python
+loop over precomputed tables. Pages encode on a worker thread rather than on the event
+loop, see `GeminiLiveLoop.next_events`. NumPy and the µ-law tables are loaded on first
+use, since `config.tuning` imports this module at startup for the codec names.
+"""
+
+import functools
+import struct
+import sys
+from array import array
+from typing import Callable, Iterable
+
+
+CODECS = ("adpcm", "mulaw", "pcm")
+
+Encoder = Callable[[bytes], bytes]
+
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def negotiate(client_codecs: Iterable[str], preferred: str) -> str:
+  """Returns the codec to use for a player that can decode `client_codecs`."""
+  client_codecs = set(client_codecs)
+  if preferred in client_codecs and preferred in CODECS:
+    return preferred
+  return "pcm"
+
+
+def new_encoder(codec: str) -> Encoder:
+  """Returns an encoder for a single audio stream.
+
+  Encoders may keep state between chunks, so use one encoder per stream.
+  """
+  if codec == "adpcm":
+    return AdpcmEncoder()
+  if codec == "mulaw":
+    return encode_mulaw
+  if codec == "pcm":
+    return bytes
+  raise ValueError(f"Unknown audio codec: {codec}")
+
+
+def decode(codec: str, data: bytes) -> bytes:
+  """Decodes a chunk back to 16-bit little endian PCM."""
+  if codec == "adpcm":
+    return decode_adpcm(data)
+  if codec == "mulaw":
+    return decode_mulaw(data)
+  if codec == "pcm":
+    return data
+  raise ValueError(f"Unknown audio codec: {codec}")
+
+
+# µ-law
+
+_MULAW_BIAS = 0x84
+_MULAW_CLIP = 32635
+
+
+def _lin2ulaw(sample: int) -> int:
+  sign = 0
+  if sample < 0:
+    sign = 0x80
+    sample = -sample
+  sample = min(sample, _MULAW_CLIP) + _MULAW_BIAS
+  exponent = sample.bit_length() - 8
+  mantissa = (sample >> (exponent + 3)) & 0x0F
+  return ~(sign | (exponent << 4) | mantissa) & 0xFF
+
+
+def _ulaw2lin(value: int) -> int:
+  value = ~value & 0xFF
+  exponent = (value >> 4) & 0x07
+  sample = ((((value & 0x0F) << 3) + _MULAW_BIAS) << exponent) - _MULAW_BIAS
+  return -sample if value & 0x80 else sample
+
+
+@functools.cache
+def _mulaw_encode_table():
+  """Indexed by the 16-bit sample reinterpreted as unsigned. A NumPy array if available."""
+  table = bytes(_lin2ulaw(i - 65536 if i >= 32768 else i) for i in range(65536))
+  np = _numpy()
+  return table if np is None else np.frombuffer(table, dtype=np.uint8)
+
+
+@functools.cache
+def _mulaw_decode_table():
+  table = array("h", (_ulaw2lin(i) for i in range(256)))
+  np = _numpy()
+  return table if np is None else np.array(table, dtype="<i2")
+
+
+def encode_mulaw(pcm: bytes) -> bytes:
+  np, table = _numpy(), _mulaw_encode_table()
+  if np is not None:
+    samples = np.frombuffer(pcm[: len(pcm) - len(pcm) % 2], dtype="<u2")
+    return table[samples].tobytes()
+  return bytes(table[s] for s in _samples(pcm, "H"))
+
+
+def decode_mulaw(data: bytes) -> bytes:
+  np, table = _numpy(), _mulaw_decode_table()
+  if np is not None:
+    return table[np.frombuffer(data, dtype=np.uint8)].tobytes()
+  return _pcm_bytes(array("h", (table[b] for b in data)))
+
+
+# IMA-ADPCM
+
+_ADPCM_HEADER = struct.Struct("<hBB")
+_ADPCM_ODD_SAMPLES = 0x01
+
+_ADPCM_INDEX_TABLE = (-1, -1, -1, -1, 2, 4, 6, 8) * 2
+
+# fmt: off
+_ADPCM_STEP_TABLE = (
+  7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45, 50, 55,
+  60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230, 253, 279, 307,
+  337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963, 1060, 1166, 1282, 1411,
+  1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327, 3660, 4026, 4428, 4871, 5358,
+  5894, 6484, 7132, 7845, 8630, 9493, 10442, 11487, 12635, 13899, 15289, 16818, 18500,
+  20350, 22385, 24623, 27086, 29794, 32767,
+)
+# fmt: on
+
+
+class AdpcmEncoder:
+  """Encodes 16-bit PCM chunks into IMA-ADPCM blocks.
+
+  The predictor carries over between chunks so there is no audible reset at chunk
+  boundaries, and every block header records the predictor state it starts from so each
+  block can still be decoded on its own.
+
+  Block layout: predictor (int16), step index (uint8), flags (uint8), followed by one
+  nibble per sample, low nibble first.
+  """
+
+  def __init__(self):
+    self.predictor = 0
+    self.index = 0
+
+  def __call__(self, pcm: bytes) -> bytes:
+    samples = _samples(pcm, "h")
+    flags = _ADPCM_ODD_SAMPLES if len(samples) % 2 else 0
+    header = _ADPCM_HEADER.pack(self.predictor, self.index, flags)
+
+    # The magnitude bits of the nibble are 4 * |diff| / step, and the predictor follows
+    # the decoder's tables so that both stay in step.
+    predictor, state = self.predictor, self.index * 16
+    step_table, deltas, next_indexes = _ADPCM_STEP_TABLE, _ADPCM_DELTAS, _ADPCM_NEXT_INDEXES
+    nibbles = bytearray(len(samples))
+    for i, sample in enumerate(samples):
+      diff = sample - predictor
+      if diff < 0:
+        nibble = 8 | min((-diff << 2) // step_table[state >> 4], 7)
+      else:
+        nibble = min((diff << 2) // step_table[state >> 4], 7)
+      key = state + nibble
+      predictor += deltas[key]
+      if predictor > 32767:
+        predictor = 32767
+      elif predictor < -32768:
+        predictor = -32768
+      state = next_indexes[key]
+      nibbles[i] = nibble
+
+    self.predictor, self.index = predictor, state >> 4
+    return header + _pack_nibbles(nibbles)
+
+
+def _pack_nibbles(nibbles: bytearray) -> bytes:
+  """Packs two nibbles per byte, low nibble first."""
+  if len(nibbles) % 2:
+    nibbles.append(0)
+  np = _numpy()
+  if np is not None:
+    unpacked = np.frombuffer(nibbles, dtype=np.uint8)
+    return (unpacked[0::2] | (unpacked[1::2] << 4)).tobytes()
+  return bytes(low | high << 4 for low, high in zip(nibbles[0::2], nibbles[1::2]))
+
+
+# Decoding only depends on the step index and the nibble, so the signed delta and the
+# next step index are precomputed for every (index, nibble) pair.
+def _adpcm_decode_tables() -> tuple[tuple[int, ...], tuple[int, ...]]:
+  deltas, next_indexes = [], []
+  for index, step in enumerate(_ADPCM_STEP_TABLE):
+    for nibble in range(16):
+      delta = step >> 3
+      if nibble & 4:
+        delta += step
+      if nibble & 2:
+        delta += step >> 1
+      if nibble & 1:
+        delta += step >> 2
+      deltas.append(-delta if nibble & 8 else delta)
+      next_indexes.append(min(max(index + _ADPCM_INDEX_TABLE[nibble], 0), 88) * 16)
+  return tuple(deltas), tuple(next_indexes)
+
+
+_ADPCM_DELTAS, _ADPCM_NEXT_INDEXES = _adpcm_decode_tables()
+
+
+def decode_adpcm(data: bytes) -> bytes:
+  predictor, index, flags = _ADPCM_HEADER.unpack_from(data)
+  # The header comes from the client, and the tables only cover the valid step indexes.
+  if index >= len(_ADPCM_STEP_TABLE):
+    raise ValueError(f"Invalid ADPCM step index: {index}")
+  count = (len(data) - _ADPCM_HEADER.size) * 2
+  if flags & _ADPCM_ODD_SAMPLES:
+    count -= 1
+
+  body = data[_ADPCM_HEADER.size :]
+  np = _numpy()
+  if np is not None:
+    packed = np.frombuffer(body, dtype=np.uint8)
+    nibbles = np.empty(len(packed) * 2, dtype=np.uint8)
+    nibbles[0::2] = packed & 0x0F
+    nibbles[1::2] = packed >> 4
+    nibbles = nibbles[:count].tolist()
+  else:
+    nibbles = [nibble for byte in body for nibble in (byte & 0x0F, byte >> 4)][:count]
+
+  deltas, next_indexes = _ADPCM_DELTAS, _ADPCM_NEXT_INDEXES
+  samples = array("h", bytes(count * 2))
+  # `state` is the step index times 16, so `state + nibble` indexes the tables.
+  state = index * 16
+  for i, nibble in enumerate(nibbles):
+    key = state + nibble
+    predictor += deltas[key]
+    if predictor > 32767:
+      predictor = 32767
+    elif predictor < -32768:
+      predictor = -32768
+    state = next_indexes[key]
+    samples[i] = predictor
+  return _pcm_bytes(samples)
+
+
+@functools.cache
+def _numpy():
+  """Returns NumPy, or None if it isn't installed."""
+  try:
+    import numpy
+  except ImportError:  # pragma: no cover - numpy is optional
+    return None
+  return numpy
+
+
+def _samples(pcm: bytes, typecode: str) -> array:
+  samples = array(typecode, pcm[: len(pcm) - len(pcm) % 2])
+  if not _LITTLE_ENDIAN:
+    samples.byteswap()
+  return samples
+
+
+def _pcm_bytes(samples: array) -> bytes:
+  if not _LITTLE_ENDIAN:
+    samples.byteswap()
+  return samples.tobytes()
@@ -0,0 +1,109 @@
+"""Graceful drain of the live sessions in this process, for restarts and rolling deploys.
+
+Once a drain starts:
+
+1. New sessions are no longer admitted. Pages that try to connect, or that are waiting
+   for capacity, are told the server is restarting.
+2. Every running session finishes its current turn (model audio and tool calls), up to
+   the drain deadline.
+3. The session then stops, which flushes its recorder and closes the upstream websocket
+   cleanly.
+
+A drain is started by SIGTERM (see `install_signal_handler`) or by the admin endpoint
+(see `server/admin.py`), and `progress()` reports how far along it is.
+"""
+
+import asyncio
+import os
+import signal
+import threading
+import time
+from typing import Any
+
+from config.tuning import get_tuning
+from live import metrics
+from live import sessions
+
+
+_LOCK = threading.Lock()
+_draining = threading.Event()
+_started_at = 0.0
+_deadline = 0.0
+_sessions_at_start = 0
+
+
+def is_draining() -> bool:
+  return _draining.is_set()
+
+
+def start_drain(deadline_seconds: float | None = None) -> dict[str, Any]:
+  """Starts draining every session. Calling it again while draining has no effect."""
+  global _started_at, _deadline, _sessions_at_start
+  with _LOCK:
+    if not _draining.is_set():
+      if deadline_seconds is None:
+        deadline_seconds = get_tuning().DRAIN_DEADLINE_SECONDS
+      _started_at = time.monotonic()
+      _deadline = _started_at + deadline_seconds
+      running = sessions.all_sessions()
+      _sessions_at_start = len(running)
+      _draining.set()
+      for loop in running:
+        asyncio.run_coroutine_threadsafe(loop.drain(_deadline), loop.event_loop)
+  return progress()
+
+
+def progress() -> dict[str, Any]:
+  with _LOCK:
+    if not _draining.is_set():
+      return {"draining": False}
+    remaining = len(sessions.all_sessions())
+    return {
+      "draining": True,
+      "done": remaining == 0,
+      "elapsed_seconds": round(time.monotonic() - _started_at, 3),
+      "deadline_in_seconds": round(max(_deadline - time.monotonic(), 0), 3),
+      "sessions_at_start": _sessions_at_start,
+      "sessions_remaining": remaining,
+    }
+
+
+def wait(timeout: float) -> bool:
+  """Blocks until every session has stopped or `timeout` seconds pass."""
+  end = time.monotonic() + timeout
+  while sessions.all_sessions():
+    if time.monotonic() >= end:
+      return False
+    time.sleep(0.1)
+  return True
+
+
+def install_signal_handler():
+  """Drains on SIGTERM before handing the signal to the previous handler.
+
+  Under gunicorn this must be called in the worker (e.g. from `wsgi.py` without
+  `--preload`), after gunicorn has installed its own handlers, which then stop the
+  worker once the drain has had `DRAIN_DEADLINE_SECONDS`. Keep gunicorn's
+  `--graceful-timeout` above the drain deadline.
+  """
+  previous = signal.getsignal(signal.SIGTERM)
+
+  def handle_sigterm(signum, frame):
+    start_drain()
+    if callable(previous):
+      previous(signum, frame)
+      return
+
+    # Nothing else handles SIGTERM (e.g. `mesop main.py`), so exit once the drain is
+    # done rather than right away.
+    def exit_when_drained():
+      wait(get_tuning().DRAIN_DEADLINE_SECONDS + 1)
+      signal.signal(signal.SIGTERM, signal.SIG_DFL)
+      os.kill(os.getpid(), signal.SIGTERM)
+
+    threading.Thread(target=exit_when_drained, name="drain-exit", daemon=True).start()
+
+  signal.signal(signal.SIGTERM, handle_sigterm)
+
+
+metrics.register("drain", progress)
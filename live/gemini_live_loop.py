@@ -0,0 +1,749 @@
+"""Gemini Live API session over websockets, shared by the demo pages.
+
+This is based off the examples at:
+
+- https://github.com/google-gemini/cookbook/blob/main/gemini-2/websockets/live_api_starter.py
+- https://github.com/google-gemini/cookbook/blob/main/gemini-2/live_api_tool_use.ipynb
+"""
+
+import asyncio
+import base64
+import collections
+import contextlib
+import json
+import os
+import time
+import traceback
+from dataclasses import dataclass
+from typing import Any
+
+from config.tuning import get_tuning
+from diagnostics import memory
+from live import admission
+from live import codec
+from live import drain
+from live import recording
+from live import sessions
+from live import transcode
+from live import transport
+from live.broadcast import AudioBroadcast
+from live.media_scheduler import MediaScheduler
+from live.ui_effects import SetState, StatePatch, UiEffectQueue
+
+
+_API_KEY = os.getenv("GOOGLE_API_KEY")
+
+DEFAULT_SETUP = {"model": f"models/{get_tuning().LIVE_MODEL}"}
+
+# How often a waiting session refreshes its queue position.
+_ADMISSION_POLL_SECONDS = 1.0
+
+# How often a draining session checks whether its turn is done.
+_DRAIN_POLL_SECONDS = 0.1
+
+# How often a session checks how long it has been without a consumer.
+_RESUME_POLL_SECONDS = 1.0
+
+# Full resolution frames older than this many capture intervals are not sent, e.g.
+# because the camera was turned off since.
+_HIGH_RES_MAX_AGE_INTERVALS = 2
+
+
+async def _encode(encoder: codec.Encoder, pcm: bytes) -> bytes:
+  """Encodes audio for the player on a worker thread, since the event loop is shared.
+
+  Compressing is CPU bound (see `live.codec`), and would otherwise delay every other
+  session on the loop. PCM is passed through as is.
+  """
+  if encoder is bytes:
+    return pcm
+  return await asyncio.to_thread(encoder, pcm)
+
+
+def _gemini_bidi_websocket_uri() -> str:
+  host = get_tuning().LIVE_HOST
+  return f"wss://{host}/ws/google.ai.generativelanguage.v1alpha.GenerativeService.BidiGenerateContent?key={_API_KEY}"
+
+
+@dataclass(frozen=True)
+class SetAudioCodec:
+  """Switches the codec of the audio sent to the audio player.
+
+  Goes through the UI effect queue so the page state and the encoded audio switch codec
+  on the same render.
+  """
+
+  codec: str
+
+  def apply(self, state: Any) -> None:
+    state.audio_codec = self.codec
+
+
+class GeminiLiveLoop:
+  """A single Gemini Live session.
+
+  Pages that declare tools in their setup subclass this and implement `call_tool`.
+  """
+
+  def __init__(self, session_id: str, setup: dict[str, Any] | None = None, *, page: str = ""):
+    self.session_id = session_id
+    self.setup = setup or DEFAULT_SETUP
+    # The page that started the session, for diagnostics.
+    self.page = page
+    self.ingest_token = sessions.new_token()
+    self.audio_in_queue = None
+    # Gemini's audio for consumers other than the one running the session. See `listen`.
+    self.broadcast = None
+    self.out_queue = None
+    self.ui_effects = None
+    self.media = None
+    self.transcoder = None
+    self.tool_tasks: dict[str, asyncio.Task] = {}
+    # Counts the frames queued, so a transcoded frame can tell if a newer one was queued.
+    self._video_frames = 0
+    self._transcode_tasks: set[asyncio.Task] = set()
+
+    # Whether Gemini is in the middle of a turn. A draining session waits for it to end.
+    self.turn_active = False
+    self._stopped = None
+    # Runs the upstream connection, and resolves once it is set up. See `start`.
+    self._session_task = None
+    self._connected: asyncio.Future[bool] | None = None
+    # The admission slot once admitted. Handed over to a session that replaces this one.
+    self._slot: admission.Admission | None = None
+    # Admission state patches of a pre-warmed session for the page that joins it.
+    self._admission_effects: UiEffectQueue | None = None
+    # A token of the generator that consumes the session's events, see `attach`.
+    self._consumer = None
+    # When the last consumer went away, as a `time.monotonic()` timestamp.
+    self._detached_at = 0.0
+    # An audio chunk taken off the queue that the last consumer went away before getting.
+    self._unsent_audio = None
+    self.audio_codec = "pcm"
+    self._audio_encoder = codec.new_encoder(self.audio_codec)
+
+    # The event loop the session runs on. Media from the ingest endpoint is handed over
+    # to this loop from the web server threads.
+    self.event_loop = None
+    self.ws = None
+
+    # Set while the session is recorded. See `live.recording`.
+    self.recorder = None
+
+    # Recent full resolution frames as (time.monotonic(), base64 JPEG), oldest first.
+    # Only low resolution frames are streamed, see `send_high_res_frame`.
+    self.high_res_frames: collections.deque[tuple[float, str]] = collections.deque(
+      maxlen=get_tuning(page).VIDEO_HIGH_RES_FRAMES
+    )
+
+    # The size of the last audio event, which the page keeps in its state until the
+    # next one. See `diagnostics.memory`.
+    self.state_audio_bytes = 0
+
+  def set_audio_codec(self, client_codecs: list[str]):
+    """Picks the audio codec for the player from the codecs it can decode."""
+    self.ui_effects.emit(SetAudioCodec(codec.negotiate(client_codecs, get_tuning().AUDIO_CODEC)))
+
+  async def startup(self):
+    setup_msg = {"setup": self.setup}
+    await self.ws.send(json.dumps(setup_msg))
+    raw_response = await self.ws.recv(decode=False)
+    json.loads(raw_response.decode("ascii"))
+
+  async def send_video_direct(self, data):
+    """Sends video input chunks to Gemini."""
+    msg = {
+      "realtime_input": {
+        "media_chunks": [
+          {
+            "data": data,
+            "mime_type": "image/jpeg",
+          }
+        ]
+      }
+    }
+    await self.ws.send(json.dumps(msg))
+    if self.recorder is not None:
+      self.recorder.record(recording.VIDEO_IN, base64.b64decode(data))
+
+  async def send_audio_direct(self, data):
+    """Sends audio input chunks to Gemini.
+
+    - Audio chunks need to be sent with a sample rate of 16000hz and be in PCM format.
+    - The audio data needs to be base64 encoded since we're using JSON.
+    """
+    msg = {
+      "realtime_input": {
+        "media_chunks": [
+          {
+            "data": data,
+            "mime_type": "audio/pcm",
+          }
+        ]
+      }
+    }
+    await self.ws.send(json.dumps(msg))
+    if self.recorder is not None:
+      self.recorder.record(recording.AUDIO_IN, base64.b64decode(data))
+
+  def queue_audio(self, data: str):
+    """Queues base64 encoded PCM audio to be sent ahead of any video."""
+    self.media.submit_audio(data)
+
+  def queue_video(self, data: str):
+    """Queues a base64 encoded JPEG frame, replacing any frame that hasn't been sent.
+
+    Frames over the transcoding budget are scaled down first (see `live.transcode`).
+    """
+    self._video_frames += 1
+    if self.transcoder is not None and self.transcoder.needs_transcode(data):
+      self._start_transcode(self._transcode_video(data, self._video_frames))
+      return
+    self.media.submit_video(data)
+
+  def _start_transcode(self, coro):
+    task = asyncio.create_task(coro, name=f"{self.session_id}:transcode")
+    # Referenced until done, since the event loop only keeps weak references to tasks.
+    self._transcode_tasks.add(task)
+    task.add_done_callback(self._transcode_done)
+
+  def _transcode_done(self, task: asyncio.Task):
+    self._transcode_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+      traceback.print_exception(task.exception())
+
+  async def _transcode_video(self, data: str, frame: int):
+    data = await self.transcoder.transcode(self.session_id, data)
+    # Don't replace a frame that was queued while this one was transcoded.
+    if data is not None and frame == self._video_frames:
+      self.media.submit_video(data)
+
+  def store_high_res_frame(self, data: str):
+    """Keeps a base64 encoded full resolution JPEG frame for `send_high_res_frame`."""
+    if self.transcoder is not None and self.transcoder.needs_transcode(data):
+      self._start_transcode(self._transcode_high_res_frame(data, time.monotonic()))
+      return
+    self.high_res_frames.append((time.monotonic(), data))
+
+  async def _transcode_high_res_frame(self, data: str, captured_at: float):
+    data = await self.transcoder.transcode(self.session_id, data)
+    if data is not None:
+      self.high_res_frames.append((captured_at, data))
+
+  async def send_high_res_frame(self, seconds_ago: float = 0) -> bool:
+    """Sends the full resolution frame captured closest to `seconds_ago` seconds ago.
+
+    Sent right away rather than through the media scheduler, so that it can't be replaced
+    by a low resolution frame and reaches Gemini ahead of the question that needs it.
+    Returns False if there is no recent enough frame.
+    """
+    now = time.monotonic()
+    interval = get_tuning(self.page).VIDEO_HIGH_RES_INTERVAL_MS / 1000
+    max_age = _HIGH_RES_MAX_AGE_INTERVALS * interval
+    frames = [(at, data) for at, data in self.high_res_frames if now - at <= max_age + seconds_ago]
+    if not frames:
+      return False
+    _, data = min(frames, key=lambda frame: abs(now - frame[0] - seconds_ago))
+    await self.send_video_direct(data)
+    return True
+
+  def queue_encoded_audio(self, data: bytes, audio_codec: str):
+    """Decodes audio from the audio recorder and queues it to be sent to Gemini.
+
+    `audio_codec` is the codec the recorder encoded the audio with (see `live.codec`).
+    Can be called from any thread, e.g. from sync Mesop event handlers. The audio is
+    decoded on the calling thread and handed over to the session's event loop, which
+    owns the media scheduler.
+    """
+    pcm = codec.decode(audio_codec, data)
+    self.event_loop.call_soon_threadsafe(self.queue_audio, base64.b64encode(pcm).decode("ascii"))
+
+  async def send_text_direct(self, text):
+    """Sends text input to Gemini.
+
+    Questions typed in are often about what the camera shows, so the latest full
+    resolution frame, if any, is sent first. Must run on the session's event loop, like
+    the recorder, so event handlers send text through `live.session_loop.call`.
+    """
+    await self.send_high_res_frame()
+    msg = {
+      "client_content": {
+        "turn_complete": True,
+        "turns": [{"role": "user", "parts": [{"text": text}]}],
+      }
+    }
+    await self.ws.send(json.dumps(msg))
+    if self.recorder is not None:
+      self.recorder.record_event({"type": "text_in", "text": text})
+
+  async def receive_audio(self):
+    """Process the audio responses returned by Gemini"""
+    async for raw_response in self.ws:
+      # Other things could be returned here, but we'll ignore those for now.
+      response = json.loads(raw_response.decode("ascii"))
+      try:
+        b64data = response["serverContent"]["modelTurn"]["parts"][0]["inlineData"]["data"]
+      except KeyError:
+        pass
+      else:
+        pcm_data = base64.b64decode(b64data)
+        self.turn_active = True
+        self._queue_output_audio(pcm_data)
+
+      try:
+        turn_complete = response["serverContent"]["turnComplete"]
+      except KeyError:
+        pass
+      else:
+        if turn_complete:
+          self.turn_active = False
+          if self.recorder is not None:
+            self.recorder.record_event({"type": "turn_complete"})
+          # If you interrupt the model, it sends an end_of_turn.
+          # For interruptions to work, we need to empty out the audio queue
+          # Because it may have loaded much more audio than has played yet.
+          # Without a consumer, the queue holds the audio a resumed page plays instead.
+          while self._consumer is not None and not self.audio_in_queue.empty():
+            self.audio_in_queue.get_nowait()
+          self.broadcast.skip()
+
+      try:
+        interrupted = response["serverContent"]["interrupted"]
+      except KeyError:
+        pass
+      else:
+        if interrupted:
+          self.turn_active = False
+          if self.recorder is not None:
+            self.recorder.record_event({"type": "interrupted"})
+          # The answer to any pending tool call would belong to the interrupted turn.
+          self.cancel_tool_calls()
+
+      tool_call_cancellation = response.pop("toolCallCancellation", None)
+      if tool_call_cancellation is not None:
+        self.cancel_tool_calls(tool_call_cancellation.get("ids", []))
+
+      tool_call = response.pop("toolCall", None)
+      if tool_call is not None:
+        if self.recorder is not None:
+          self.recorder.record_event({"type": "tool_call", "tool_call": tool_call})
+        self.start_tool_calls(tool_call)
+
+  def _queue_output_audio(self, pcm: bytes):
+    """Queues Gemini's audio for every consumer of the session, and records it."""
+    self.audio_in_queue.put_nowait(pcm)
+    self.broadcast.publish(pcm)
+    if self.recorder is not None:
+      self.recorder.record(recording.AUDIO_OUT, pcm)
+
+  def start_tool_calls(self, tool_call):
+    """Runs each function call in its own task so the receive loop keeps draining audio."""
+    for fc in tool_call["functionCalls"]:
+      task = asyncio.create_task(
+        self.handle_function_call(fc), name=f"{self.session_id}:tool:{fc['name']}"
+      )
+      self.tool_tasks[fc["id"]] = task
+      task.add_done_callback(lambda _, call_id=fc["id"]: self.tool_tasks.pop(call_id, None))
+
+  def cancel_tool_calls(self, ids=None):
+    """Cancels running function calls, either all of them or only the given ids."""
+    for call_id in list(self.tool_tasks) if ids is None else ids:
+      task = self.tool_tasks.pop(call_id, None)
+      if task is not None:
+        task.cancel()
+
+  async def call_tool(self, name: str, args: dict[str, Any]) -> Any:
+    """Runs a tool declared in the setup and returns its result."""
+    return f"Unknown tool: {name}"
+
+  async def handle_function_call(self, fc):
+    try:
+      response = await self.call_tool(fc["name"], fc.get("args", {}))
+    except Exception as e:
+      traceback.print_exception(e)
+      response = "The tool failed to run"
+
+    msg = {
+      "tool_response": {
+        "function_responses": [
+          {
+            "id": fc["id"],
+            "name": fc["name"],
+            "response": {
+              "result": response,
+            },
+          }
+        ]
+      }
+    }
+    await self.ws.send(json.dumps(msg))
+    if self.recorder is not None:
+      self.recorder.record_event({"type": "tool_response", "tool_response": msg["tool_response"]})
+
+  async def run(self):
+    """Yields audio chunks off the input queue and batches of state patches from tools.
+
+    Pending state patches are yielded before the next audio chunk, so tool-driven UI
+    updates show up right away even when no audio is flowing.
+
+    Runs on the sessions' event loop, see `live.session_loop`. Once connected, the session
+    runs in a task of its own rather than in this generator, so it outlives its consumer
+    for `RESUME_GRACE_SECONDS`. A page that navigates from another demo page within that
+    time picks the session up again through `join`.
+    """
+    async with contextlib.aclosing(self.start()) as admission_patches:
+      async for patches in admission_patches:
+        yield patches
+    # Shielded so the session still starts if the consumer goes away in the meantime.
+    if not await asyncio.shield(self._connected):
+      return
+    # Closed right away when this generator is, so the session notices it has no consumer.
+    async with contextlib.aclosing(self.attach()) as events:
+      async for event in events:
+        yield event
+
+  async def start(self, slot: admission.Admission | None = None):
+    """Starts the session and yields admission state patches until it is admitted.
+
+    Queues for admission unless given the `slot` of another session. Connecting then
+    goes on in the background. `_connected` resolves with whether the session started,
+    or with the error if connecting failed.
+    """
+    if self._connected is None:
+      self._connected = asyncio.get_running_loop().create_future()
+    try:
+      # Before connecting, so a transcoder that can't run fails the session right away.
+      self.transcoder = transcode.transcoder()
+    except BaseException:
+      if slot is not None:
+        slot.release()
+      raise
+
+    if drain.is_draining():
+      if slot is not None:
+        slot.release()
+      self._connected.set_result(False)
+      yield [SetState({"draining": True})]
+      return
+
+    if slot is None:
+      slot = admission.controller().request(self.session_id)
+    try:
+      async for patches in self.wait_for_admission(slot):
+        yield patches
+    finally:
+      if not slot.admitted:
+        # Gave up waiting, or the consumer went away before the session started.
+        slot.release()
+        self._connected.set_result(False)
+    if not slot.admitted:
+      return
+
+    self._slot = slot
+    self._stopped = asyncio.Event()
+    self._session_task = asyncio.create_task(
+      self._run_session(slot), name=f"{self.session_id}:session"
+    )
+
+  def prewarm(self, *, replaces: "GeminiLiveLoop | None" = None) -> asyncio.Task:
+    """Starts the session in the background, so a page can `join` it once it's needed.
+
+    A session that `replaces` another one takes over its admission slot instead of
+    queueing for one, and stops it once connected, or once connecting failed. Until it is
+    connected, the admission state patches are kept for the page that joins it. Like any
+    session without a consumer, it stops after `RESUME_GRACE_SECONDS` unless a page joins
+    it.
+
+    Must be called on the sessions' event loop (see `live.session_loop`), which the task
+    runs on. Returns the task starting the session, which resolves with whether it started.
+    """
+    slot = None
+    if replaces is not None and replaces._slot is not None:
+      slot = replaces._slot.hand_over(self.session_id)
+    self._connected = asyncio.get_running_loop().create_future()
+    self._admission_effects = UiEffectQueue()
+    return asyncio.create_task(self._prewarm(slot, replaces), name=f"{self.session_id}:prewarm")
+
+  async def _prewarm(self, slot: admission.Admission | None, replaces: "GeminiLiveLoop | None"):
+    try:
+      async with contextlib.aclosing(self.start(slot)) as admission_patches:
+        async for patches in admission_patches:
+          for patch in patches:
+            self._admission_effects.emit(patch)
+      return await asyncio.shield(self._connected)
+    except Exception as e:
+      traceback.print_exception(e)
+      return False
+    finally:
+      if replaces is not None:
+        # Its slot, if it still had one, belongs to this session now.
+        replaces.stop()
+
+  def stop(self):
+    """Stops the session right away, e.g. once a session that replaces it is connected."""
+    self._stopped.set()
+
+  async def _run_session(self, slot: admission.Admission):
+    """Runs the upstream connection until the session is stopped. Releases the `slot`."""
+    try:
+      async with (
+        await transport.connect(
+          _gemini_bidi_websocket_uri(),
+          transport.get_profile(get_tuning().LIVE_TRANSPORT_PROFILE),
+          additional_headers={"Content-Type": "application/json"},
+        ) as ws,
+        asyncio.TaskGroup() as tg,
+      ):
+        self.ws = ws
+        self.event_loop = asyncio.get_running_loop()
+        await self.startup()
+        self.start_recording()
+
+        tuning = get_tuning()
+        self.audio_in_queue = asyncio.Queue()
+        self.broadcast = AudioBroadcast(max_lag_bytes=tuning.BROADCAST_MAX_LAG_BYTES)
+        self.ui_effects = UiEffectQueue()
+
+        self.media = MediaScheduler(
+          self.send_audio_direct,
+          self.send_video_direct,
+          bytes_per_second=tuning.MEDIA_UPSTREAM_BYTES_PER_SECOND,
+          max_frame_age=tuning.MEDIA_MAX_FRAME_AGE_MS / 1000,
+          shared_budget=admission.media_budget(),
+        )
+
+        tasks = [
+          tg.create_task(self.receive_audio(), name=f"{self.session_id}:receive_audio"),
+          tg.create_task(self.media.run(), name=f"{self.session_id}:media"),
+        ]
+        sessions.register(self)
+        if drain.is_draining():
+          # The drain started while this session was connecting, so it missed it.
+          self._stopped.set()
+        self._connected.set_result(True)
+
+        await self._wait_until_stopped()
+
+        # The session was stopped, so close the upstream websocket.
+        for task in tasks:
+          task.cancel()
+
+    except asyncio.CancelledError:
+      pass
+    except ExceptionGroup as EG:
+      traceback.print_exception(EG)
+    except Exception as e:
+      if self._connected.done():
+        traceback.print_exception(e)
+      else:
+        # Connecting failed, so the page that started the session gets the error.
+        self._connected.set_exception(e)
+    finally:
+      if not self._connected.done():
+        self._connected.set_result(False)
+      # Ends the consumers, also when the session failed rather than being stopped.
+      self._stopped.set()
+      sessions.unregister(self)
+      if self.broadcast is not None:
+        self.broadcast.close()
+      self.cancel_tool_calls()
+      for task in list(self._transcode_tasks):
+        task.cancel()
+      slot.release()
+      if self.recorder is not None:
+        await self.recorder.close()
+      memory.track_stopped(self)
+
+  async def _wait_until_stopped(self):
+    """Waits until the session is stopped, or has had no consumer for too long."""
+    self._detached_at = time.monotonic()
+    while not self._stopped.is_set():
+      try:
+        await asyncio.wait_for(self._stopped.wait(), _RESUME_POLL_SECONDS)
+      except TimeoutError:
+        pass
+      detached_for = time.monotonic() - self._detached_at
+      if self._consumer is None and detached_for >= get_tuning().RESUME_GRACE_SECONDS:
+        self._stopped.set()
+
+  async def join(self):
+    """Yields the events of the session for another consumer.
+
+    If the session is still being pre-warmed (see `prewarm`), its admission state patches
+    come first, until it is connected. If the consumer of the session went away, e.g.
+    because the app navigated to another demo page, the new one takes over and resumes
+    with the audio the old one didn't get (see `attach`). Otherwise the new one plays along with it (see
+    `listen`).
+    """
+    if self._admission_effects is not None:
+      while not self._connected.done():
+        effects_ready = asyncio.ensure_future(self._admission_effects.wait())
+        try:
+          await asyncio.wait({effects_ready, self._connected}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+          effects_ready.cancel()
+        if patches := self._admission_effects.drain():
+          yield patches
+      if patches := self._admission_effects.drain():
+        yield patches
+      # Raises the error if connecting failed, like `run` does.
+      if not self._connected.result():
+        return
+    events = self.attach() if self._consumer is None else self.listen()
+    async with contextlib.aclosing(events):
+      async for event in events:
+        yield event
+
+  async def attach(self):
+    """Yields the session's events to its consumer, like `run` does once connected."""
+    consumer = object()
+    self._consumer = consumer
+    try:
+      yield self.ui_state_patches()
+      async for event in self.next_events():
+        yield event
+    finally:
+      if self._consumer is consumer:
+        self._consumer = None
+        self._detached_at = time.monotonic()
+
+  def ui_state_patches(self) -> list[StatePatch]:
+    """Returns state patches that bring the state of an attaching page up to date.
+
+    Another demo page starts out with its default state, e.g. the default codec, while the
+    session kept going. Subclasses whose tools change the page state extend this.
+    """
+    return [SetState({"audio_codec": self.audio_codec})]
+
+  async def listen(self):
+    """Yields the session's audio to a consumer other than the one that runs it.
+
+    A second tab or a listen-in view plays the session this way instead of opening a
+    second upstream session. Like `run`, it yields encoded audio chunks and batches of
+    state patches, including those of the session's tools. The audio follows the codec
+    of the session. Ends when the session stops, or when the listener falls too far
+    behind.
+    """
+    subscription = self.broadcast.subscribe()
+    audio_codec = self.audio_codec
+    encoder = codec.new_encoder(audio_codec)
+    try:
+      yield self.ui_state_patches()
+      max_bytes = get_tuning().AUDIO_MAX_COALESCED_BYTES
+      while (update := await subscription.get(max_bytes)) is not None:
+        patches, chunks = update
+        if audio_codec != self.audio_codec:
+          audio_codec = self.audio_codec
+          encoder = codec.new_encoder(audio_codec)
+          patches.append(SetState({"audio_codec": audio_codec}))
+        if patches:
+          yield patches
+        if chunks:
+          yield await _encode(encoder, b"".join(chunks))
+    finally:
+      subscription.close()
+
+  async def drain(self, deadline: float):
+    """Stops the session once Gemini's current turn is done, or at the `deadline`.
+
+    `deadline` is a `time.monotonic()` timestamp. See `live.drain`.
+    """
+    self.ui_effects.emit(SetState({"draining": True}))
+    while (self.turn_active or self.tool_tasks) and time.monotonic() < deadline:
+      await asyncio.sleep(_DRAIN_POLL_SECONDS)
+    self._stopped.set()
+
+  async def wait_for_admission(self, slot: admission.Admission):
+    """Yields `waiting_for_capacity` and `queue_position` state patches until admitted.
+
+    Nothing is yielded if the session is admitted right away. Gives up, without being
+    admitted, if the server starts draining.
+    """
+    position = 0
+    while not slot.admitted:
+      if drain.is_draining():
+        yield [SetState({"waiting_for_capacity": False, "draining": True})]
+        return
+      if slot.position() != position:
+        position = slot.position()
+        yield [SetState({"waiting_for_capacity": True, "queue_position": position})]
+      await slot.wait(_ADMISSION_POLL_SECONDS)
+    if position:
+      yield [SetState({"waiting_for_capacity": False, "queue_position": 0})]
+
+  def start_recording(self):
+    """Starts recording the session if `RECORDING_DIR` is set."""
+    tuning = get_tuning()
+    if not tuning.RECORDING_DIR:
+      return
+    self.recorder = recording.SessionRecorder(
+      os.path.join(tuning.RECORDING_DIR, self.session_id),
+      meta={
+        "session_id": self.session_id,
+        "audio_in_sample_rate": tuning.AUDIO_TARGET_SAMPLE_RATE,
+        "audio_out_sample_rate": tuning.AUDIO_PLAYER_SAMPLE_RATE,
+      },
+      segment_bytes=tuning.RECORDING_SEGMENT_BYTES,
+      max_buffered_bytes=tuning.RECORDING_MAX_BUFFERED_BYTES,
+    )
+    self.recorder.start()
+
+  async def next_events(self):
+    audio_get = None
+    stopped = asyncio.ensure_future(self._stopped.wait())
+    try:
+      if self._unsent_audio is not None:
+        bytestream, self._unsent_audio = self._unsent_audio, None
+        yield await _encode(self._audio_encoder, bytestream)
+      while True:
+        if audio_get is None:
+          audio_get = asyncio.ensure_future(self.audio_in_queue.get())
+        effects_ready = asyncio.ensure_future(self.ui_effects.wait())
+        await asyncio.wait({audio_get, effects_ready, stopped}, return_when=asyncio.FIRST_COMPLETED)
+        effects_ready.cancel()
+
+        patches = self.ui_effects.drain()
+        for patch in patches:
+          if isinstance(patch, SetAudioCodec) and patch.codec != self.audio_codec:
+            self.audio_codec = patch.codec
+            self._audio_encoder = codec.new_encoder(patch.codec)
+        if patches:
+          # Listeners follow the session's codec on their own, see `listen`.
+          self.broadcast.publish_patches([p for p in patches if not isinstance(p, SetAudioCodec)])
+          yield patches
+        if audio_get.done():
+          bytestream = audio_get.result()
+          audio_get = None
+          encoded = await _encode(self._audio_encoder, self._coalesce_audio(bytestream))
+          self.state_audio_bytes = len(encoded)
+          yield encoded
+        if stopped.done():
+          # Send the rest of the audio of the last turn before stopping.
+          remaining = []
+          while not self.audio_in_queue.empty():
+            remaining.append(self.audio_in_queue.get_nowait())
+          if remaining:
+            yield await _encode(self._audio_encoder, b"".join(remaining))
+          return
+    finally:
+      stopped.cancel()
+      if audio_get is not None:
+        if audio_get.done() and not audio_get.cancelled():
+          # Taken off the queue for a consumer that went away, so the next one gets it.
+          self._unsent_audio = audio_get.result()
+        audio_get.cancel()
+
+  def _coalesce_audio(self, bytestream: bytes) -> bytes:
+    """Merges audio chunks that are already queued into one event.
+
+    Every event the page yields re-renders the whole page, so chunks that arrived
+    together are sent to the client as one update.
+    """
+    max_bytes = get_tuning().AUDIO_MAX_COALESCED_BYTES
+    chunks = [bytestream]
+    size = len(bytestream)
+    while size < max_bytes and not self.audio_in_queue.empty():
+      chunk = self.audio_in_queue.get_nowait()
+      chunks.append(chunk)
+      size += len(chunk)
+    return b"".join(chunks) if len(chunks) > 1 else bytestream
@@ -0,0 +1,156 @@
+"""Schedules the media a session sends to Gemini so that video never delays voice.
+
+Audio and video share one websocket, so a large JPEG frame that is being written holds
+up every audio chunk queued behind it. The scheduler sends one message at a time and
+always picks audio first:
+
+- Audio chunks are queued and sent as soon as the websocket is free.
+- Only the latest video frame is kept. A newer frame replaces one that hasn't been sent.
+- Video is limited to the bandwidth left over by audio in a token bucket of
+  `bytes_per_second`. Audio always goes out and may overdraw the bucket, which delays
+  the next frame instead.
+- Frames older than `max_frame_age` seconds are dropped since Gemini would be looking at
+  a stale picture.
+- If a `shared_budget` is given (see `live.admission.MediaBudget`), all sessions share
+  it in the same way: audio always draws from it and video waits for it.
+"""
+
+import asyncio
+import collections
+import threading
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable
+
+from live import metrics
+
+if TYPE_CHECKING:
+  from live.admission import MediaBudget
+
+
+# How long to wait before checking the shared budget again. It is refilled by every
+# session, so there is no single time at which it will have room.
+_SHARED_BUDGET_RETRY_SECONDS = 0.05
+
+_STATS_LOCK = threading.Lock()
+_STATS = {
+  "audio_chunks": 0,
+  "audio_bytes": 0,
+  "video_frames": 0,
+  "video_bytes": 0,
+  "video_superseded": 0,
+  "video_stale": 0,
+}
+
+
+def _update_stats(**deltas: int):
+  with _STATS_LOCK:
+    for name, delta in deltas.items():
+      _STATS[name] += delta
+
+
+def _stats() -> dict[str, int]:
+  with _STATS_LOCK:
+    return dict(_STATS)
+
+
+metrics.register("media_scheduler", _stats)
+
+
+class MediaScheduler:
+  """Sends the media of a single session.
+
+  `submit_audio` and `submit_video` must be called on the event loop of the session, and
+  `run` must be running as a task on that loop.
+  """
+
+  def __init__(
+    self,
+    send_audio: Callable[[str], Awaitable[None]],
+    send_video: Callable[[str], Awaitable[None]],
+    *,
+    bytes_per_second: int,
+    max_frame_age: float,
+    shared_budget: "MediaBudget | None" = None,
+    clock: Callable[[], float] = time.monotonic,
+  ):
+    self._send_audio = send_audio
+    self._send_video = send_video
+    self._bytes_per_second = bytes_per_second
+    self._max_frame_age = max_frame_age
+    self._shared_budget = shared_budget
+    self._clock = clock
+
+    self._audio: collections.deque[str] = collections.deque()
+    self._frame: tuple[float, str] | None = None
+    self._wakeup = asyncio.Event()
+    self._tokens = float(bytes_per_second)
+    self._refilled_at = clock()
+
+  def submit_audio(self, data: str):
+    """Queues a base64 encoded PCM chunk."""
+    self._audio.append(data)
+    self._wakeup.set()
+
+  def submit_video(self, data: str):
+    """Replaces the pending frame with a base64 encoded JPEG frame."""
+    if self._frame is not None:
+      _update_stats(video_superseded=1)
+    self._frame = (self._clock(), data)
+    self._wakeup.set()
+
+  def pending_bytes(self) -> int:
+    """Returns the size of the media that is waiting to be sent."""
+    frame_bytes = len(self._frame[1]) if self._frame is not None else 0
+    return sum(len(data) for data in self._audio) + frame_bytes
+
+  async def run(self):
+    while True:
+      await self._wakeup.wait()
+      self._wakeup.clear()
+      while self._audio or self._frame is not None:
+        self._refill()
+        if self._audio:
+          data = self._audio.popleft()
+          self._tokens -= len(data)
+          if self._shared_budget is not None:
+            self._shared_budget.consume(len(data))
+          _update_stats(audio_chunks=1, audio_bytes=len(data))
+          await self._send_audio(data)
+          continue
+
+        submitted_at, data = self._frame
+        age = self._clock() - submitted_at
+        if age > self._max_frame_age:
+          self._frame = None
+          _update_stats(video_stale=1)
+          continue
+
+        # Frames bigger than a second of budget go out once the bucket is full.
+        needed = min(len(data), self._bytes_per_second)
+        shared_budget_exhausted = False
+        if self._tokens >= needed and self._shared_budget is not None:
+          shared_budget_exhausted = not self._shared_budget.try_consume(len(data))
+        if self._tokens < needed or shared_budget_exhausted:
+          # Wait for the budget to refill, but wake up right away for new audio.
+          delay = max(needed - self._tokens, 0) / self._bytes_per_second
+          if shared_budget_exhausted:
+            delay = max(delay, _SHARED_BUDGET_RETRY_SECONDS)
+          try:
+            await asyncio.wait_for(self._wakeup.wait(), min(delay, self._max_frame_age - age))
+          except TimeoutError:
+            pass
+          self._wakeup.clear()
+          continue
+
+        self._frame = None
+        self._tokens -= len(data)
+        _update_stats(video_frames=1, video_bytes=len(data))
+        await self._send_video(data)
+
+  def _refill(self):
+    now = self._clock()
+    self._tokens = min(
+      self._bytes_per_second,
+      self._tokens + (now - self._refilled_at) * self._bytes_per_second,
+    )
+    self._refilled_at = now
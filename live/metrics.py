@@ -0,0 +1,85 @@
+"""Process-wide registry of stats providers.
+
+Components register a callable that returns a snapshot of their stats as a dict. Admin
+tooling and benchmarks can then read everything back in one place with `snapshot()`.
+"""
+
+import contextlib
+import functools
+import threading
+import time
+from collections import deque
+from typing import Any, Callable
+
+
+_LOCK = threading.Lock()
+_PROVIDERS: dict[str, Callable[[], dict[str, Any]]] = {}
+
+
+def register(name: str, provider: Callable[[], dict[str, Any]]):
+  """Registers a stats provider. Registering the same name again replaces it."""
+  with _LOCK:
+    _PROVIDERS[name] = provider
+
+
+def unregister(name: str):
+  with _LOCK:
+    _PROVIDERS.pop(name, None)
+
+
+def snapshot() -> dict[str, dict[str, Any]]:
+  """Returns the current stats of every registered provider."""
+  with _LOCK:
+    providers = list(_PROVIDERS.items())
+  return {name: provider() for name, provider in providers}
+
+
+class Timer:
+  """Keeps the most recent durations of an operation and reports percentiles."""
+
+  def __init__(self, name: str, window: int = 1000):
+    self._lock = threading.Lock()
+    self._durations: deque[float] = deque(maxlen=window)
+    self._count = 0
+    register(name, self.stats)
+
+  def record(self, seconds: float):
+    with self._lock:
+      self._durations.append(seconds)
+      self._count += 1
+
+  @contextlib.contextmanager
+  def time(self):
+    """Records how long the body of the `with` statement takes."""
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.record(time.perf_counter() - start)
+
+  def stats(self) -> dict[str, Any]:
+    with self._lock:
+      durations = sorted(self._durations)
+    if not durations:
+      return {"count": self._count}
+    return {
+      "count": self._count,
+      "p50_ms": durations[len(durations) // 2] * 1000,
+      "p95_ms": durations[int(len(durations) * 0.95)] * 1000,
+      "max_ms": durations[-1] * 1000,
+    }
+
+
+def timed(name: str):
+  """Decorator that records how long each call of the function takes."""
+  timer = Timer(name)
+
+  def decorator(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+      with timer.time():
+        return fn(*args, **kwargs)
+
+    return wrapper
+
+  return decorator
@@ -0,0 +1,295 @@
+"""Opt-in archive of what a Gemini Live session said and heard, for QA and incident review.
+
+A `SessionRecorder` tees the media and events of a session into a directory:
+
+- `meta.json`: The session id, start time and sample rates.
+- `segment-000000.bin`, ...: Append-only segment files. Every record is a small header
+  (kind, timestamp, length) followed by the payload. A new segment is started once the
+  current one reaches `segment_bytes`.
+- `index.bin`: Fixed size entries (timestamp, kind, segment, offset, length), one per
+  record, so a reader can binary search by time without scanning the segments.
+
+Recording never blocks the event loop. `record` only appends to an in-memory buffer and
+a background task writes the buffer in batches on a worker thread. If the disk can't
+keep up, the buffer is capped at `max_buffered_bytes` and new records are dropped (and
+counted) rather than growing memory.
+
+Recordings can be exported to WAV and JSONL offline:
+
+  python -m live.recording export <recording_dir> <output_dir>
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import struct
+import threading
+import time
+import wave
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+from live import metrics
+
+
+AUDIO_IN = 1
+AUDIO_OUT = 2
+VIDEO_IN = 3
+EVENT = 4
+
+_KIND_NAMES = {AUDIO_IN: "audio_in", AUDIO_OUT: "audio_out", VIDEO_IN: "video_in", EVENT: "event"}
+
+_RECORD_HEADER = struct.Struct("<BdI")
+_INDEX_ENTRY = struct.Struct("<dBIQI")
+
+_FLUSH_INTERVAL_SECONDS = 0.5
+
+
+_STATS_LOCK = threading.Lock()
+_STATS = {"active": 0, "records": 0, "bytes_written": 0, "dropped": 0, "buffered_bytes": 0}
+
+
+def _update_stats(**deltas: int):
+  with _STATS_LOCK:
+    for name, delta in deltas.items():
+      _STATS[name] += delta
+
+
+def _stats() -> dict[str, int]:
+  with _STATS_LOCK:
+    return dict(_STATS)
+
+
+metrics.register("recording", _stats)
+
+
+class SessionRecorder:
+  """Records a single session.
+
+  `record` and `record_event` must be called on the event loop of the session.
+  """
+
+  def __init__(
+    self,
+    directory: str,
+    *,
+    meta: dict[str, Any] | None = None,
+    segment_bytes: int = 64 * 1024 * 1024,
+    max_buffered_bytes: int = 8 * 1024 * 1024,
+  ):
+    self.directory = directory
+    self.meta = meta or {}
+    self.segment_bytes = segment_bytes
+    self.max_buffered_bytes = max_buffered_bytes
+    self.dropped = 0
+
+    self._started = time.monotonic()
+    self._buffer: list[tuple[float, int, bytes]] = []
+    self._buffered_bytes = 0
+    self._ready = asyncio.Event()
+    self._closed = False
+    self._task = None
+
+    # Only touched by the writer thread.
+    self._segment = -1
+    self._segment_file = None
+    self._index_file = None
+
+  @property
+  def buffered_bytes(self) -> int:
+    """The size of the records that haven't been written yet."""
+    return self._buffered_bytes
+
+  def start(self):
+    self._task = asyncio.create_task(self._write_loop())
+    _update_stats(active=1)
+
+  def record(self, kind: int, payload: bytes):
+    if self._closed:
+      return
+    if self._buffered_bytes + len(payload) > self.max_buffered_bytes:
+      self.dropped += 1
+      _update_stats(dropped=1)
+      return
+    self._buffer.append((time.monotonic() - self._started, kind, payload))
+    self._buffered_bytes += len(payload)
+    _update_stats(buffered_bytes=len(payload))
+    self._ready.set()
+
+  def record_event(self, event: dict[str, Any]):
+    self.record(EVENT, json.dumps(event).encode("utf-8"))
+
+  async def close(self):
+    """Writes out everything that is buffered and closes the files."""
+    if self._task is None or self._closed:
+      return
+    self._closed = True
+    self._ready.set()
+    await self._task
+    await asyncio.to_thread(self._close_files)
+    _update_stats(active=-1)
+
+  async def _write_loop(self):
+    await asyncio.to_thread(self._open)
+    while True:
+      await self._ready.wait()
+      if not self._closed:
+        # Give records a moment to accumulate so they are written in batches.
+        await asyncio.sleep(_FLUSH_INTERVAL_SECONDS)
+      self._ready.clear()
+      batch, self._buffer = self._buffer, []
+      if batch:
+        written = await asyncio.to_thread(self._write_batch, batch)
+        batch_bytes = sum(len(payload) for _, _, payload in batch)
+        self._buffered_bytes -= batch_bytes
+        _update_stats(records=len(batch), bytes_written=written, buffered_bytes=-batch_bytes)
+      if self._closed and not self._buffer:
+        return
+
+  def _open(self):
+    os.makedirs(self.directory, exist_ok=True)
+    with open(os.path.join(self.directory, "meta.json"), "w") as f:
+      json.dump({**self.meta, "started_at": time.time()}, f)
+    self._index_file = open(os.path.join(self.directory, "index.bin"), "ab")
+    self._next_segment()
+
+  def _next_segment(self):
+    if self._segment_file is not None:
+      self._segment_file.close()
+    self._segment += 1
+    self._segment_file = open(_segment_path(self.directory, self._segment), "ab")
+
+  def _write_batch(self, batch: list[tuple[float, int, bytes]]) -> int:
+    written = 0
+    index = bytearray()
+    for timestamp, kind, payload in batch:
+      if self._segment_file.tell() >= self.segment_bytes:
+        self._next_segment()
+      self._segment_file.write(_RECORD_HEADER.pack(kind, timestamp, len(payload)))
+      offset = self._segment_file.tell()
+      self._segment_file.write(payload)
+      index += _INDEX_ENTRY.pack(timestamp, kind, self._segment, offset, len(payload))
+      written += _RECORD_HEADER.size + len(payload)
+    self._segment_file.flush()
+    self._index_file.write(index)
+    self._index_file.flush()
+    return written
+
+  def _close_files(self):
+    for f in (self._segment_file, self._index_file):
+      if f is not None:
+        f.close()
+
+
+@dataclass(frozen=True)
+class IndexEntry:
+  timestamp: float
+  kind: int
+  segment: int
+  offset: int
+  length: int
+
+
+class Recording:
+  """Reads a recording written by `SessionRecorder`."""
+
+  def __init__(self, directory: str):
+    self.directory = directory
+    with open(os.path.join(directory, "meta.json")) as f:
+      self.meta = json.load(f)
+    with open(os.path.join(directory, "index.bin"), "rb") as f:
+      data = f.read()
+    # A crash can leave a partially written entry at the end of the index.
+    data = data[: len(data) - len(data) % _INDEX_ENTRY.size]
+    self.entries = [IndexEntry(*entry) for entry in _INDEX_ENTRY.iter_unpack(data)]
+    self._timestamps = [entry.timestamp for entry in self.entries]
+
+  def seek(self, timestamp: float) -> int:
+    """Returns the position of the first entry at or after `timestamp` seconds."""
+    return bisect.bisect_left(self._timestamps, timestamp)
+
+  def read(
+    self, start: int = 0, kinds: set[int] | None = None
+  ) -> Iterator[tuple[IndexEntry, bytes]]:
+    """Yields entries and their payloads from position `start`, in recording order."""
+    files = {}
+    try:
+      for entry in self.entries[start:]:
+        if kinds is not None and entry.kind not in kinds:
+          continue
+        f = files.get(entry.segment)
+        if f is None:
+          f = files[entry.segment] = open(_segment_path(self.directory, entry.segment), "rb")
+        f.seek(entry.offset)
+        yield entry, f.read(entry.length)
+    finally:
+      for f in files.values():
+        f.close()
+
+
+def export(directory: str, output_dir: str):
+  """Exports a recording to `audio_in.wav`, `audio_out.wav`, `events.jsonl` and frames.
+
+  Gaps in the audio (e.g. while the user is silent) are filled with silence, so both WAV
+  files line up with the timestamps in `events.jsonl`.
+  """
+  recording = Recording(directory)
+  os.makedirs(os.path.join(output_dir, "frames"), exist_ok=True)
+
+  sample_rates = {
+    AUDIO_IN: recording.meta.get("audio_in_sample_rate", 16000),
+    AUDIO_OUT: recording.meta.get("audio_out_sample_rate", 24000),
+  }
+  wavs = {}
+  for kind, rate in sample_rates.items():
+    wav = wave.open(os.path.join(output_dir, f"{_KIND_NAMES[kind]}.wav"), "wb")
+    wav.setnchannels(1)
+    wav.setsampwidth(2)
+    wav.setframerate(rate)
+    wavs[kind] = wav
+  samples_written = {AUDIO_IN: 0, AUDIO_OUT: 0}
+
+  try:
+    with open(os.path.join(output_dir, "events.jsonl"), "w") as events:
+      for entry, payload in recording.read():
+        if entry.kind in wavs:
+          gap = int(entry.timestamp * sample_rates[entry.kind]) - samples_written[entry.kind]
+          if gap > 0:
+            wavs[entry.kind].writeframes(bytes(gap * 2))
+            samples_written[entry.kind] += gap
+          wavs[entry.kind].writeframes(payload)
+          samples_written[entry.kind] += len(payload) // 2
+        elif entry.kind == VIDEO_IN:
+          frame = os.path.join("frames", f"{entry.timestamp:010.3f}.jpg")
+          with open(os.path.join(output_dir, frame), "wb") as f:
+            f.write(payload)
+          events.write(
+            json.dumps({"t": entry.timestamp, "type": "video_in", "frame": frame}) + "\n"
+          )
+        else:
+          events.write(json.dumps({"t": entry.timestamp, **json.loads(payload)}) + "\n")
+  finally:
+    for wav in wavs.values():
+      wav.close()
+
+
+def _segment_path(directory: str, segment: int) -> str:
+  return os.path.join(directory, f"segment-{segment:06d}.bin")
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Tools for session recordings.")
+  subparsers = parser.add_subparsers(dest="command", required=True)
+  export_parser = subparsers.add_parser("export", help="Export to WAV and JSONL.")
+  export_parser.add_argument("recording_dir")
+  export_parser.add_argument("output_dir")
+  args = parser.parse_args()
+
+  if args.command == "export":
+    export(args.recording_dir, args.output_dir)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,143 @@
+"""The event loop that runs the Gemini Live sessions of this process.
+
+Mesop runs every async event handler on an event loop of its own, which only runs while
+Mesop pulls the next event from that handler. Anything started on it, such as a session's
+upstream connection, its tool calls or the timer that stops it once its page is gone,
+freezes as soon as the page stops pulling. So the sessions run on one event loop in a
+background thread instead, which runs for as long as the process. Event handlers hand
+work over to it:
+
+- `call` runs a coroutine on the sessions' loop and returns its result on the caller's
+  loop.
+- `stream` runs an async generator, e.g. `GeminiLiveLoop.run`, on the sessions' loop and
+  yields its events on the caller's loop. The next event is only taken once the caller
+  asks for it, so audio keeps queueing (and coalescing) in the session while the page
+  renders.
+
+A page that went away can't say so, since its handler's loop no longer runs. So `stream`
+closes the generator once an event hasn't been picked up for `_CONSUMER_TIMEOUT_SECONDS`,
+and hands out an empty batch of state patches after `_KEEPALIVE_SECONDS` without events,
+which makes a page that is gone stop asking even while the session is quiet.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+from collections.abc import AsyncIterator, Coroutine
+from typing import Any, TypeVar
+
+from config.tuning import get_tuning
+from diagnostics import watchdog
+from live import transport
+
+
+T = TypeVar("T")
+
+# How long an event waits for its consumer to ask for the next one before the consumer is
+# considered gone. In between, the page only renders the event.
+_CONSUMER_TIMEOUT_SECONDS = 10.0
+
+# How long `stream` waits for an event before handing out an empty batch of patches.
+_KEEPALIVE_SECONDS = 5.0
+
+_END = object()
+
+_lock = threading.Lock()
+_loop: asyncio.AbstractEventLoop | None = None
+# Generators being closed, since the event loop only keeps weak references to tasks.
+_closing: set[asyncio.Task] = set()
+
+
+def event_loop() -> asyncio.AbstractEventLoop:
+  """Returns the sessions' event loop, starting its thread on first use."""
+  global _loop
+  with _lock:
+    if _loop is None:
+      _loop = transport.new_event_loop(get_tuning().LIVE_EVENT_LOOP)
+      # The loop every session shares, so the one whose lag matters. Handler loops that
+      # only run while their page pulls events would look stalled in between.
+      _loop.call_soon(watchdog.watch_current_loop)
+      threading.Thread(target=_run, args=(_loop,), name="live-sessions", daemon=True).start()
+    return _loop
+
+
+def _run(loop: asyncio.AbstractEventLoop):
+  asyncio.set_event_loop(loop)
+  loop.run_forever()
+
+
+def submit(coro: Coroutine[Any, Any, T]) -> concurrent.futures.Future[T]:
+  """Schedules `coro` on the sessions' loop from any thread."""
+  return asyncio.run_coroutine_threadsafe(coro, event_loop())
+
+
+async def call(coro: Coroutine[Any, Any, T]) -> T:
+  """Runs `coro` on the sessions' loop and waits for its result on the running loop."""
+  if asyncio.get_running_loop() is event_loop():
+    return await coro
+  return await asyncio.wrap_future(submit(coro))
+
+
+async def stream(agen: AsyncIterator[Any]) -> AsyncIterator[Any]:
+  """Iterates `agen` on the sessions' loop and yields its events on the running loop.
+
+  `agen` yields audio chunks and batches of state patches, like `GeminiLiveLoop.run`. It is
+  closed when this generator is, or once its consumer is gone (see the module docstring).
+  """
+  producer = _Producer(agen)
+  try:
+    while (event := await call(producer.next())) is not _END:
+      yield event
+  finally:
+    event_loop().call_soon_threadsafe(producer.close)
+
+
+class _Producer:
+  """The sessions' side of `stream`. Only used on the sessions' loop."""
+
+  def __init__(self, agen: AsyncIterator[Any]):
+    self._agen = agen
+    # The next event, which can take longer than a keepalive to arrive.
+    self._pending: asyncio.Future | None = None
+    # Closes the generator unless the consumer asks for the next event in time.
+    self._timeout: asyncio.TimerHandle | None = None
+    self._closed = False
+
+  async def next(self) -> Any:
+    if self._timeout is not None:
+      self._timeout.cancel()
+      self._timeout = None
+    if self._closed:
+      return _END
+    if self._pending is None:
+      self._pending = asyncio.ensure_future(anext(self._agen))
+    done, _ = await asyncio.wait({self._pending}, timeout=_KEEPALIVE_SECONDS)
+    if done:
+      pending, self._pending = self._pending, None
+      if pending.cancelled():
+        return _END
+      try:
+        event = pending.result()
+      except StopAsyncIteration:
+        self._closed = True
+        return _END
+    else:
+      event = []
+    self._timeout = asyncio.get_running_loop().call_later(_CONSUMER_TIMEOUT_SECONDS, self.close)
+    return event
+
+  def close(self):
+    """Closes the generator, e.g. because its consumer is gone. Safe to call more than once."""
+    if self._timeout is not None:
+      self._timeout.cancel()
+      self._timeout = None
+    if self._closed:
+      return
+    self._closed = True
+    if self._pending is not None:
+      # Cancelling the pending event ends the generator where it is waiting.
+      self._pending.cancel()
+      return
+    task = asyncio.ensure_future(self._agen.aclose())
+    _closing.add(task)
+    task.add_done_callback(_closing.discard)
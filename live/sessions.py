@@ -0,0 +1,103 @@
+"""Registry of the Gemini Live sessions running in this process.
+
+Every page registers its live loop here once the upstream connection is set up, so
+other entry points, such as the media ingest endpoint, can find a session by id.
+
+Sessions that are started ahead of the page that plays them, see `prewarm`, are only
+registered once connected. `find` finds them before that.
+"""
+
+import asyncio
+import hmac
+import secrets
+import threading
+import uuid
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+  from live.gemini_live_loop import GeminiLiveLoop
+
+
+_LOCK = threading.Lock()
+_SESSIONS: dict[str, "GeminiLiveLoop"] = {}
+_PREWARMING: dict[str, tuple["GeminiLiveLoop", asyncio.Task]] = {}
+
+# Set when the media ingest endpoint is mounted. See `server/app.py`.
+_INGEST_PREFIX = ""
+
+
+def new_session_id() -> str:
+  return str(uuid.uuid4())
+
+
+def new_token() -> str:
+  return secrets.token_urlsafe(24)
+
+
+def register(loop: "GeminiLiveLoop"):
+  with _LOCK:
+    _SESSIONS[loop.session_id] = loop
+
+
+def unregister(loop: "GeminiLiveLoop"):
+  with _LOCK:
+    if _SESSIONS.get(loop.session_id) is loop:
+      del _SESSIONS[loop.session_id]
+
+
+def get(session_id: str) -> "GeminiLiveLoop | None":
+  with _LOCK:
+    return _SESSIONS.get(session_id)
+
+
+async def prewarm(loop: "GeminiLiveLoop", *, replaces: "GeminiLiveLoop | None" = None):
+  """Connects the session in the background, so a page can join it without waiting.
+
+  See `GeminiLiveLoop.prewarm`. Must run on the sessions' event loop, see
+  `live.session_loop`.
+  """
+  task = loop.prewarm(replaces=replaces)
+  with _LOCK:
+    _PREWARMING[loop.session_id] = (loop, task)
+  task.add_done_callback(lambda _: _forget_prewarming(loop.session_id, task))
+
+
+def find(session_id: str) -> "GeminiLiveLoop | None":
+  """Returns the running session, or the session if it is still being pre-warmed."""
+  with _LOCK:
+    prewarming = _PREWARMING.get(session_id)
+    return prewarming[0] if prewarming is not None else _SESSIONS.get(session_id)
+
+
+def _forget_prewarming(session_id: str, task: asyncio.Task):
+  with _LOCK:
+    if session_id in _PREWARMING and _PREWARMING[session_id][1] is task:
+      del _PREWARMING[session_id]
+
+
+def authenticate(session_id: str, token: str) -> "GeminiLiveLoop | None":
+  """Returns the session if the token matches its ingest token."""
+  loop = get(session_id)
+  if loop is None or not hmac.compare_digest(loop.ingest_token, token):
+    return None
+  return loop
+
+
+def all_sessions() -> list["GeminiLiveLoop"]:
+  with _LOCK:
+    return list(_SESSIONS.values())
+
+
+def enable_ingest(prefix: str):
+  global _INGEST_PREFIX
+  _INGEST_PREFIX = prefix
+
+
+def ingest_url(session_id: str, kind: str) -> str:
+  """Returns the ingest URL for the session's media or "" if ingest is not mounted.
+
+  Recorders fall back to sending media through Mesop events when this is empty.
+  """
+  if not _INGEST_PREFIX:
+    return ""
+  return f"{_INGEST_PREFIX}/ingest/{session_id}/{kind}"
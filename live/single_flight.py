@@ -0,0 +1,55 @@
+"""Shares one run of a call between concurrent callers with the same key.
+
+The call runs in a task of its own rather than in the caller that started it, so a
+caller that is cancelled, e.g. because its session was interrupted, doesn't cancel the
+call for the other callers waiting on it. The call is only cancelled once every caller
+waiting on it is gone.
+
+Calls are only shared between callers on the same event loop, since a task can't be
+awaited from another one. Callers on other event loops, e.g. in other Mesop event
+handlers, each get a call of their own.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+
+class _Call:
+  def __init__(self, task: asyncio.Task):
+    self.task = task
+    self.waiters = 0
+
+
+class SingleFlight:
+  def __init__(self):
+    # Keyed by the event loop and the key, see the module docstring.
+    self._calls: dict[tuple[asyncio.AbstractEventLoop, Hashable], _Call] = {}
+
+  def in_flight(self, key: Hashable) -> bool:
+    """Returns whether a call for `key` is running on the running event loop."""
+    return (asyncio.get_running_loop(), key) in self._calls
+
+  async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+    """Returns the result of `fn()`, or of the call already running for `key`."""
+    key = (asyncio.get_running_loop(), key)
+    call = self._calls.get(key)
+    if call is None:
+      call = _Call(asyncio.ensure_future(fn()))
+      self._calls[key] = call
+      call.task.add_done_callback(lambda _: self._forget(key, call))
+
+    call.waiters += 1
+    try:
+      return await asyncio.shield(call.task)
+    finally:
+      call.waiters -= 1
+      if not call.waiters and not call.task.done():
+        # Nobody wants the result anymore. Forgotten right away so that a caller that
+        # comes along next starts a new call instead of getting the cancellation.
+        self._forget(key, call)
+        call.task.cancel()
+
+  def _forget(self, key: tuple[asyncio.AbstractEventLoop, Hashable], call: _Call):
+    if self._calls.get(key) is call:
+      del self._calls[key]
@@ -0,0 +1,147 @@
+"""Result cache for Gemini Live tool calls.
+
+Tool calls are keyed by an idempotency key built from the tool name, the arguments and
+the cache scope. Each tool gets its own LRU with a TTL, so a slow lookup only runs once
+while its result is fresh. Duplicate calls that arrive while the first one is still
+running wait on that call instead of running the tool again (see `live.single_flight`).
+
+The cache is meant to be used from the event loop that runs the Gemini Live sessions
+(see `live.session_loop`).
+"""
+
+import inspect
+import json
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Literal
+
+from live import metrics
+from live.single_flight import SingleFlight
+
+
+@dataclass(frozen=True)
+class ToolCachePolicy:
+  """How results of a single tool are cached.
+
+  - `ttl_seconds`: How long a result stays valid.
+  - `max_entries`: LRU capacity for the tool.
+  - `scope`: "session" keeps results per session. "global" shares them across sessions.
+  """
+
+  ttl_seconds: float = 60.0
+  max_entries: int = 128
+  scope: Literal["session", "global"] = "session"
+
+
+@dataclass
+class ToolCacheStats:
+  hits: int = 0
+  misses: int = 0
+  coalesced: int = 0
+  evictions: int = 0
+  expirations: int = 0
+
+  @property
+  def hit_rate(self) -> float:
+    """Share of calls that did not have to run the tool."""
+    calls = self.hits + self.coalesced + self.misses
+    return (self.hits + self.coalesced) / calls if calls else 0.0
+
+
+class ToolResultCache:
+  def __init__(
+    self,
+    policies: dict[str, ToolCachePolicy],
+    *,
+    name: str = "tool_cache",
+    clock: Callable[[], float] = time.monotonic,
+  ):
+    self._policies = policies
+    self._clock = clock
+    self._entries: dict[str, OrderedDict[str, tuple[float, Any]]] = {
+      tool_name: OrderedDict() for tool_name in policies
+    }
+    self._stats = {tool_name: ToolCacheStats() for tool_name in policies}
+    self._in_flight = SingleFlight()
+    metrics.register(name, self.stats)
+
+  def idempotency_key(self, tool_name: str, args: dict[str, Any], session_id: str) -> str:
+    """Builds the key that identifies equivalent calls of a tool."""
+    scope = session_id if self._policies[tool_name].scope == "session" else "*"
+    canonical_args = json.dumps(args, sort_keys=True, separators=(",", ":"), default=str)
+    return f"{tool_name}:{scope}:{canonical_args}"
+
+  async def call(
+    self, tool_name: str, args: dict[str, Any], fn: Callable[..., Any], *, session_id: str
+  ) -> Any:
+    """Returns the cached result for the call, otherwise runs `fn(**args)`.
+
+    Tools without a policy always run. Failed calls are not cached.
+    """
+    policy = self._policies.get(tool_name)
+    if policy is None:
+      return await _invoke(fn, args)
+
+    key = self.idempotency_key(tool_name, args, session_id)
+    stats = self._stats[tool_name]
+    entries = self._entries[tool_name]
+
+    cached = entries.get(key)
+    if cached is not None:
+      expires_at, value = cached
+      if expires_at > self._clock():
+        entries.move_to_end(key)
+        stats.hits += 1
+        return value
+      del entries[key]
+      stats.expirations += 1
+
+    if self._in_flight.in_flight(key):
+      stats.coalesced += 1
+    else:
+      stats.misses += 1
+
+    async def run_and_store():
+      value = await _invoke(fn, args)
+      self._store(tool_name, key, value)
+      return value
+
+    # Shared with duplicate calls, also across sessions for tools with a "global" scope.
+    return await self._in_flight.run(key, run_and_store)
+
+  def clear(self, session_id: str | None = None):
+    """Drops cached results, either all of them or only those of one session."""
+    for tool_name, entries in self._entries.items():
+      if session_id is None:
+        entries.clear()
+      elif self._policies[tool_name].scope == "session":
+        prefix = f"{tool_name}:{session_id}:"
+        for key in [key for key in entries if key.startswith(prefix)]:
+          del entries[key]
+
+  def stats(self) -> dict[str, Any]:
+    return {
+      tool_name: {
+        **asdict(stats),
+        "hit_rate": stats.hit_rate,
+        "size": len(self._entries[tool_name]),
+      }
+      for tool_name, stats in self._stats.items()
+    }
+
+  def _store(self, tool_name: str, key: str, value: Any):
+    policy = self._policies[tool_name]
+    entries = self._entries[tool_name]
+    entries[key] = (self._clock() + policy.ttl_seconds, value)
+    entries.move_to_end(key)
+    while len(entries) > policy.max_entries:
+      entries.popitem(last=False)
+      self._stats[tool_name].evictions += 1
+
+
+async def _invoke(fn: Callable[..., Any], args: dict[str, Any]) -> Any:
+  result = fn(**args)
+  if inspect.isawaitable(result):
+    result = await result
+  return result
@@ -0,0 +1,138 @@
+"""Runs Gemini Live tool handlers without blocking the event loop.
+
+Tools are registered with the pool they should run on:
+
+- "inline": Awaited directly on the event loop. Only for cheap or async tools.
+- "thread": Blocking I/O such as DB or HTTP clients without async support.
+- "process": CPU-bound work. The handler must be a picklable module-level function.
+  Workers are started by a fork server rather than forked from the web server, whose
+  other threads could hold locks at the time of the fork.
+
+Cancelling a call stops waiting for it right away. Calls that have not started yet are
+removed from the pool queue, but a call that is already running finishes in the
+background and its result is dropped.
+"""
+
+import asyncio
+import atexit
+import functools
+import inspect
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Literal
+
+from live import metrics
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+  fn: Callable[..., Any]
+  mode: Literal["inline", "thread", "process"] = "inline"
+
+
+@dataclass(frozen=True)
+class ToolExecutorConfig:
+  thread_workers: int = 4
+  process_workers: int = 2
+
+
+@dataclass
+class PoolStats:
+  max_workers: int
+  submitted: int = 0
+  in_flight: int = 0
+  peak_in_flight: int = 0
+  completed: int = 0
+  failed: int = 0
+  cancelled: int = 0
+
+  @property
+  def saturation(self) -> float:
+    """In-flight calls per worker. Anything above 1.0 means calls are queueing."""
+    return self.in_flight / self.max_workers if self.max_workers else 0.0
+
+
+class ToolExecutor:
+  def __init__(
+    self,
+    tools: dict[str, ToolSpec],
+    config: ToolExecutorConfig = ToolExecutorConfig(),
+    *,
+    name: str = "tool_executor",
+  ):
+    self._tools = tools
+    self._config = config
+    self._pools: dict[str, Executor] = {}
+    self._stats = {
+      "thread": PoolStats(max_workers=config.thread_workers),
+      "process": PoolStats(max_workers=config.process_workers),
+    }
+    metrics.register(name, self.stats)
+
+  async def call(self, tool_name: str, /, **args) -> Any:
+    """Runs the tool on the pool it was registered with."""
+    spec = self._tools[tool_name]
+    if spec.mode == "inline":
+      result = spec.fn(**args)
+      if inspect.isawaitable(result):
+        result = await result
+      return result
+
+    stats = self._stats[spec.mode]
+    future = asyncio.get_running_loop().run_in_executor(
+      self._pool(spec.mode), functools.partial(spec.fn, **args)
+    )
+    stats.submitted += 1
+    stats.in_flight += 1
+    stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+    try:
+      result = await future
+    except asyncio.CancelledError:
+      stats.cancelled += 1
+      raise
+    except Exception:
+      stats.failed += 1
+      raise
+    else:
+      stats.completed += 1
+      return result
+    finally:
+      stats.in_flight -= 1
+
+  def stats(self) -> dict[str, Any]:
+    return {
+      mode: {
+        "max_workers": stats.max_workers,
+        "submitted": stats.submitted,
+        "in_flight": stats.in_flight,
+        "peak_in_flight": stats.peak_in_flight,
+        "completed": stats.completed,
+        "failed": stats.failed,
+        "cancelled": stats.cancelled,
+        "saturation": stats.saturation,
+      }
+      for mode, stats in self._stats.items()
+    }
+
+  def shutdown(self, wait: bool = False):
+    for pool in self._pools.values():
+      pool.shutdown(wait=wait, cancel_futures=True)
+    self._pools.clear()
+
+  def _pool(self, mode: str) -> Executor:
+    """Pools are created on first use so unused pools never start workers."""
+    if mode not in self._pools:
+      max_workers = self._stats[mode].max_workers
+      if max_workers < 1:
+        raise ValueError(f"No workers configured for {mode} tools.")
+      if mode == "thread":
+        self._pools[mode] = ThreadPoolExecutor(
+          max_workers=max_workers, thread_name_prefix="tool-executor"
+        )
+      else:
+        self._pools[mode] = ProcessPoolExecutor(
+          max_workers=max_workers, mp_context=multiprocessing.get_context("forkserver")
+        )
+      atexit.register(self._pools[mode].shutdown, wait=False, cancel_futures=True)
+    return self._pools[mode]
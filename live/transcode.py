@@ -0,0 +1,164 @@
+"""Downscales oversized video frames before they are sent to Gemini.
+
+Browsers send whatever their camera produces, so a phone can send 4K JPEG frames that
+cost upstream bandwidth and model latency without helping the answer. When
+`VIDEO_TRANSCODE_ENABLED` is set, frames over `VIDEO_TRANSCODE_MAX_BYTES` (base64) are
+decoded, scaled down to fit `VIDEO_TRANSCODE_MAX_WIDTH` x `VIDEO_TRANSCODE_MAX_HEIGHT`
+and re-encoded at `VIDEO_TRANSCODE_QUALITY`. Frames under the budget are passed through.
+
+Transcoding runs in a process pool so it doesn't block the event loop. Each session has
+at most `VIDEO_TRANSCODE_MAX_IN_FLIGHT` frames being transcoded, and frames are dropped
+rather than queued once every worker is busy, since a newer frame will follow shortly.
+
+Requires Pillow (`pip install Pillow`).
+"""
+
+import asyncio
+import atexit
+import base64
+import collections
+import functools
+import io
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+from config.tuning import get_tuning
+from live import metrics
+
+
+class FrameTranscoder:
+  def __init__(
+    self,
+    *,
+    max_bytes: int,
+    max_width: int,
+    max_height: int,
+    quality: int,
+    workers: int,
+    max_in_flight_per_session: int,
+  ):
+    self.max_bytes = max_bytes
+    self.max_width = max_width
+    self.max_height = max_height
+    self.quality = quality
+    self.workers = workers
+    self.max_in_flight_per_session = max_in_flight_per_session
+    self._lock = threading.Lock()
+    self._pool = None
+    self._in_flight: collections.Counter[str] = collections.Counter()
+    self._stats = {
+      "transcoded": 0,
+      "dropped": 0,
+      "failed": 0,
+      "bytes_in": 0,
+      "bytes_out": 0,
+    }
+
+  def needs_transcode(self, data: str) -> bool:
+    return len(data) > self.max_bytes
+
+  async def transcode(self, session_id: str, data: str) -> str | None:
+    """Returns the frame scaled down to the budget, or None if it was dropped."""
+    if not self.needs_transcode(data):
+      return data
+    with self._lock:
+      saturated = self._in_flight.total() >= self.workers
+      if saturated or self._in_flight[session_id] >= self.max_in_flight_per_session:
+        self._stats["dropped"] += 1
+        return None
+      self._in_flight[session_id] += 1
+      if self._pool is None:
+        # Created on first use so that workers only start if a frame needs it. Workers
+        # are started by a fork server, since forking this process would copy the state
+        # of its other threads (e.g. held locks) into them.
+        self._pool = ProcessPoolExecutor(
+          max_workers=self.workers, mp_context=multiprocessing.get_context("forkserver")
+        )
+        atexit.register(self._pool.shutdown, wait=False, cancel_futures=True)
+
+    try:
+      result = await asyncio.get_running_loop().run_in_executor(
+        self._pool,
+        functools.partial(
+          transcode_frame,
+          data,
+          max_width=self.max_width,
+          max_height=self.max_height,
+          quality=self.quality,
+        ),
+      )
+    except Exception:
+      with self._lock:
+        self._stats["failed"] += 1
+      return None
+    finally:
+      with self._lock:
+        self._in_flight[session_id] -= 1
+        if not self._in_flight[session_id]:
+          del self._in_flight[session_id]
+
+    with self._lock:
+      self._stats["transcoded"] += 1
+      self._stats["bytes_in"] += len(data)
+      self._stats["bytes_out"] += len(result)
+    return result
+
+  def stats(self) -> dict[str, Any]:
+    with self._lock:
+      return {
+        **self._stats,
+        "in_flight": self._in_flight.total(),
+        "saturation": self._in_flight.total() / self.workers,
+      }
+
+
+def transcode_frame(data: str, *, max_width: int, max_height: int, quality: int) -> str:
+  """Scales a base64 encoded JPEG frame down to fit the given size. Runs in the pool."""
+  from PIL import Image
+
+  with Image.open(io.BytesIO(base64.b64decode(data))) as image:
+    # Lets the JPEG decoder skip detail that would be scaled away anyway.
+    image.draft("RGB", (max_width, max_height))
+    image = image.convert("RGB")
+  image.thumbnail((max_width, max_height))
+  output = io.BytesIO()
+  image.save(output, "JPEG", quality=quality)
+  return base64.b64encode(output.getvalue()).decode("ascii")
+
+
+_transcoder: FrameTranscoder | None = None
+_transcoder_lock = threading.Lock()
+
+
+def transcoder() -> FrameTranscoder | None:
+  """Returns the process-wide transcoder, or None if `VIDEO_TRANSCODE_ENABLED` is off.
+
+  Raises ImportError if transcoding is enabled but Pillow is not installed, so the
+  misconfiguration shows up when a session starts rather than as dropped frames.
+  """
+  global _transcoder
+  tuning = get_tuning()
+  if not tuning.VIDEO_TRANSCODE_ENABLED:
+    return None
+  with _transcoder_lock:
+    if _transcoder is None:
+      import PIL  # noqa: F401
+
+      _transcoder = FrameTranscoder(
+        max_bytes=tuning.VIDEO_TRANSCODE_MAX_BYTES,
+        max_width=tuning.VIDEO_TRANSCODE_MAX_WIDTH,
+        max_height=tuning.VIDEO_TRANSCODE_MAX_HEIGHT,
+        quality=tuning.VIDEO_TRANSCODE_QUALITY,
+        workers=tuning.VIDEO_TRANSCODE_WORKERS,
+        max_in_flight_per_session=tuning.VIDEO_TRANSCODE_MAX_IN_FLIGHT,
+      )
+    return _transcoder
+
+
+def _stats() -> dict[str, Any]:
+  return _transcoder.stats() if _transcoder is not None else {"enabled": False}
+
+
+metrics.register("video_transcode", _stats)
@@ -0,0 +1,127 @@
+"""Websocket transport profiles and event loop selection for the Gemini Live connection.
+
+The websocket defaults don't suit our traffic: permessage-deflate spends CPU compressing
+base64 audio and JPEG frames that barely compress, and the default queue and buffer
+sizes are tuned for generic traffic rather than a steady stream of small audio chunks.
+A profile sets these for the upstream connection:
+
+- `compression`: Negotiate permessage-deflate, so Gemini can compress what it sends.
+- `upstream_compression_level`: zlib level for what we send when compression is
+  negotiated. 0 stores frames without compressing them, which keeps compression for
+  downstream only.
+- `max_size`: Largest message accepted from Gemini, or None for no limit.
+- `max_queue`: Messages from Gemini buffered before reading from the socket pauses.
+- `write_limit`: High-water mark of the write buffer in bytes. Sending waits once the
+  buffer is above it, so a slow connection pushes back on the media scheduler.
+- `tcp_nodelay`: Send small writes right away instead of coalescing them (Nagle).
+
+The profile is picked with `LIVE_TRANSPORT_PROFILE`, and `LIVE_EVENT_LOOP` selects
+uvloop instead of the asyncio event loop. `benchmarks/transport_benchmark.py` compares
+them against a local fake Gemini server.
+"""
+
+import asyncio
+import socket
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass(frozen=True)
+class TransportProfile:
+  name: str
+  compression: bool = True
+  upstream_compression_level: int = -1
+  max_size: int | None = 2**20
+  max_queue: int = 16
+  write_limit: int = 2**15
+  tcp_nodelay: bool = True
+
+
+PROFILES = {
+  profile.name: profile
+  for profile in (
+    # The websockets defaults.
+    TransportProfile("default"),
+    TransportProfile("no_compression", compression=False),
+    TransportProfile("downstream_compression", upstream_compression_level=0),
+    # Small buffers so audio doesn't wait behind queued frames.
+    TransportProfile(
+      "low_latency",
+      compression=False,
+      max_size=None,
+      max_queue=64,
+      write_limit=2**12,
+    ),
+    # Large buffers and Nagle for fewer, bigger writes.
+    TransportProfile(
+      "throughput",
+      compression=False,
+      max_size=None,
+      max_queue=256,
+      write_limit=2**18,
+      tcp_nodelay=False,
+    ),
+  )
+}
+
+EVENT_LOOPS = ("asyncio", "uvloop")
+
+
+def get_profile(name: str) -> TransportProfile:
+  try:
+    return PROFILES[name]
+  except KeyError:
+    raise ValueError(f"Unknown transport profile: {name}") from None
+
+
+async def connect(uri: str, profile: TransportProfile, **kwargs: Any):
+  """Opens a websocket connection with the settings of `profile`.
+
+  Extra keyword arguments are passed to `websockets.asyncio.client.connect`.
+  """
+  # Imported here so that pages don't load websockets until a session is started.
+  from websockets.asyncio.client import connect as websockets_connect
+  from websockets.extensions.permessage_deflate import ClientPerMessageDeflateFactory
+
+  extensions = None
+  if profile.compression:
+    extensions = [
+      ClientPerMessageDeflateFactory(
+        client_max_window_bits=True,
+        compress_settings={"level": profile.upstream_compression_level, "memLevel": 5},
+      )
+    ]
+  ws = await websockets_connect(
+    uri,
+    compression=None,
+    extensions=extensions,
+    max_size=profile.max_size,
+    max_queue=profile.max_queue,
+    write_limit=profile.write_limit,
+    **kwargs,
+  )
+  sock = ws.transport.get_extra_info("socket")
+  if sock is not None:
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, int(profile.tcp_nodelay))
+  return ws
+
+
+def new_event_loop(name: str) -> asyncio.AbstractEventLoop:
+  """Creates an event loop of the given kind, one of `EVENT_LOOPS`."""
+  if name == "uvloop":
+    import uvloop
+
+    return uvloop.new_event_loop()
+  return asyncio.new_event_loop()
+
+
+def install_event_loop(name: str):
+  """Makes event loops created from now on, such as Mesop's, of the given kind.
+
+  Raises ImportError if uvloop is selected but not installed, rather than silently
+  running on a different loop than the one that was configured.
+  """
+  if name == "uvloop":
+    import uvloop
+
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
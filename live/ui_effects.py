@@ -0,0 +1,69 @@
+"""Channel for Gemini Live tools to update the Mesop state of their session.
+
+Tools run outside of the Mesop event handler, so they should not call `me.state`
+themselves. Instead they emit typed state patches onto the session's `UiEffectQueue`.
+The long running Mesop event handler waits on the queue, applies every pending patch
+and yields once, so a burst of patches only costs a single render.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+
+class StatePatch(Protocol):
+  def apply(self, state: Any) -> None:
+    """Applies the patch to the Mesop state of the page."""
+
+
+@dataclass(frozen=True)
+class SetState:
+  """Sets fields on the Mesop state of the page."""
+
+  values: dict[str, Any]
+
+  def apply(self, state: Any) -> None:
+    for name, value in self.values.items():
+      setattr(state, name, value)
+
+
+class UiEffectQueue:
+  """Per-session queue of state patches.
+
+  Must be created on the event loop of the session. `emit` can be called from any thread,
+  for example from tool handlers running on a thread pool.
+  """
+
+  def __init__(self):
+    self._loop = asyncio.get_running_loop()
+    self._patches: list[StatePatch] = []
+    self._ready = asyncio.Event()
+
+  def emit(self, patch: StatePatch):
+    try:
+      running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+      running_loop = None
+    if running_loop is self._loop:
+      self._push(patch)
+    else:
+      self._loop.call_soon_threadsafe(self._push, patch)
+
+  async def wait(self):
+    """Waits until at least one patch is pending."""
+    await self._ready.wait()
+
+  def drain(self) -> list[StatePatch]:
+    """Removes and returns all pending patches in the order they were emitted."""
+    patches, self._patches = self._patches, []
+    self._ready.clear()
+    return patches
+
+  def _push(self, patch: StatePatch):
+    self._patches.append(patch)
+    self._ready.set()
+
+
+def apply_patches(state: Any, patches: list[StatePatch]):
+  for patch in patches:
+    patch.apply(state)
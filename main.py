@@ -12,14 +12,43 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import Callable
+
 import mesop as me
 
+from config.tuning import get_tuning
+from live import metrics
+from live import transport
 from state.state import AppState
 from components.page_scaffold import page_scaffold
-from pages.home import home_content
-from pages.audio_demo_v1 import audio_demo_content_v1
-from pages.video_demo_v1 import video_demo_content_v1
-from pages.tool_demo_v1 import tool_demo_content_v1
+
+# Page modules are imported the first time their page is requested, so worker startup
+# does not pay for the demos (and the SDKs they pull in) until they are used.
+#
+# Every yield of a streaming event handler re-renders the whole page, so each page records
+# its render time per yield (see `live/metrics.py`).
+
+# Before Mesop creates any event loop, so the live sessions run on the configured one.
+transport.install_event_loop(get_tuning().LIVE_EVENT_LOOP)
+
+
+# Render times per page, see `_render`.
+_RENDER_TIMERS = {
+  name: metrics.Timer(f"render.{name}")
+  for name in ("home_demo", "audio_demo_v1", "video_demo_v1", "tool_demo_v1", "text_demo_v1")
+}
+
+
+def _render(page: str, content: Callable[[AppState], None]):
+  """Renders the page with its `content` and records the render time.
+
+  The page functions import their module before calling this, so the first render's
+  time doesn't include the import.
+  """
+  with _RENDER_TIMERS[page].time():
+    state = me.state(AppState)
+    with page_scaffold():  # pylint: disable=not-context-manager
+      content(state)
 
 
 def on_load(e: me.LoadEvent):  # pylint: disable=unused-argument
@@ -39,9 +68,9 @@ def on_load(e: me.LoadEvent):  # pylint: disable=unused-argument
 )
 def home_demo():
   """Main Page"""
-  state = me.state(AppState)
-  with page_scaffold():  # pylint: disable=not-context-manager
-    home_content(state)
+  from pages.home import home_content
+
+  _render("home_demo", home_content)
 
 
 @me.page(
@@ -56,9 +85,9 @@ def home_demo():
 )
 def audio_demo_v1():
   """Main Page"""
-  state = me.state(AppState)
-  with page_scaffold():  # pylint: disable=not-context-manager
-    audio_demo_content_v1(state)
+  from pages.audio_demo_v1 import audio_demo_content_v1
+
+  _render("audio_demo_v1", audio_demo_content_v1)
 
 
 @me.page(
@@ -73,9 +102,9 @@ def audio_demo_v1():
 )
 def video_demo_v1():
   """Main Page"""
-  state = me.state(AppState)
-  with page_scaffold():  # pylint: disable=not-context-manager
-    video_demo_content_v1(state)
+  from pages.video_demo_v1 import video_demo_content_v1
+
+  _render("video_demo_v1", video_demo_content_v1)
 
 
 @me.page(
@@ -90,6 +119,23 @@ def video_demo_v1():
 )
 def tool_demo_v1():
   """Main Page"""
-  state = me.state(AppState)
-  with page_scaffold():  # pylint: disable=not-context-manager
-    tool_demo_content_v1(state)
+  from pages.tool_demo_v1 import tool_demo_content_v1
+
+  _render("tool_demo_v1", tool_demo_content_v1)
+
+
+@me.page(
+  path="/text_demo_v1",
+  title="Text Demo",
+  security_policy=me.SecurityPolicy(
+    allowed_script_srcs=[
+      "https://cdn.jsdelivr.net",
+    ]
+  ),
+  on_load=on_load,
+)
+def text_demo_v1():
+  """Main Page"""
+  from pages.text_demo_v1 import text_demo_content_v1
+
+  _render("text_demo_v1", text_demo_content_v1)
@@ -27,7 +27,8 @@ def home_content(app_state: me.state):
 
     me.text("Video demo V1", type="headline-6")
     me.text(
-      "This example shows how we can stream video input to Gemini Live and return audio output.",
+      "This example shows how we can stream video and audio input to Gemini Live and return "
+      "audio output.",
       style=me.Style(margin=me.Margin(bottom=15)),
     )
     me.link(
@@ -47,6 +48,17 @@ def home_content(app_state: me.state):
       style=_LINK_BUTTON_STYLE,
     )
 
+    me.text("Text demo", type="headline-6")
+    me.text(
+      "This example shows how to answer typed prompts without opening a Gemini Live session.",
+      style=me.Style(margin=me.Margin(bottom=15)),
+    )
+    me.link(
+      text="Text Demo",
+      url="/text_demo_v1",
+      style=_LINK_BUTTON_STYLE,
+    )
+
 
 _LINK_BUTTON_STYLE = me.Style(
   background=me.theme_var("primary"),
@@ -0,0 +1,67 @@
+"""Demo of answering text-only prompts without the Gemini Live API.
+
+Typed prompts don't need a long-lived Live websocket session. Instead this demo streams
+the answer from `generate_content` using the shared client from `ModelSetup`, which is
+much cheaper when many users are connected.
+"""
+
+import mesop as me
+
+from set_up.text_generation import TextGenerator
+
+
+_TEXT_GENERATOR = TextGenerator(name="text_demo_v1.text_generator")
+
+
+@me.stateclass
+class State:
+  prompt: str = ""
+  response: str = ""
+  generating: bool = False
+
+
+def text_demo_content_v1(app_state: me.state):
+  state = me.state(State)
+  with me.box(style=me.Style(margin=me.Margin.all(20))):
+    me.text("Ask Gemini a question", type="headline-5")
+    me.input(
+      value=state.prompt,
+      appearance="outline",
+      on_blur=on_input_blur,
+      style=me.Style(margin=me.Margin(right=10)),
+    )
+    me.button(
+      "Send prompt",
+      type="flat",
+      color="primary",
+      disabled=state.generating,
+      on_click=send_text_input,
+    )
+
+    if state.response:
+      with me.box(style=me.Style(margin=me.Margin(top=15))):
+        me.markdown(state.response)
+
+
+def on_input_blur(e: me.InputBlurEvent):
+  state = me.state(State)
+  state.prompt = e.value
+
+
+async def send_text_input(e: me.ClickEvent):
+  """Streams the answer to the prompt into the page."""
+  state = me.state(State)
+  if not state.prompt:
+    return
+  prompt = state.prompt
+  state.prompt = ""
+  state.response = ""
+  state.generating = True
+  yield
+  try:
+    async for text in _TEXT_GENERATOR.stream(prompt):
+      me.state(State).response += text
+      yield
+  finally:
+    me.state(State).generating = False
+  yield
@@ -18,18 +18,22 @@ This demo is based off the examples at:
 - https://github.com/google-gemini/cookbook/blob/main/gemini-2/live_api_tool_use.ipynb
 """
 
-import asyncio
 import base64
-import json
-import os
-import traceback
+import functools
 import uuid
-from dataclasses import field
-
-from websockets.asyncio.client import connect
+from dataclasses import dataclass, field
+from typing import Any
 
 import mesop as me
 import mesop.labs as mel
+from config.tuning import get_tuning
+from live import session_loop
+from live import sessions
+from live.gemini_live_loop import DEFAULT_SETUP, GeminiLiveLoop
+from live.tool_cache import ToolCachePolicy, ToolResultCache
+from live.tool_executor import ToolExecutor, ToolSpec
+from live.ui_effects import SetState, StatePatch, apply_patches
+from state import live_session
 from web_components_v1.audio_player import (
   audio_player,
 )
@@ -38,16 +42,6 @@ from web_components_v1.audio_recorder import (
 )
 
 
-_HOST = "generativelanguage.googleapis.com"
-_MODEL = "gemini-2.0-flash-exp"
-
-
-_API_KEY = os.getenv("GOOGLE_API_KEY")
-_GEMINI_BIDI_WEBSOCKET_URI = f"wss://{_HOST}/ws/google.ai.generativelanguage.v1alpha.GenerativeService.BidiGenerateContent?key={_API_KEY}"
-
-
-_GEMINI_LIVE_LOOP_MAP = {}
-
 _SYSTEM_INSTRUCTIONS = """
 You are an agent that helps people select boxes.
 
@@ -60,6 +54,12 @@ Rules:
   question. Ask the user the question.
 """.strip()
 
+_BOXES = {
+  "green": "Who is the first president?",
+  "blue": "What is the capital of China?",
+  "red": "What is the tallest mountain?",
+}
+
 
 @me.stateclass
 class State:
@@ -69,183 +69,109 @@ class State:
   gemini_connection_enabled: bool = False
   audio_recorder_enabled: bool = False
   audio_player_enabled: bool = False
-  boxes: dict[str, str] = field(
-    default_factory=lambda: {
-      "green": "Who is the first president?",
-      "blue": "What is the capital of China?",
-      "red": "What is the tallest mountain?",
-    }
-  )
+  ingest_token: str = ""
+  audio_codec: str = "pcm"
+  waiting_for_capacity: bool = False
+  queue_position: int = 0
+  draining: bool = False
+  boxes: dict[str, str] = field(default_factory=lambda: dict(_BOXES))
   opened_boxes: set[str] = field(default_factory=set)
 
 
-class GeminiLiveLoop:
-  def __init__(self):
-    self.audio_in_queue = None
-    self.out_queue = None
-
-    self.ws = None
-
-  async def startup(self):
-    setup_msg = {
-      "setup": {
-        "model": f"models/{_MODEL}",
-        "system_instruction": {"role": "user", "parts": [{"text": _SYSTEM_INSTRUCTIONS}]},
-        "tools": [
-          {
-            "functionDeclarations": [
-              {
-                "name": "pick_box",
-                "description": "Picks the box by name",
-                "parameters": {
-                  "type": "OBJECT",
-                  "properties": {"box_name": {"type": "STRING", "description": "Name of the box"}},
-                  "required": ["box_name"],
-                },
-              }
-            ]
-          }
-        ],
-        "generation_config": {
-          "response_modalities": ["audio"],
-          "speech_config": {"voice_config": {"prebuilt_voice_config": {"voice_name": "Puck"}}},
-        },
-      }
-    }
-    await self.ws.send(json.dumps(setup_msg))
-    raw_response = await self.ws.recv(decode=False)
-    json.loads(raw_response.decode("ascii"))
-
-  async def send_video_direct(self, data):
-    """Sends video input chunks to Gemini."""
-
-    msg = {
-      "realtime_input": {
-        "media_chunks": [
-          {
-            "data": data,
-            "mime_type": "image/jpeg",
-          }
-        ]
-      }
-    }
+@dataclass(frozen=True)
+class OpenBox:
+  """Shows the question of an opened box in the UI."""
 
-    await self.ws.send(json.dumps(msg))
-
-  async def send_audio_direct(self, data):
-    """Sends audio input chunks to Gemini.
-
-    - Audio chunks need to be sent with a sample rate of 16000hz and be in PCM format.
-    - The audio data needs to be base64 encoded since we're using JSON.
-    """
-    msg = {
-      "realtime_input": {
-        "media_chunks": [
-          {
-            "data": data,
-            "mime_type": "audio/pcm",
-          }
-        ]
-      }
-    }
-    await self.ws.send(json.dumps(msg))
-
-  async def send_text_direct(self, text):
-    """Sends text input to Gemini."""
-    msg = {
-      "client_content": {
-        "turn_complete": True,
-        "turns": [{"role": "user", "parts": [{"text": text}]}],
-      }
-    }
-    await self.ws.send(json.dumps(msg))
-
-  async def receive_audio(self):
-    """Process the audio responses returned by Gemini"""
-    async for raw_response in self.ws:
-      # Other things could be returned here, but we'll ignore those for now.
-      response = json.loads(raw_response.decode("ascii"))
-      try:
-        b64data = response["serverContent"]["modelTurn"]["parts"][0]["inlineData"]["data"]
-      except KeyError:
-        pass
-      else:
-        pcm_data = base64.b64decode(b64data)
-        self.audio_in_queue.put_nowait(pcm_data)
-
-      try:
-        turn_complete = response["serverContent"]["turnComplete"]
-      except KeyError:
-        pass
-      else:
-        if turn_complete:
-          # If you interrupt the model, it sends an end_of_turn.
-          # For interruptions to work, we need to empty out the audio queue
-          # Because it may have loaded much more audio than has played yet.
-          while not self.audio_in_queue.empty():
-            self.audio_in_queue.get_nowait()
-
-      tool_call = response.pop("toolCall", None)
-      if tool_call is not None:
-        await self.handle_tool_call(tool_call)
-
-  async def handle_tool_call(self, tool_call):
-    state = me.state(State)
-    for fc in tool_call["functionCalls"]:
-      if fc["name"] == "pick_box":
-        response = ""
-        if fc["args"]["box_name"] not in state.boxes:
-          response = "No box found"
-        elif fc["args"]["box_name"] in state.opened_boxes:
-          response = "You already opened that box"
-        else:
-          response = state.boxes[fc["args"]["box_name"]]
-          state.opened_boxes.add(fc["args"]["box_name"])
-
-        msg = {
-          "tool_response": {
-            "function_responses": [
-              {
-                "id": fc["id"],
-                "name": fc["name"],
-                "response": {
-                  "result": response,
-                },
-              }
-            ]
-          }
-        }
-        await self.ws.send(json.dumps(msg))
-
-  async def run(self):
-    """Yields audio chunks off the input queue."""
-    try:
-      async with (
-        await connect(
-          _GEMINI_BIDI_WEBSOCKET_URI,
-          additional_headers={"Content-Type": "application/json"},
-        ) as ws,
-        asyncio.TaskGroup() as tg,
-      ):
-        self.ws = ws
-        await self.startup()
+  box_name: str
+
+  def apply(self, state: "State"):
+    state.opened_boxes.add(self.box_name)
 
-        self.audio_in_queue = asyncio.Queue()
 
-        tg.create_task(self.receive_audio())
+def lookup_box(box_name: str) -> str | None:
+  """Returns the question inside the box or None if there is no such box."""
+  return _BOXES.get(box_name)
 
-        while True:
-          bytestream = await self.audio_in_queue.get()
-          yield bytestream
 
-    except asyncio.CancelledError:
-      pass
-    except ExceptionGroup as EG:
-      traceback.print_exception(EG)
+# The box lookup stands in for the DB/HTTP lookups that real tools would do, so it runs
+# on the thread pool instead of on the event loop.
+_TOOL_EXECUTOR = ToolExecutor(
+  {"pick_box": ToolSpec(lookup_box, mode="thread")},
+  name="tool_demo_v1.tool_executor",
+)
+
+# The box contents are static, so lookups can be shared across sessions. Whether a box
+# was already opened is session state and is checked outside of the cache.
+_TOOL_CACHE = ToolResultCache(
+  {"pick_box": ToolCachePolicy(ttl_seconds=300, scope="global")},
+  name="tool_demo_v1.tool_cache",
+)
+
+
+_SETUP = {
+  **DEFAULT_SETUP,
+  "system_instruction": {"role": "user", "parts": [{"text": _SYSTEM_INSTRUCTIONS}]},
+  "tools": [
+    {
+      "functionDeclarations": [
+        {
+          "name": "pick_box",
+          "description": "Picks the box by name",
+          "parameters": {
+            "type": "OBJECT",
+            "properties": {"box_name": {"type": "STRING", "description": "Name of the box"}},
+            "required": ["box_name"],
+          },
+        }
+      ]
+    }
+  ],
+  "generation_config": {
+    "response_modalities": ["audio"],
+    "speech_config": {"voice_config": {"prebuilt_voice_config": {"voice_name": "Puck"}}},
+  },
+}
+
+
+class ToolDemoLiveLoop(GeminiLiveLoop):
+  def __init__(self, session_id: str):
+    super().__init__(session_id, setup=_SETUP, page="tool_demo_v1")
+    # Tracked here rather than read from the Mesop state since tools run outside of the
+    # Mesop event handler.
+    self.opened_boxes: set[str] = set()
+
+  async def call_tool(self, name: str, args: dict[str, Any]) -> Any:
+    if name != "pick_box":
+      return await super().call_tool(name, args)
+
+    box_name = args["box_name"]
+    question = await _TOOL_CACHE.call(
+      name,
+      args,
+      functools.partial(_TOOL_EXECUTOR.call, name),
+      session_id=self.session_id,
+    )
+    if question is None:
+      return "No box found"
+    if box_name in self.opened_boxes:
+      return "You already opened that box"
+    self.opened_boxes.add(box_name)
+    self.ui_effects.emit(OpenBox(box_name))
+    return question
+
+  def ui_state_patches(self) -> list[StatePatch]:
+    # A page coming back to the session would show the opened boxes as closed again.
+    return [*super().ui_state_patches(), SetState({"opened_boxes": set(self.opened_boxes)})]
+
+
+def new_live_loop(session_id: str) -> GeminiLiveLoop:
+  """Returns a session with this page's setup. See `state/live_session.py`."""
+  return ToolDemoLiveLoop(session_id)
 
 
 def tool_demo_content_v1(app_state: me.state):
   state = me.state(State)
+  tuning = get_tuning("tool_demo_v1")
   with me.box(style=me.Style(margin=me.Margin.all(20))):
     me.text(
       "You will need to wear headphones since echo cancellation may or may not be working.",
@@ -260,16 +186,26 @@ def tool_demo_content_v1(app_state: me.state):
         type="flat",
         color="primary",
       )
+    elif state.draining:
+      me.text("The server is restarting. Reload the page to reconnect.")
+    elif state.waiting_for_capacity:
+      me.text(f"Waiting for capacity. You are number {state.queue_position} in the queue.")
     else:
       me.text("Gemini Live API connected")
 
-    if state.gemini_connection_enabled:
+    if state.gemini_connection_enabled and not state.waiting_for_capacity:
       me.text(
         "Step 2: Next initalize the audio player",
         type="headline-5",
         style=me.Style(margin=me.Margin.symmetric(vertical=15)),
       )
-      audio_player(data=state.data, enabled=state.audio_player_enabled, on_play=on_audio_play)
+      audio_player(
+        data=state.data,
+        enabled=state.audio_player_enabled,
+        sample_rate=tuning.AUDIO_PLAYER_SAMPLE_RATE,
+        codec=state.audio_codec,
+        on_play=on_audio_play,
+      )
 
     if state.audio_player_enabled:
       me.text(
@@ -278,7 +214,17 @@ def tool_demo_content_v1(app_state: me.state):
         style=me.Style(margin=me.Margin.symmetric(vertical=15)),
       )
       audio_recorder(
-        on_data=stream_audio_input, enabled=state.audio_recorder_enabled, on_record=on_audio_record
+        on_data=stream_audio_input,
+        enabled=state.audio_recorder_enabled,
+        on_record=on_audio_record,
+        ingest_url=sessions.ingest_url(state.session_id, "audio"),
+        ingest_token=state.ingest_token,
+        target_sample_rate=tuning.AUDIO_TARGET_SAMPLE_RATE,
+        buffer_size=tuning.AUDIO_BUFFER_SIZE,
+        codec=tuning.AUDIO_RECORDER_CODEC,
+        voice_detection_enabled=tuning.VOICE_DETECTION_ENABLED,
+        voice_threshold=tuning.VOICE_THRESHOLD,
+        voice_hold_time=tuning.VOICE_HOLD_TIME_MS,
       )
 
     if state.audio_player_enabled:
@@ -318,7 +264,11 @@ def tool_demo_content_v1(app_state: me.state):
 
 
 def on_audio_play(e: mel.WebEvent):
-  me.state(State).audio_player_enabled = True
+  state = me.state(State)
+  state.audio_player_enabled = True
+  gemini_live_loop = sessions.get(state.session_id)
+  if gemini_live_loop is not None:
+    gemini_live_loop.set_audio_codec(e.value.get("codecs", []))
 
 
 def on_audio_record(e: mel.WebEvent):
@@ -327,27 +277,36 @@ def on_audio_record(e: mel.WebEvent):
 
 async def initialize_gemini_api(e: me.ClickEvent):
   """Initializes a long running event handler to send audio response data to the client."""
-  global _GEMINI_LIVE_LOOP_MAP
   state = me.state(State)
   state.gemini_connection_enabled = True
   yield
-  if state.session_id not in _GEMINI_LIVE_LOOP_MAP:
-    _GEMINI_LIVE_LOOP_MAP[state.session_id] = GeminiLiveLoop()
-    async for bytestream in _GEMINI_LIVE_LOOP_MAP[state.session_id].run():
-      me.state(State).data = bytestream
-      yield
+  # The app's session keeps running across the demo pages, see `state/live_session.py`.
+  gemini_live_loop, events = live_session.connect(new_live_loop)
+  state.session_id = gemini_live_loop.session_id
+  state.ingest_token = gemini_live_loop.ingest_token
+  async for event in events:
+    if isinstance(event, bytes):
+      me.state(State).data = event
+    else:
+      apply_patches(me.state(State), event)
+    yield
 
 
-async def stream_audio_input(e: mel.WebEvent):
+def stream_audio_input(e: mel.WebEvent):
   """Audio input is forwarded to Gemini which handles the voice activity detection.
 
   Unfortunately it does not seem to handle cancellation of the system audio, so we need
   to use headphones for simplicity here.
+
+  This is only used when the media ingest endpoint is not mounted. Otherwise the recorder
+  sends audio straight to the ingest endpoint.
   """
-  global _GEMINI_LIVE_LOOP_MAP
   state = me.state(State)
-  if state.session_id in _GEMINI_LIVE_LOOP_MAP:
-    await _GEMINI_LIVE_LOOP_MAP[state.session_id].send_audio_direct(e.value["data"])
+  gemini_live_loop = sessions.get(state.session_id)
+  if gemini_live_loop is not None:
+    gemini_live_loop.queue_encoded_audio(
+      base64.b64decode(e.value["data"]), e.value.get("codec", "pcm")
+    )
 
 
 def on_input_blur(e: me.InputBlurEvent):
@@ -357,16 +316,16 @@ def on_input_blur(e: me.InputBlurEvent):
 
 async def send_text_input(e: me.ClickEvent):
   """We can also send normal text prompts to Gemini."""
-  global _GEMINI_LIVE_LOOP_MAP
   state = me.state(State)
-  if state.session_id in _GEMINI_LIVE_LOOP_MAP and state.prompt:
-    await _GEMINI_LIVE_LOOP_MAP[state.session_id].send_text_direct(state.prompt)
+  gemini_live_loop = sessions.get(state.session_id)
+  if gemini_live_loop is not None and state.prompt:
+    await session_loop.call(gemini_live_loop.send_text_direct(state.prompt))
     state.prompt = ""
 
 
 async def click_box(e: me.ClickEvent):
-  global _GEMINI_LIVE_LOOP_MAP
   state = me.state(State)
   text = "I want to pick the box with the name " + e.key
-  if state.session_id in _GEMINI_LIVE_LOOP_MAP:
-    await _GEMINI_LIVE_LOOP_MAP[state.session_id].send_text_direct(text)
+  gemini_live_loop = sessions.get(state.session_id)
+  if gemini_live_loop is not None:
+    await session_loop.call(gemini_live_loop.send_text_direct(text))
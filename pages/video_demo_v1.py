@@ -1,10 +1,17 @@
 """Demo of using Gemini 2 API with websockets and Mesop.
 
-This demo focuses only on video input and audio output.
+This demo combines video and audio input with audio output.
 
-In this demo you can type in questions about the video input, such as what do you see?
+In this demo you can ask questions about the video input, such as what do you see?,
+either by talking or by typing them in.
 
-You could also take this a step further and add audio input as well.
+Both recorders feed the same session. The session's media scheduler always sends audio
+first and only sends video frames with the bandwidth that is left, so turning on the
+camera doesn't add latency to the voice conversation.
+
+Video is streamed at a low resolution. The session keeps the last few full resolution
+frames and sends one when a question needs the detail: before every typed question, and
+when Gemini calls the `get_high_res_frame` tool.
 
 Ideally, we'd use WebRTC, but for demos, websockets should be good enough for handling
 the streaming video input and audio output.
@@ -13,142 +20,81 @@ This demo is based off the example at:
 https://github.com/google-gemini/cookbook/blob/main/gemini-2/websockets/live_api_starter.py
 """
 
-import asyncio
 import base64
-import json
-import os
-import traceback
 import uuid
 from dataclasses import field
-
-from websockets.asyncio.client import connect
+from typing import Any
 
 import mesop as me
 import mesop.labs as mel
+from config.tuning import get_tuning
+from live import session_loop
+from live import sessions
+from live.gemini_live_loop import DEFAULT_SETUP, GeminiLiveLoop
+from live.ui_effects import apply_patches
+from state import live_session
 from web_components_v1.audio_player import (
   audio_player,
 )
+from web_components_v1.audio_recorder import (
+  audio_recorder,
+)
 from web_components_v1.video_recorder import (
   video_recorder,
 )
 
 
-_HOST = "generativelanguage.googleapis.com"
-_MODEL = "gemini-2.0-flash-exp"
-
-
-_API_KEY = os.getenv("GOOGLE_API_KEY")
-_GEMINI_BIDI_WEBSOCKET_URI = f"wss://{_HOST}/ws/google.ai.generativelanguage.v1alpha.GenerativeService.BidiGenerateContent?key={_API_KEY}"
-
-
-_GEMINI_LIVE_LOOP_MAP = {}
+_SYSTEM_INSTRUCTIONS = """
+You can see the user's camera through a low resolution video stream.
+
+You have access to the following tool:
+- get_high_res_frame: Sends you a full resolution frame from the camera.
+
+Rules:
+- If you need to read text or make out small details in the video, call
+  get_high_res_frame before answering.
+""".strip()
+
+_SETUP = {
+  **DEFAULT_SETUP,
+  "system_instruction": {"role": "user", "parts": [{"text": _SYSTEM_INSTRUCTIONS}]},
+  "tools": [
+    {
+      "functionDeclarations": [
+        {
+          "name": "get_high_res_frame",
+          "description": "Sends a full resolution frame from the camera as video input",
+          "parameters": {
+            "type": "OBJECT",
+            "properties": {
+              "seconds_ago": {
+                "type": "NUMBER",
+                "description": "How long ago the frame was captured, 0 for the latest",
+              }
+            },
+          },
+        }
+      ]
+    }
+  ],
+}
 
 
-class GeminiLiveLoop:
-  def __init__(self):
-    self.audio_in_queue = None
-    self.out_queue = None
+class VideoDemoLiveLoop(GeminiLiveLoop):
+  def __init__(self, session_id: str):
+    super().__init__(session_id, setup=_SETUP, page="video_demo_v1")
 
-    self.ws = None
+  async def call_tool(self, name: str, args: dict[str, Any]) -> Any:
+    if name != "get_high_res_frame":
+      return await super().call_tool(name, args)
+    if not await self.send_high_res_frame(args.get("seconds_ago", 0)):
+      return "No high resolution frame is available. The camera may be off."
+    return "The high resolution frame was sent as video input."
 
-  async def startup(self):
-    setup_msg = {"setup": {"model": f"models/{_MODEL}"}}
-    await self.ws.send(json.dumps(setup_msg))
-    raw_response = await self.ws.recv(decode=False)
-    json.loads(raw_response.decode("ascii"))
 
-  async def send_video_direct(self, data):
-    """Sends video input chunks to Gemini."""
-    msg = {
-      "realtime_input": {
-        "media_chunks": [
-          {
-            "data": data,
-            "mime_type": "image/jpeg",
-          }
-        ]
-      }
-    }
-    await self.ws.send(json.dumps(msg))
-
-  async def send_audio_direct(self, data):
-    """Sends audio input chunks to Gemini.
-
-    - Audio chunks need to be sent with a sample rate of 16000hz and be in PCM format.
-    - The audio data needs to be base64 encoded since we're using JSON.
-    """
-    msg = {
-      "realtime_input": {
-        "media_chunks": [
-          {
-            "data": data,
-            "mime_type": "audio/pcm",
-          }
-        ]
-      }
-    }
-    await self.ws.send(json.dumps(msg))
-
-  async def send_text_direct(self, text):
-    """Sends text input to Gemini."""
-    msg = {
-      "client_content": {
-        "turn_complete": True,
-        "turns": [{"role": "user", "parts": [{"text": text}]}],
-      }
-    }
-    await self.ws.send(json.dumps(msg))
-
-  async def receive_audio(self):
-    """Process the audio responses returned by Gemini"""
-    async for raw_response in self.ws:
-      # Other things could be returned here, but we'll ignore those for now.
-      response = json.loads(raw_response.decode("ascii"))
-      try:
-        b64data = response["serverContent"]["modelTurn"]["parts"][0]["inlineData"]["data"]
-      except KeyError:
-        pass
-      else:
-        pcm_data = base64.b64decode(b64data)
-        self.audio_in_queue.put_nowait(pcm_data)
-
-      try:
-        turn_complete = response["serverContent"]["turnComplete"]
-      except KeyError:
-        pass
-      else:
-        if turn_complete:
-          # If you interrupt the model, it sends an end_of_turn.
-          # For interruptions to work, we need to empty out the audio queue
-          # Because it may have loaded much more audio than has played yet.
-          while not self.audio_in_queue.empty():
-            self.audio_in_queue.get_nowait()
-
-  async def run(self):
-    """Yields audio chunks off the input queue."""
-    try:
-      async with (
-        await connect(
-          _GEMINI_BIDI_WEBSOCKET_URI,
-          additional_headers={"Content-Type": "application/json"},
-        ) as ws,
-        asyncio.TaskGroup() as tg,
-      ):
-        self.ws = ws
-        await self.startup()
-
-        self.audio_in_queue = asyncio.Queue()
-
-        tg.create_task(self.receive_audio())
-
-        while True:
-          bytestream = await self.audio_in_queue.get()
-          yield bytestream
-
-    except asyncio.CancelledError:
-      pass
-    except ExceptionGroup as EG:
-      traceback.print_exception(EG)
+def new_live_loop(session_id: str) -> GeminiLiveLoop:
+  """Returns a session with this page's setup. See `state/live_session.py`."""
+  return VideoDemoLiveLoop(session_id)
 
 
 @me.stateclass
@@ -158,11 +104,18 @@ class State:
   prompt: str = ""
   gemini_connection_enabled: bool = False
   video_recorder_enabled: bool = False
+  audio_recorder_enabled: bool = False
   audio_player_enabled: bool = False
+  ingest_token: str = ""
+  audio_codec: str = "pcm"
+  waiting_for_capacity: bool = False
+  queue_position: int = 0
+  draining: bool = False
 
 
 def video_demo_content_v1(app_state: me.state):
   state = me.state(State)
+  tuning = get_tuning("video_demo_v1")
   with me.box(style=me.Style(margin=me.Margin.all(20))):
     me.text(
       "You will need to wear headphones since echo cancellation may or may not be working.",
@@ -177,16 +130,26 @@ def video_demo_content_v1(app_state: me.state):
         type="flat",
         color="primary",
       )
+    elif state.draining:
+      me.text("The server is restarting. Reload the page to reconnect.")
+    elif state.waiting_for_capacity:
+      me.text(f"Waiting for capacity. You are number {state.queue_position} in the queue.")
     else:
       me.text("Gemini Live API connected")
 
-    if state.gemini_connection_enabled:
+    if state.gemini_connection_enabled and not state.waiting_for_capacity:
       me.text(
         "Step 2: Next initalize the audio player",
         type="headline-5",
         style=me.Style(margin=me.Margin.symmetric(vertical=15)),
       )
-      audio_player(data=state.data, enabled=state.audio_player_enabled, on_play=on_audio_play)
+      audio_player(
+        data=state.data,
+        enabled=state.audio_player_enabled,
+        sample_rate=tuning.AUDIO_PLAYER_SAMPLE_RATE,
+        codec=state.audio_codec,
+        on_play=on_audio_play,
+      )
 
     if state.audio_player_enabled:
       me.text(
@@ -195,12 +158,41 @@ def video_demo_content_v1(app_state: me.state):
         style=me.Style(margin=me.Margin.symmetric(vertical=15)),
       )
       video_recorder(
-        on_data=stream_video_input, enabled=state.video_recorder_enabled, on_record=on_video_record
+        on_data=stream_video_input,
+        enabled=state.video_recorder_enabled,
+        on_record=on_video_record,
+        ingest_url=sessions.ingest_url(state.session_id, "video"),
+        ingest_token=state.ingest_token,
+        fps=tuning.VIDEO_FPS,
+        quality=tuning.VIDEO_QUALITY,
+        low_res_width=tuning.VIDEO_LOW_RES_WIDTH,
+        high_res_interval=tuning.VIDEO_HIGH_RES_INTERVAL_MS,
+        high_res_ingest_url=sessions.ingest_url(state.session_id, "video_high_res"),
+      )
+
+    if state.audio_player_enabled:
+      me.text(
+        "Step 3b: Start recording audio",
+        type="headline-5",
+        style=me.Style(margin=me.Margin.symmetric(vertical=15)),
+      )
+      audio_recorder(
+        on_data=stream_audio_input,
+        enabled=state.audio_recorder_enabled,
+        on_record=on_audio_record,
+        ingest_url=sessions.ingest_url(state.session_id, "audio"),
+        ingest_token=state.ingest_token,
+        target_sample_rate=tuning.AUDIO_TARGET_SAMPLE_RATE,
+        buffer_size=tuning.AUDIO_BUFFER_SIZE,
+        codec=tuning.AUDIO_RECORDER_CODEC,
+        voice_detection_enabled=tuning.VOICE_DETECTION_ENABLED,
+        voice_threshold=tuning.VOICE_THRESHOLD,
+        voice_hold_time=tuning.VOICE_HOLD_TIME_MS,
       )
 
     if state.audio_player_enabled:
       me.text(
-        "Step3b: You can also enter text",
+        "Step 3c: You can also enter text",
         type="headline-5",
         style=me.Style(margin=me.Margin.symmetric(vertical=15)),
       )
@@ -214,32 +206,68 @@ def video_demo_content_v1(app_state: me.state):
 
 
 def on_audio_play(e: mel.WebEvent):
-  me.state(State).audio_player_enabled = True
+  state = me.state(State)
+  state.audio_player_enabled = True
+  gemini_live_loop = sessions.get(state.session_id)
+  if gemini_live_loop is not None:
+    gemini_live_loop.set_audio_codec(e.value.get("codecs", []))
 
 
 def on_video_record(e: mel.WebEvent):
   me.state(State).video_recorder_enabled = True
 
 
+def on_audio_record(e: mel.WebEvent):
+  me.state(State).audio_recorder_enabled = True
+
+
 async def initialize_gemini_api(e: me.ClickEvent):
   """Initializes a long running event handler to send audio response data to the client."""
-  global _GEMINI_LIVE_LOOP_MAP
   state = me.state(State)
   state.gemini_connection_enabled = True
   yield
-  if state.session_id not in _GEMINI_LIVE_LOOP_MAP:
-    _GEMINI_LIVE_LOOP_MAP[state.session_id] = GeminiLiveLoop()
-    async for bytestream in _GEMINI_LIVE_LOOP_MAP[state.session_id].run():
-      me.state(State).data = bytestream
-      yield
+  # The app's session keeps running across the demo pages, see `state/live_session.py`.
+  gemini_live_loop, events = live_session.connect(new_live_loop)
+  state.session_id = gemini_live_loop.session_id
+  state.ingest_token = gemini_live_loop.ingest_token
+  async for event in events:
+    if isinstance(event, bytes):
+      me.state(State).data = event
+    else:
+      apply_patches(me.state(State), event)
+    yield
 
 
-async def stream_video_input(e: mel.WebEvent):
-  """Video input is forwarded to Gemini."""
-  global _GEMINI_LIVE_LOOP_MAP
+def stream_video_input(e: mel.WebEvent):
+  """Video input is forwarded to Gemini.
+
+  This is only used when the media ingest endpoint is not mounted. Otherwise the recorder
+  sends frames straight to the ingest endpoint.
+  """
+  state = me.state(State)
+  gemini_live_loop = sessions.get(state.session_id)
+  if gemini_live_loop is None:
+    return
+  if e.value.get("resolution") == "high":
+    queue = gemini_live_loop.store_high_res_frame
+  else:
+    queue = gemini_live_loop.queue_video
+  # Sync handlers run off the session's event loop, which owns its media scheduler.
+  gemini_live_loop.event_loop.call_soon_threadsafe(queue, e.value["data"])
+
+
+def stream_audio_input(e: mel.WebEvent):
+  """Audio input is forwarded to Gemini ahead of any pending video frames.
+
+  This is only used when the media ingest endpoint is not mounted. Otherwise the recorder
+  sends audio straight to the ingest endpoint.
+  """
   state = me.state(State)
-  if state.session_id in _GEMINI_LIVE_LOOP_MAP:
-    await _GEMINI_LIVE_LOOP_MAP[state.session_id].send_video_direct(e.value["data"])
+  gemini_live_loop = sessions.get(state.session_id)
+  if gemini_live_loop is not None:
+    gemini_live_loop.queue_encoded_audio(
+      base64.b64decode(e.value["data"]), e.value.get("codec", "pcm")
+    )
 
 
 def on_input_blur(e: me.InputBlurEvent):
@@ -249,8 +277,8 @@ def on_input_blur(e: me.InputBlurEvent):
 
 async def send_text_input(e: me.ClickEvent):
   """We can also send normal text prompts to Gemini."""
-  global _GEMINI_LIVE_LOOP_MAP
   state = me.state(State)
-  if state.session_id in _GEMINI_LIVE_LOOP_MAP and state.prompt:
-    await _GEMINI_LIVE_LOOP_MAP[state.session_id].send_text_direct(state.prompt)
+  gemini_live_loop = sessions.get(state.session_id)
+  if gemini_live_loop is not None and state.prompt:
+    await session_loop.call(gemini_live_loop.send_text_direct(state.prompt))
     state.prompt = ""
@@ -0,0 +1,97 @@
+"""Admin endpoints for operating the live sessions of this worker.
+
+- POST /admin/drain: Starts a graceful drain (see `live.drain`). An optional
+  `deadline_seconds` query parameter overrides `DRAIN_DEADLINE_SECONDS`.
+- GET /admin/drain: Reports the drain progress.
+- GET /admin/watchdog: Event loop stalls captured by the watchdog (see
+  `diagnostics.watchdog`), oldest first.
+- POST /admin/profile: Runs the sampling profiler (see `diagnostics.profiler`) and
+  returns collapsed stacks for a flamegraph. Takes `seconds` (default 10),
+  `interval_ms` (default 10) and `mode` ("cpu" or "wall") query parameters.
+- GET /admin/memory: The sessions holding the most bytes (see `diagnostics.memory`)
+  and the stopped sessions that are still referenced. Takes `limit` (default 10).
+- POST /admin/memory/snapshot: Takes a tracemalloc snapshot and returns the biggest
+  changes since the previous one. Takes `limit` (default 20).
+- DELETE /admin/memory/snapshot: Stops tracemalloc.
+
+Requests are authenticated with the `ADMIN_TOKEN` environment variable in the
+`X-Admin-Token` header. The endpoints are disabled if `ADMIN_TOKEN` is not set.
+"""
+
+import hmac
+import os
+import time
+
+from flask import Blueprint, Response, abort, jsonify, request
+
+from diagnostics import memory
+from diagnostics import profiler
+from diagnostics import watchdog
+from live import drain
+
+
+admin = Blueprint("admin", __name__)
+
+
+@admin.before_request
+def check_admin_token():
+  admin_token = os.getenv("ADMIN_TOKEN", "")
+  if not admin_token:
+    abort(404)
+  if not hmac.compare_digest(admin_token, request.headers.get("X-Admin-Token", "")):
+    abort(403)
+
+
+@admin.post("/admin/drain")
+def start_drain():
+  deadline_seconds = request.args.get("deadline_seconds", type=float)
+  return jsonify(drain.start_drain(deadline_seconds)), 202
+
+
+@admin.get("/admin/drain")
+def drain_progress():
+  return jsonify(drain.progress())
+
+
+@admin.get("/admin/watchdog")
+def watchdog_stalls():
+  return jsonify(watchdog.stalls())
+
+
+@admin.post("/admin/profile")
+def run_profiler():
+  seconds = request.args.get("seconds", default=10, type=float)
+  interval_ms = request.args.get("interval_ms", default=10, type=float)
+  mode = request.args.get("mode", default="cpu")
+  if seconds <= 0 or interval_ms <= 0:
+    abort(400)
+  try:
+    collapsed = profiler.profile(seconds, interval=interval_ms / 1000, mode=mode)
+  except ValueError:
+    abort(400)
+  except profiler.ProfilerBusyError:
+    abort(409)
+  filename = f"profile-{time.strftime('%Y%m%d-%H%M%S')}.collapsed"
+  return Response(
+    collapsed,
+    mimetype="text/plain",
+    headers={"Content-Disposition": f"attachment; filename={filename}"},
+  )
+
+
+@admin.get("/admin/memory")
+def memory_report():
+  limit = request.args.get("limit", default=10, type=int)
+  return jsonify({**memory.sessions_report(limit), "leaked": memory.leaked_sessions()})
+
+
+@admin.post("/admin/memory/snapshot")
+def memory_snapshot():
+  limit = request.args.get("limit", default=20, type=int)
+  return jsonify(memory.snapshot_diff(limit))
+
+
+@admin.delete("/admin/memory/snapshot")
+def stop_memory_tracing():
+  memory.stop_tracing()
+  return "", 204
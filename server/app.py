@@ -0,0 +1,23 @@
+"""Serves the live session endpoints next to the Mesop app.
+
+Mesop does not provide a way to add custom routes, so the endpoints live in their own
+Flask app which is mounted under `/__live` in front of the Mesop WSGI app.
+"""
+
+from flask import Flask
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
+
+from live import sessions
+from server.admin import admin
+from server.ingest import ingest
+
+
+_PREFIX = "/__live"
+
+
+def create_app(mesop_app):
+  flask_app = Flask(__name__)
+  flask_app.register_blueprint(ingest)
+  flask_app.register_blueprint(admin)
+  sessions.enable_ingest(_PREFIX)
+  return DispatcherMiddleware(mesop_app, {_PREFIX: flask_app})
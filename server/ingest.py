@@ -0,0 +1,67 @@
+"""Endpoint for raw media from the recorder web components.
+
+Recorders POST binary media here instead of dispatching a Mesop event per chunk. That
+skips the Mesop event pipeline (state snapshot and re-render) for data that only needs
+to be forwarded to Gemini.
+
+- POST /ingest/<session_id>/audio: 16000hz audio. 16-bit PCM unless the `X-Audio-Codec`
+  header names another codec from `live.codec`.
+- POST /ingest/<session_id>/video: A JPEG frame.
+- POST /ingest/<session_id>/video_high_res: A full resolution JPEG frame. It is kept by
+  the session and only sent to Gemini when needed (see `send_high_res_frame`).
+
+Requests are authenticated with the session's ingest token in the `X-Ingest-Token` header.
+
+Media is handed to the session's media scheduler (see `live.media_scheduler`), which
+decides when it is sent to Gemini, so requests return as soon as the media is queued.
+"""
+
+import base64
+import struct
+
+from flask import Blueprint, abort, request
+
+from live import codec
+from live import sessions
+
+
+_MAX_BODY_BYTES = 4 * 1024 * 1024
+
+
+ingest = Blueprint("ingest", __name__)
+
+
+@ingest.post("/ingest/<session_id>/<kind>")
+def ingest_media(session_id: str, kind: str):
+  if kind not in ("audio", "video", "video_high_res"):
+    abort(404)
+  gemini_live_loop = sessions.authenticate(session_id, request.headers.get("X-Ingest-Token", ""))
+  if gemini_live_loop is None:
+    abort(403)
+  if (request.content_length or 0) > _MAX_BODY_BYTES:
+    abort(413)
+
+  body = request.get_data()
+  if kind == "audio":
+    # Decode here rather than on the session's event loop, which is shared by every
+    # session in the process.
+    try:
+      body = codec.decode(request.headers.get("X-Audio-Codec", "pcm"), body)
+    except (ValueError, struct.error):
+      abort(400)
+
+  data = base64.b64encode(body).decode("ascii")
+  if kind == "audio":
+    queue = gemini_live_loop.queue_audio
+  elif kind == "video":
+    queue = gemini_live_loop.queue_video
+  else:
+    queue = gemini_live_loop.store_high_res_frame
+
+  # The session's media scheduler belongs to its event loop, so hand the media over there.
+  try:
+    gemini_live_loop.event_loop.call_soon_threadsafe(queue, data)
+  except RuntimeError:
+    # The session's event loop has been closed.
+    abort(410)
+  return "", 204
@@ -1,10 +1,31 @@
-from typing import Optional
-from dotenv import load_dotenv
-from google import genai
+import asyncio
+import threading
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
 from config.default import Default
 
+if TYPE_CHECKING:
+    from google import genai
 
-load_dotenv(override=True)
+
+# Clients are shared by every page in the process, so keep enough pooled connections
+# alive that concurrent requests don't pay for new TCP/TLS handshakes.
+_HTTP_LIMITS = {
+    "max_connections": 100,
+    "max_keepalive_connections": 20,
+    "keepalive_expiry": 120,
+}
+
+_CLIENTS: dict[tuple[str, str, bool], "genai.Client"] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+# Clients for the async surface, per running event loop. See `ModelSetup.aio`.
+_ASYNC_CLIENTS: dict[asyncio.AbstractEventLoop, dict[tuple[str, str, bool], "genai.Client"]] = {}
+
+
+@lru_cache(maxsize=1)
+def _config() -> Default:
+    return Default()
 
 
 class ModelSetup:
@@ -15,19 +36,85 @@ class ModelSetup:
         location: Optional[str] = None,
         model_id: Optional[str] = None,
     ):
-        config = Default()
-        if not project_id:
-            project_id = config.PROJECT_ID
-        if not location:
-            location = config.LOCATION
+        """Returns the shared client and the model id to use with it."""
+        config = _config()
         if not model_id:
             model_id = config.MODEL_ID
-        if None in [project_id, location, model_id]:
+        if model_id is None:
             raise ValueError("All parameters must be set.")
-        print(f"initiating genai client with {project_id} in {location}")
-        client = genai.Client(
-            vertexai=config.INIT_VERTEX,
-            project=project_id,
-            location=location,
-        )
-        return client, model_id
+        return ModelSetup.client(project_id, location), model_id
+
+    @staticmethod
+    def client(
+        project_id: Optional[str] = None,
+        location: Optional[str] = None,
+    ) -> "genai.Client":
+        """Returns the process-wide client for the project and location.
+
+        The client is created on first use and then reused, so callers don't pay for
+        client construction or connection setup. Only its sync surface is shared, use
+        `aio` for async calls.
+        """
+        key = _client_key(project_id, location)
+        client = _CLIENTS.get(key)
+        if client is None:
+            with _CLIENTS_LOCK:
+                client = _CLIENTS.get(key)
+                if client is None:
+                    client = _create_client(*key)
+                    _CLIENTS[key] = client
+        return client
+
+    @staticmethod
+    def aio(
+        project_id: Optional[str] = None,
+        location: Optional[str] = None,
+    ):
+        """Returns the async surface of a client for the running event loop.
+
+        For example: `await ModelSetup.aio().models.generate_content(...)`.
+
+        The async connection pool belongs to the event loop that opened its connections,
+        and every Mesop event handler runs on an event loop of its own, so each running
+        loop gets a client of its own. Clients of loops that no longer run are dropped.
+        """
+        key = _client_key(project_id, location)
+        loop = asyncio.get_running_loop()
+        with _CLIENTS_LOCK:
+            for stopped in [other for other in _ASYNC_CLIENTS if not other.is_running()]:
+                del _ASYNC_CLIENTS[stopped]
+            clients = _ASYNC_CLIENTS.setdefault(loop, {})
+            if key not in clients:
+                clients[key] = _create_client(*key)
+            return clients[key].aio
+
+
+def _client_key(project_id: Optional[str], location: Optional[str]) -> tuple[str, str, bool]:
+    config = _config()
+    if not project_id:
+        project_id = config.PROJECT_ID
+    if not location:
+        location = config.LOCATION
+    if None in [project_id, location]:
+        raise ValueError("All parameters must be set.")
+    return project_id, location, config.INIT_VERTEX
+
+
+def _create_client(project_id: str, location: str, vertexai: bool) -> "genai.Client":
+    # The SDK is imported on first use since it is slow to import and most pages
+    # never need it.
+    import httpx
+    from google import genai
+    from google.genai import types
+
+    print(f"initiating genai client with {project_id} in {location}")
+    limits = httpx.Limits(**_HTTP_LIMITS)
+    return genai.Client(
+        vertexai=vertexai,
+        project=project_id,
+        location=location,
+        http_options=types.HttpOptions(
+            client_args={"limits": limits},
+            async_client_args={"limits": limits},
+        ),
+    )
@@ -0,0 +1,99 @@
+import asyncio
+import threading
+from typing import AsyncIterator, Optional
+from live import metrics
+from live.single_flight import SingleFlight
+from set_up.model_setup import ModelSetup
+
+
+class TextGenerator:
+  """Answers text-only prompts with generate_content instead of a Live session.
+
+  - Requests on the same event loop share a pooled client, see `ModelSetup.aio`.
+  - At most `max_concurrency` requests are sent upstream at once. The rest wait. The
+    limit is shared by every event loop in the process, e.g. one per Mesop event handler.
+  - Identical prompts that are in flight at the same time on the same event loop are only
+    sent once.
+  """
+
+  def __init__(
+    self,
+    max_concurrency: int = 16,
+    model_id: Optional[str] = None,
+    *,
+    name: str = "text_generator",
+  ):
+    self._model_id = model_id
+    self._max_concurrency = max_concurrency
+    self._semaphore = threading.BoundedSemaphore(max_concurrency)
+    self._in_flight = SingleFlight()
+    self._stats = {"requests": 0, "coalesced": 0, "waiting": 0, "active": 0}
+    metrics.register(name, self.stats)
+
+  async def stream(self, prompt: str) -> AsyncIterator[str]:
+    """Yields the answer in chunks as they are generated."""
+    self._stats["requests"] += 1
+    async with self._slot():
+      _, model_id = ModelSetup.init(model_id=self._model_id)
+      async for chunk in await ModelSetup.aio().models.generate_content_stream(
+        model=model_id, contents=prompt
+      ):
+        if chunk.text:
+          yield chunk.text
+
+  async def generate(self, prompt: str) -> str:
+    """Returns the full answer. Shares the upstream request with identical prompts."""
+    self._stats["requests"] += 1
+    if self._in_flight.in_flight(prompt):
+      self._stats["coalesced"] += 1
+    return await self._in_flight.run(prompt, lambda: self._generate(prompt))
+
+  async def _generate(self, prompt: str) -> str:
+    async with self._slot():
+      _, model_id = ModelSetup.init(model_id=self._model_id)
+      response = await ModelSetup.aio().models.generate_content(model=model_id, contents=prompt)
+    return response.text or ""
+
+  async def generate_batch(self, prompts: list[str]) -> list[str]:
+    """Answers a batch of prompts concurrently, within the concurrency limit."""
+    unique_prompts = list(dict.fromkeys(prompts))
+    answers = await asyncio.gather(*(self.generate(prompt) for prompt in unique_prompts))
+    answers_by_prompt = dict(zip(unique_prompts, answers))
+    return [answers_by_prompt[prompt] for prompt in prompts]
+
+  def stats(self) -> dict:
+    return {**self._stats, "max_concurrency": self._max_concurrency}
+
+  def _slot(self):
+    return _Slot(self._semaphore, self._stats)
+
+
+class _Slot:
+  """Holds a concurrency slot while keeping the waiting/active counts up to date."""
+
+  def __init__(self, semaphore: threading.BoundedSemaphore, stats: dict):
+    self._semaphore = semaphore
+    self._stats = stats
+
+  async def __aenter__(self):
+    self._stats["waiting"] += 1
+    try:
+      if not self._semaphore.acquire(blocking=False):
+        await self._wait()
+    finally:
+      self._stats["waiting"] -= 1
+    self._stats["active"] += 1
+
+  async def _wait(self):
+    # Waits on a worker thread, since the semaphore is shared with other event loops.
+    acquire = asyncio.ensure_future(asyncio.to_thread(self._semaphore.acquire))
+    try:
+      await asyncio.shield(acquire)
+    except asyncio.CancelledError:
+      # The thread still gets the slot, so give it back once it does.
+      acquire.add_done_callback(lambda _: self._semaphore.release())
+      raise
+
+  async def __aexit__(self, *exc_info):
+    self._stats["active"] -= 1
+    self._semaphore.release()
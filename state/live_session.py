@@ -0,0 +1,74 @@
+"""The Gemini Live session of the app, shared by the demo pages.
+
+The id of the session is kept in `AppState` rather than in the state of each page, so
+navigating between the demo pages keeps playing the same session instead of setting up
+a new upstream connection on every page:
+
+- A page whose setup matches the running session joins it as is. Enabling video or
+  switching the audio codec needs no setup, so they apply to the running session.
+- A page that needs another setup, e.g. other tools or system instructions, needs a new
+  session, since the Live API only takes the setup once per connection. The side nav
+  starts it while navigating to the page (see `prewarm`), so it is usually connected by
+  the time the page plays it. The new session takes over the admission slot of the old
+  one, which is stopped once the new one is connected.
+
+The sessions run on the event loop of `live.session_loop`, and pages consume their events
+through `session_loop.stream`, since the event loop of a Mesop event handler only runs
+while its page pulls events.
+
+The id is only kept in the Mesop state, rather than e.g. in the URL, since joining the
+session hands out its ingest token. A reloaded page starts out with a new state, and so
+with a new session.
+
+Pages that play the session provide `new_live_loop(session_id)`.
+"""
+
+import importlib
+from collections.abc import AsyncIterator, Callable
+from typing import TYPE_CHECKING, Any
+
+import mesop as me
+from live import session_loop
+from live import sessions
+from state.state import AppState
+
+if TYPE_CHECKING:
+  from live.gemini_live_loop import GeminiLiveLoop
+
+
+async def prewarm(page_module: str):
+  """Starts the session that the page of `page_module` plays, if it needs a new one.
+
+  Nothing is started while no session is running, since the page starts one when it's
+  asked to anyway. The session is started on the sessions' event loop, and can be found
+  by `connect` once this returns.
+  """
+  app_state = me.state(AppState)
+  current = sessions.get(app_state.live_session_id)
+  if current is None:
+    return
+  loop = importlib.import_module(page_module).new_live_loop(sessions.new_session_id())
+  if loop.setup == current.setup:
+    return
+  await session_loop.call(sessions.prewarm(loop, replaces=current))
+  app_state.live_session_id = loop.session_id
+
+
+def connect(
+  new_live_loop: Callable[[str], "GeminiLiveLoop"],
+) -> tuple["GeminiLiveLoop", AsyncIterator[Any]]:
+  """Returns the session for the page and its events, see `GeminiLiveLoop.run`.
+
+  Joins the app's session if it has the page's setup, and starts a new one otherwise.
+  Either way, the session runs on the sessions' event loop.
+  """
+  app_state = me.state(AppState)
+  current = sessions.find(app_state.live_session_id)
+  loop = new_live_loop(sessions.new_session_id())
+  if current is not None and current.setup == loop.setup:
+    # Picks the session up after navigating from another demo page.
+    loop, events = current, current.join()
+  else:
+    events = loop.run()
+  app_state.live_session_id = loop.session_id
+  return loop, session_loop.stream(events)
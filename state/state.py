@@ -20,4 +20,7 @@ class AppState:
     """Mesop Application State"""
     sidenav_open: bool = False
 
-    name: str = "no name"
\ No newline at end of file
+    name: str = "no name"
+
+    # The Gemini Live session that the demo pages play. See `state/live_session.py`.
+    live_session_id: str = ""
@@ -0,0 +1,30 @@
+import struct
+from array import array
+
+import pytest
+
+from live import codec
+
+
+def _pcm(samples: list[int]) -> bytes:
+  return array("h", samples).tobytes()
+
+
+@pytest.mark.parametrize("name", codec.CODECS)
+def test_round_trip_keeps_the_length(name):
+  pcm = _pcm([0, 1000, -1000, 32767, -32768, 12345, -54, 7])
+  encoded = codec.new_encoder(name)(pcm)
+  assert len(codec.decode(name, encoded)) == len(pcm)
+
+
+def test_adpcm_rejects_a_step_index_out_of_range():
+  chunk = codec.new_encoder("adpcm")(_pcm([0, 100, 200, 300]))
+  predictor, _, flags = struct.unpack_from("<hBB", chunk)
+  bad_chunk = struct.pack("<hBB", predictor, 89, flags) + chunk[4:]
+  with pytest.raises(ValueError, match="step index"):
+    codec.decode("adpcm", bad_chunk)
+
+
+def test_adpcm_accepts_the_highest_step_index():
+  chunk = struct.pack("<hBB", 0, 88, 0) + bytes([0x77, 0x88])
+  assert len(codec.decode("adpcm", chunk)) == 8
@@ -3,11 +3,38 @@ import {
   html,
 } from "https://cdn.jsdelivr.net/gh/lit/dist@3/core/lit-core.min.js";
 
+// Codecs the player can decode, in order of preference. See live/codec.py.
+const SUPPORTED_CODECS = ["adpcm", "mulaw", "pcm"];
+
+const ADPCM_INDEX_TABLE = [-1, -1, -1, -1, 2, 4, 6, 8, -1, -1, -1, -1, 2, 4, 6, 8];
+
+const ADPCM_STEP_TABLE = [
+  7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45, 50, 55,
+  60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230, 253, 279, 307,
+  337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963, 1060, 1166, 1282, 1411,
+  1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327, 3660, 4026, 4428, 4871, 5358,
+  5894, 6484, 7132, 7845, 8630, 9493, 10442, 11487, 12635, 13899, 15289, 16818, 18500,
+  20350, 22385, 24623, 27086, 29794, 32767,
+];
+
+const MULAW_TABLE = (() => {
+  const table = new Float32Array(256);
+  for (let i = 0; i < 256; i++) {
+    const value = ~i & 0xff;
+    const exponent = (value >> 4) & 0x07;
+    const sample = ((((value & 0x0f) << 3) + 0x84) << exponent) - 0x84;
+    table[i] = (value & 0x80 ? -sample : sample) / 32768.0;
+  }
+  return table;
+})();
+
 class AudioPlayer extends LitElement {
   static properties = {
     playEvent: { type: String },
     enabled: { type: Boolean },
     data: { type: String },
+    sampleRate: { type: Number },
+    codec: { type: String },
   };
 
   constructor() {
@@ -16,6 +43,7 @@ class AudioPlayer extends LitElement {
     this.audioContext = null; // Initialize audio context
     this.sampleRate = 24000; // Gemini Live API sends data in 24000hz
     this.channels = 1;
+    this.codec = "pcm";
     this.queue = [];
     this.isPlaying = false;
   }
@@ -35,12 +63,12 @@ class AudioPlayer extends LitElement {
 
   updated(changedProperties) {
     if (changedProperties.has("data") && this.data.length > 0) {
-      this.addToQueue(this.data);
+      this.addToQueue({ data: this.data, codec: this.codec });
     }
   }
 
-  addToQueue(base64Data) {
-    this.queue.push(base64Data);
+  addToQueue(chunk) {
+    this.queue.push(chunk);
     if (!this.isPlaying) {
       this.playNext();
     }
@@ -48,7 +76,7 @@ class AudioPlayer extends LitElement {
 
   playAudio() {
     if (!this.enabled) {
-      this.dispatchEvent(new MesopEvent(this.playEvent, {}));
+      this.dispatchEvent(new MesopEvent(this.playEvent, { codecs: SUPPORTED_CODECS }));
     }
     if (!this.audioContext) {
       this.audioContext = new AudioContext();
@@ -63,15 +91,15 @@ class AudioPlayer extends LitElement {
     }
 
     this.isPlaying = true;
-    const data = this.queue.shift();
-    const source = this.playPCM(data);
+    const chunk = this.queue.shift();
+    const source = this.playPCM(chunk.data, chunk.codec);
 
     source.onended = () => {
       this.playNext();
     };
   }
 
-  playPCM(data) {
+  playPCM(data, codec) {
     // Convert base64 to binary.
     const binaryAudio = atob(data);
 
@@ -82,23 +110,23 @@ class AudioPlayer extends LitElement {
       bufferView[i] = binaryAudio.charCodeAt(i);
     }
 
-    // Convert to 16-bit PCM data.
-    const pcmData = new Int16Array(audioBuffer);
+    // Decode to float32 samples (-1.0 to 1.0).
+    let samples;
+    if (codec === "adpcm") {
+      samples = this.decodeAdpcm(bufferView);
+    } else if (codec === "mulaw") {
+      samples = this.decodeMulaw(bufferView);
+    } else {
+      samples = this.decodePcm(audioBuffer);
+    }
 
     // Create audio buffer.
-    const frameCount = pcmData.length;
     const audioBufferData = this.audioContext.createBuffer(
       this.channels,
-      frameCount,
+      samples.length,
       this.sampleRate
     );
-
-    // Get channel data and convert PCM to float32.
-    const channelData = audioBufferData.getChannelData(0);
-    for (let i = 0; i < frameCount; i++) {
-      // Convert 16-bit PCM (-32768 to 32767) to float32 (-1.0 to 1.0)
-      channelData[i] = pcmData[i] / 32768.0;
-    }
+    audioBufferData.getChannelData(0).set(samples);
 
     // Create and play the source.
     const source = this.audioContext.createBufferSource();
@@ -109,6 +137,52 @@ class AudioPlayer extends LitElement {
     return source;
   }
 
+  decodePcm(audioBuffer) {
+    // Convert 16-bit PCM (-32768 to 32767) to float32 (-1.0 to 1.0)
+    const pcmData = new Int16Array(audioBuffer, 0, audioBuffer.byteLength >> 1);
+    const samples = new Float32Array(pcmData.length);
+    for (let i = 0; i < pcmData.length; i++) {
+      samples[i] = pcmData[i] / 32768.0;
+    }
+    return samples;
+  }
+
+  decodeMulaw(bytes) {
+    const samples = new Float32Array(bytes.length);
+    for (let i = 0; i < bytes.length; i++) {
+      samples[i] = MULAW_TABLE[bytes[i]];
+    }
+    return samples;
+  }
+
+  decodeAdpcm(bytes) {
+    // Block header: predictor (int16), step index (uint8), flags (uint8).
+    const header = new DataView(bytes.buffer, bytes.byteOffset, 4);
+    let predictor = header.getInt16(0, true);
+    let index = header.getUint8(2);
+    const oddSamples = header.getUint8(3) & 0x01;
+
+    const count = (bytes.length - 4) * 2 - oddSamples;
+    const samples = new Float32Array(count);
+    for (let i = 0; i < count; i++) {
+      const byte = bytes[4 + (i >> 1)];
+      const nibble = i % 2 ? byte >> 4 : byte & 0x0f;
+      const step = ADPCM_STEP_TABLE[index];
+      let delta = step >> 3;
+      if (nibble & 4) delta += step;
+      if (nibble & 2) delta += step >> 1;
+      if (nibble & 1) delta += step >> 2;
+      if (nibble & 8) {
+        predictor = Math.max(predictor - delta, -32768);
+      } else {
+        predictor = Math.min(predictor + delta, 32767);
+      }
+      index = Math.min(Math.max(index + ADPCM_INDEX_TABLE[nibble], 0), 88);
+      samples[i] = predictor / 32768.0;
+    }
+    return samples;
+  }
+
   render() {
     if (this.isPlaying) {
       return html`<div>Audio is playing...</div>`;
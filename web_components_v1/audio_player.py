@@ -9,6 +9,8 @@ def audio_player(
   *,
   enabled: bool = False,
   data: bytes = b"",
+  sample_rate: int = 24000,
+  codec: str = "pcm",
   on_play: Callable[[mel.WebEvent], Any],
 ):
   """Plays audio streamed from the server.
@@ -18,7 +20,10 @@ def audio_player(
   played.
 
   This is a barebones configuration that sets the sample rate to 24000hz since that is
-  what Gemini returns. In addition we expect the data to be in PCM format.
+  what Gemini returns.
+
+  The data is 16-bit PCM unless `codec` is "mulaw" or "adpcm" (see `live.codec`). The
+  play event reports the codecs the player can decode in `codecs`.
   """
   return mel.insert_web_component(
     name="audio-player",
@@ -28,5 +33,7 @@ def audio_player(
     properties={
       "enabled": enabled,
       "data": base64.b64encode(data).decode("utf-8"),
+      "sampleRate": sample_rate,
+      "codec": codec,
     },
   )
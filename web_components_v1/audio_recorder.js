@@ -3,6 +3,30 @@ import {
   html,
 } from "https://cdn.jsdelivr.net/gh/lit/dist@3/core/lit-core.min.js";
 
+// Audio codecs shared with live/codec.py, which decodes them on the server.
+const ADPCM_INDEX_TABLE = [-1, -1, -1, -1, 2, 4, 6, 8, -1, -1, -1, -1, 2, 4, 6, 8];
+
+const ADPCM_STEP_TABLE = [
+  7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45, 50, 55,
+  60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230, 253, 279, 307,
+  337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963, 1060, 1166, 1282, 1411,
+  1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327, 3660, 4026, 4428, 4871, 5358,
+  5894, 6484, 7132, 7845, 8630, 9493, 10442, 11487, 12635, 13899, 15289, 16818, 18500,
+  20350, 22385, 24623, 27086, 29794, 32767,
+];
+
+function linearToMulaw(sample) {
+  let sign = 0;
+  if (sample < 0) {
+    sign = 0x80;
+    sample = -sample;
+  }
+  sample = Math.min(sample, 32635) + 0x84;
+  const exponent = 31 - Math.clz32(sample) - 7;
+  const mantissa = (sample >> (exponent + 3)) & 0x0f;
+  return ~(sign | (exponent << 4) | mantissa) & 0xff;
+}
+
 class AudioRecorder extends LitElement {
   static properties = {
     dataEvent: { type: String },
@@ -14,6 +38,11 @@ class AudioRecorder extends LitElement {
     voiceDetectionEnabled: { type: Boolean },
     voiceThreshold: { type: Number },
     voiceHoldTime: { type: Number },
+    ingestUrl: { type: String },
+    ingestToken: { type: String },
+    targetSampleRate: { type: Number },
+    bufferSize: { type: Number },
+    codec: { type: String },
   };
 
   constructor() {
@@ -29,8 +58,22 @@ class AudioRecorder extends LitElement {
     this.debugBuffer = [];
     this.debugBufferSize = 50;
     this.targetSampleRate = 16000;
+    this.bufferSize = 4096;
     this.enabled = false;
 
+    // Codec for the audio sent to the server: "pcm", "mulaw" or "adpcm".
+    this.codec = "pcm";
+    this.adpcmPredictor = 0;
+    this.adpcmIndex = 0;
+
+    // Media ingest endpoint. When set, audio bypasses Mesop events.
+    this.ingestUrl = "";
+    this.ingestToken = "";
+    this.ingestFailed = false;
+    this.ingestPending = 0;
+    this.maxIngestPending = 8;
+    this.ingestChain = Promise.resolve();
+
     // Voice detection parameters
     this.voiceDetectionEnabled = true; // Enable by default
     this.voiceThreshold = 0.01; // RMS threshold for voice detection
@@ -169,7 +212,11 @@ class AudioRecorder extends LitElement {
         this.mediaStream
       );
 
-      this.processor = this.audioContext.createScriptProcessor(4096, 1, 1);
+      this.processor = this.audioContext.createScriptProcessor(
+        this.bufferSize,
+        1,
+        1
+      );
 
       // Connect the audio nodes
       micSource.connect(this.processor);
@@ -245,6 +292,8 @@ class AudioRecorder extends LitElement {
     this.lastVoiceDetectedTime = 0;
     this.isVoiceDetected = false;
     this.consecutiveSilentFrames = 0;
+    this.adpcmPredictor = 0;
+    this.adpcmIndex = 0;
 
     this.processor.onaudioprocess = (event) => {
       if (!this.isStreaming) return;
@@ -340,27 +389,147 @@ class AudioRecorder extends LitElement {
         }
       }
 
-      // Convert to base64 and dispatch
-      const bytes = new Uint8Array(intData.buffer);
-      const base64Data = btoa(
-        Array.from(bytes)
-          .map((byte) => String.fromCharCode(byte))
-          .join("")
-      );
-
-      this.dispatchEvent(
-        new MesopEvent(this.dataEvent, {
-          sequence: this.sequenceNumber++,
-          sampleRate: this.targetSampleRate,
-          data: base64Data,
-          isVoice: this.isVoiceDetected,
-        })
-      );
+      const sequence = this.sequenceNumber++;
+      const isVoice = this.isVoiceDetected;
+      const codec = this.codec;
+      const bytes = this.encode(intData, codec);
+      if (this.ingestUrl && !this.ingestFailed) {
+        this.ingest(bytes, codec, () =>
+          this.dispatchData(bytes, codec, sequence, isVoice)
+        );
+      } else {
+        this.dispatchData(bytes, codec, sequence, isVoice);
+      }
     };
 
     return true;
   }
 
+  encode(intData, codec) {
+    if (codec === "mulaw") {
+      const bytes = new Uint8Array(intData.length);
+      for (let i = 0; i < intData.length; i++) {
+        bytes[i] = linearToMulaw(intData[i]);
+      }
+      return bytes;
+    }
+    if (codec === "adpcm") {
+      return this.encodeAdpcm(intData);
+    }
+    return new Uint8Array(intData.buffer);
+  }
+
+  encodeAdpcm(intData) {
+    // Block header: predictor (int16), step index (uint8), flags (uint8), followed by
+    // one nibble per sample, low nibble first. The predictor carries over between
+    // blocks, but each header records where the block starts so blocks decode alone.
+    const bytes = new Uint8Array(4 + ((intData.length + 1) >> 1));
+    const header = new DataView(bytes.buffer, 0, 4);
+    header.setInt16(0, this.adpcmPredictor, true);
+    header.setUint8(2, this.adpcmIndex);
+    header.setUint8(3, intData.length % 2);
+
+    let predictor = this.adpcmPredictor;
+    let index = this.adpcmIndex;
+    for (let i = 0; i < intData.length; i++) {
+      let step = ADPCM_STEP_TABLE[index];
+      let diff = intData[i] - predictor;
+      let nibble = 0;
+      if (diff < 0) {
+        nibble = 8;
+        diff = -diff;
+      }
+      let delta = step >> 3;
+      if (diff >= step) {
+        nibble |= 4;
+        diff -= step;
+        delta += step;
+      }
+      step >>= 1;
+      if (diff >= step) {
+        nibble |= 2;
+        diff -= step;
+        delta += step;
+      }
+      step >>= 1;
+      if (diff >= step) {
+        nibble |= 1;
+        delta += step;
+      }
+
+      if (nibble & 8) {
+        predictor = Math.max(predictor - delta, -32768);
+      } else {
+        predictor = Math.min(predictor + delta, 32767);
+      }
+      index = Math.min(Math.max(index + ADPCM_INDEX_TABLE[nibble], 0), 88);
+
+      if (i % 2) {
+        bytes[4 + (i >> 1)] |= nibble << 4;
+      } else {
+        bytes[4 + (i >> 1)] = nibble;
+      }
+    }
+
+    this.adpcmPredictor = predictor;
+    this.adpcmIndex = index;
+    return bytes;
+  }
+
+  dispatchData(bytes, codec, sequence, isVoice) {
+    // Convert to base64 and dispatch
+    const base64Data = btoa(
+      Array.from(bytes)
+        .map((byte) => String.fromCharCode(byte))
+        .join("")
+    );
+
+    this.dispatchEvent(
+      new MesopEvent(this.dataEvent, {
+        sequence,
+        sampleRate: this.targetSampleRate,
+        data: base64Data,
+        codec,
+        isVoice,
+      })
+    );
+  }
+
+  ingest(body, codec, fallback) {
+    // Uploads are chained so that chunks arrive in order. If the network can't keep up,
+    // new chunks are dropped rather than building up latency.
+    if (this.ingestPending >= this.maxIngestPending) {
+      this.warn("Dropping chunk since the ingest endpoint is falling behind.");
+      return;
+    }
+    this.ingestPending++;
+    this.ingestChain = this.ingestChain
+      .then(() =>
+        fetch(this.ingestUrl, {
+          method: "POST",
+          headers: {
+            "Content-Type": "application/octet-stream",
+            "X-Ingest-Token": this.ingestToken,
+            "X-Audio-Codec": codec,
+          },
+          body,
+        })
+      )
+      .then((response) => {
+        if (!response.ok) {
+          throw new Error(`Ingest failed with status ${response.status}`);
+        }
+      })
+      .catch((error) => {
+        this.error("Falling back to Mesop events:", error);
+        this.ingestFailed = true;
+        fallback();
+      })
+      .finally(() => {
+        this.ingestPending--;
+      });
+  }
+
   stop() {
     this.isStreaming = false;
     this.isRecording = false;
@@ -9,6 +9,14 @@ def audio_recorder(
   enabled: bool = False,
   on_data: Callable[[mel.WebEvent], Any],
   on_record: Callable[[mel.WebEvent], Any],
+  ingest_url: str = "",
+  ingest_token: str = "",
+  target_sample_rate: int = 16000,
+  buffer_size: int = 4096,
+  voice_detection_enabled: bool = True,
+  voice_threshold: float = 0.01,
+  voice_hold_time: int = 500,
+  codec: str = "pcm",
 ):
   """Records audio and streams audio to the Mesop server.
 
@@ -23,8 +31,15 @@ def audio_recorder(
   The data event looks like:
 
     {
-      "data": <base64-encoded-string>
+      "data": <base64-encoded-string>,
+      "codec": "pcm" | "mulaw" | "adpcm",
     }
+
+  If `codec` is "mulaw" or "adpcm" the audio is compressed before it is sent (see
+  `live.codec`) and the server decodes it back to PCM.
+
+  If `ingest_url` is set, the audio is POSTed to the media ingest endpoint instead and
+  `on_data` is only used as a fallback when the endpoint rejects the upload.
   """
   return mel.insert_web_component(
     name="audio-recorder",
@@ -34,5 +49,13 @@ def audio_recorder(
     },
     properties={
       "enabled": enabled,
+      "ingestUrl": ingest_url,
+      "ingestToken": ingest_token,
+      "targetSampleRate": target_sample_rate,
+      "bufferSize": buffer_size,
+      "voiceDetectionEnabled": voice_detection_enabled,
+      "voiceThreshold": voice_threshold,
+      "voiceHoldTime": voice_hold_time,
+      "codec": codec,
     },
   )
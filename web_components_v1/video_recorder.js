@@ -43,6 +43,11 @@ class VideoRecorder extends LitElement {
     quality: { type: Number },
     fps: { type: Number },
     showPreview: { type: Boolean },
+    ingestUrl: { type: String },
+    ingestToken: { type: String },
+    lowResWidth: { type: Number },
+    highResInterval: { type: Number },
+    highResIngestUrl: { type: String },
   };
 
   constructor() {
@@ -57,6 +62,20 @@ class VideoRecorder extends LitElement {
     this.fps = 2; // Frames per second
     this.showPreview = true; // Enable preview by default
 
+    // Frames are streamed at `lowResWidth` pixels wide, and a full resolution frame is
+    // sent every `highResInterval` ms for the server to keep. 0 streams full resolution.
+    this.lowResWidth = 0;
+    this.highResInterval = 1000;
+    this.highResIngestUrl = "";
+
+    // Media ingest endpoint. When set, frames bypass Mesop events.
+    this.ingestUrl = "";
+    this.ingestToken = "";
+    this.ingestFailed = false;
+    this.ingestPending = 0;
+    this.maxIngestPending = 2;
+    this.ingestChain = Promise.resolve();
+
     // Setup canvas and video elements
     this.video = document.createElement("video");
     this.video.setAttribute("playsinline", ""); // Better mobile support
@@ -64,7 +83,10 @@ class VideoRecorder extends LitElement {
     this.video.setAttribute("muted", "");
     this.canvas = document.createElement("canvas");
     this.ctx = this.canvas.getContext("2d");
+    this.lowResCanvas = document.createElement("canvas");
+    this.lowResCtx = this.lowResCanvas.getContext("2d");
     this.captureInterval = null;
+    this.highResCaptureInterval = null;
   }
 
   disconnectedCallback() {
@@ -78,6 +100,16 @@ class VideoRecorder extends LitElement {
     }
   }
 
+  updated(changedProperties) {
+    // The server can retune the frame rate and resolution while recording.
+    const retuned = ["fps", "lowResWidth", "highResInterval"].some((name) =>
+      changedProperties.has(name)
+    );
+    if (retuned && this.captureInterval) {
+      this.startCapturing();
+    }
+  }
+
   log(...args) {
     if (this.debug) {
       console.log(...args);
@@ -139,39 +171,129 @@ class VideoRecorder extends LitElement {
     }
   }
 
-  captureFrame() {
+  isDualResolution() {
+    return this.lowResWidth > 0 && this.lowResWidth < this.canvas.width;
+  }
+
+  drawFrame(highRes) {
+    if (highRes || !this.isDualResolution()) {
+      this.ctx.drawImage(this.video, 0, 0);
+      return this.canvas;
+    }
+    const height = Math.round((this.canvas.height * this.lowResWidth) / this.canvas.width);
+    if (this.lowResCanvas.width !== this.lowResWidth || this.lowResCanvas.height !== height) {
+      this.lowResCanvas.width = this.lowResWidth;
+      this.lowResCanvas.height = height;
+    }
+    this.lowResCtx.drawImage(this.video, 0, 0, this.lowResWidth, height);
+    return this.lowResCanvas;
+  }
+
+  captureFrame(highRes = false) {
     if (!this.mediaStream) {
       this.error("Webcam not started");
       return null;
     }
 
     // Draw current video frame to canvas
-    this.ctx.drawImage(this.video, 0, 0);
+    const canvas = this.drawFrame(highRes);
 
     // Convert to JPEG and base64 encode
-    const base64Data = this.canvas.toDataURL("image/jpeg", this.quality);
+    const base64Data = canvas.toDataURL("image/jpeg", this.quality);
 
     // Remove the data URL prefix to get just the base64 data
     return base64Data.replace("data:image/jpeg;base64,", "");
   }
 
+  captureFrameBlob(highRes = false) {
+    if (!this.mediaStream) {
+      this.error("Webcam not started");
+      return Promise.resolve(null);
+    }
+
+    const canvas = this.drawFrame(highRes);
+    return new Promise((resolve) => {
+      canvas.toBlob(resolve, "image/jpeg", this.quality);
+    });
+  }
+
+  ingest(body, fallback, url = this.ingestUrl) {
+    // Uploads are chained so that chunks arrive in order. If the network can't keep up,
+    // new chunks are dropped rather than building up latency.
+    if (this.ingestPending >= this.maxIngestPending) {
+      this.warn("Dropping chunk since the ingest endpoint is falling behind.");
+      return;
+    }
+    this.ingestPending++;
+    this.ingestChain = this.ingestChain
+      .then(() =>
+        fetch(url, {
+          method: "POST",
+          headers: {
+            "Content-Type": "application/octet-stream",
+            "X-Ingest-Token": this.ingestToken,
+          },
+          body,
+        })
+      )
+      .then((response) => {
+        if (!response.ok) {
+          throw new Error(`Ingest failed with status ${response.status}`);
+        }
+      })
+      .catch((error) => {
+        this.error("Falling back to Mesop events:", error);
+        this.ingestFailed = true;
+        fallback();
+      })
+      .finally(() => {
+        this.ingestPending--;
+      });
+  }
+
   start() {
     this.isStreaming = true;
+    this.startCapturing();
+    return true;
+  }
+
+  startCapturing() {
+    if (this.captureInterval) {
+      clearInterval(this.captureInterval);
+    }
+
+    if (this.highResCaptureInterval) {
+      clearInterval(this.highResCaptureInterval);
+      this.highResCaptureInterval = null;
+    }
 
     // Start capturing frames at specified FPS
     const intervalMs = 1000 / this.fps;
-    this.captureInterval = setInterval(() => {
-      const base64Frame = this.captureFrame();
-      if (base64Frame) {
-        this.dispatchEvent(
-          new MesopEvent(this.dataEvent, {
-            data: base64Frame,
-          })
-        );
-      }
-    }, intervalMs);
+    this.captureInterval = setInterval(() => this.sendFrame(false), intervalMs);
+    if (this.isDualResolution() && this.highResInterval > 0) {
+      this.highResCaptureInterval = setInterval(
+        () => this.sendFrame(true),
+        this.highResInterval
+      );
+    }
+  }
 
-    return true;
+  sendFrame(highRes) {
+    const url = highRes ? this.highResIngestUrl : this.ingestUrl;
+    if (url && !this.ingestFailed) {
+      // A frame that fails to upload is not resent, the next capture replaces it.
+      this.captureFrameBlob(highRes).then((blob) => blob && this.ingest(blob, () => {}, url));
+      return;
+    }
+    const base64Frame = this.captureFrame(highRes);
+    if (base64Frame) {
+      this.dispatchEvent(
+        new MesopEvent(this.dataEvent, {
+          data: base64Frame,
+          resolution: highRes ? "high" : "low",
+        })
+      );
+    }
   }
 
   stop() {
@@ -182,6 +304,10 @@ class VideoRecorder extends LitElement {
       clearInterval(this.captureInterval);
       this.captureInterval = null;
     }
+    if (this.highResCaptureInterval) {
+      clearInterval(this.highResCaptureInterval);
+      this.highResCaptureInterval = null;
+    }
 
     if (this.mediaStream) {
       this.mediaStream.getTracks().forEach((track) => track.stop());
@@ -9,6 +9,13 @@ def video_recorder(
   enabled: bool = False,
   on_data: Callable[[mel.WebEvent], Any],
   on_record: Callable[[mel.WebEvent], Any],
+  ingest_url: str = "",
+  ingest_token: str = "",
+  fps: float = 2,
+  quality: float = 0.8,
+  low_res_width: int = 0,
+  high_res_interval: int = 1000,
+  high_res_ingest_url: str = "",
 ):
   """Records video and streams video to the Mesop server.
 
@@ -17,8 +24,16 @@ def video_recorder(
   The data event looks like:
 
     {
-      "data": <base64-encoded-string>
+      "data": <base64-encoded-string>,
+      "resolution": "low" | "high"
     }
+
+  If `low_res_width` is set, frames are scaled down to that width and a full resolution
+  frame is sent every `high_res_interval` ms with `"resolution": "high"`.
+
+  If `ingest_url` is set, the JPEG frames are POSTed to the media ingest endpoint instead
+  (full resolution frames to `high_res_ingest_url`) and `on_data` is only used as a
+  fallback when the endpoint rejects the upload.
   """
   return mel.insert_web_component(
     name="video-recorder",
@@ -28,5 +43,12 @@ def video_recorder(
     },
     properties={
       "enabled": enabled,
+      "ingestUrl": ingest_url,
+      "ingestToken": ingest_token,
+      "fps": fps,
+      "quality": quality,
+      "lowResWidth": low_res_width,
+      "highResInterval": high_res_interval,
+      "highResIngestUrl": high_res_ingest_url,
     },
   )
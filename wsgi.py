@@ -0,0 +1,17 @@
+"""WSGI entry point that serves the Mesop app together with the live session endpoints.
+
+MESOP_WEBSOCKETS_ENABLED=true gunicorn --workers 1 --threads 16 --graceful-timeout 30 wsgi:app
+
+On SIGTERM the worker drains its live sessions before gunicorn stops it, so keep the
+graceful timeout above `DRAIN_DEADLINE_SECONDS`.
+"""
+
+import mesop as me
+
+import main  # noqa: F401 Registers the pages.
+from live import drain
+from server.app import create_app
+
+
+app = create_app(me.create_wsgi_app())
+drain.install_signal_handler()